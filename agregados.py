@@ -0,0 +1,281 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from dados import preparar_metronomica, resumir_por_paciente
+from dose import COLUNAS_DOSE, dose_por_ciclo, exposicao_por_paciente
+from instrumentacao import Instrumentacao
+from qualidade import avaliar
+from toxicidade import Cubo, decodificar_grau, montar_cubo
+
+
+# =========================================================
+# 📋 COLUNAS
+# =========================================================
+COLUNAS_TOX = [
+    "anemiahbmt", "plaquetopeniamt", "neutropeniamt", "neutropeniafebremt",
+    "nauseasmt", "vomitosmt", "mucositemt", "diarreiamt",
+    "renal_creatinamt", "hepatica_bt_mt", "hepatica_tgo_mt", "hepatica_tgp_mt",
+    "perdadepesomt",
+]
+
+COLUNAS_LAB = [
+    "hemoglobinamt", "leucocitosmt", "neutrofilosmt", "plaquetasmt",
+    "creatinamt", "tgomt", "tgpmt", "btmt",
+]
+COLUNAS_DATAS = ["datahemogramamt", "databioquimica"]
+
+# Tudo o que algum painel (ou as regras de qualidade) lê da planilha metronômica.
+COLUNAS_METRO = [
+    "id_paciente", *COLUNAS_LAB, *COLUNAS_DATAS, *COLUNAS_DOSE, *COLUNAS_TOX,
+]
+
+# Tabela-ewing_estatistico: variáveis codificadas da tabela demográfica e da
+# comparação entre grupos (datas, incluindo o nascimento, ficam de fora).
+COLUNAS_ESTATISTICO = [
+    "ID", "Metronômica", "Sexo", "regiao_lesao", "Tamanho_tumor", "Idade",
+    "País", "Insituicao", "Etnia", "Local_tumor_primario", "N_Ciclos",
+    "Tto_Primário", "Randomização",
+    "Status_sobrevida_livre_de_evento", "Status_sobrevida_global",
+]
+COLUNAS_IDADES = ["ID", "Idades"]
+
+# Planilhas que podem chegar com uma aba por centro ou por ano (todas as abas
+# compatíveis são lidas e empilhadas; ver `dados.ler_em_paralelo`).
+TABELAS_VARIAS_ABAS = ("metro", "estatistico")
+
+
+# =========================================================
+# 📊 DADOS DEMOGRÁFICOS
+# =========================================================
+# (rótulo, coluna, valor) — codificação do dicionário de variáveis
+VARIAVEIS_DEMOGRAFICAS = [
+    ("Gênero (Masculino)", "Sexo", 0),
+    ("Gênero (Feminino)", "Sexo", 1),
+    ("Local (Pélvico)", "regiao_lesao", 1),
+    ("Local (Não pélvico)", "regiao_lesao", 0),
+    ("Tamanho do tumor (> 8 cm)", "Tamanho_tumor", 1),
+    ("Tamanho do tumor (< 8 cm)", "Tamanho_tumor", 0),
+    ("Idade (> 14 anos)", "Idade", 1),
+    ("Idade (< 14 anos)", "Idade", 0),
+]
+
+
+def tabela_demografica(estatistico: pd.DataFrame, idades: pd.DataFrame) -> pd.DataFrame:
+    """Contagem (%) por grupo de adesão à metronômica e na coorte total."""
+    df = estatistico.merge(idades, on="ID", how="left")
+    grupos = [
+        ("Metronômica (sim)", df[df["Metronômica"] == 1]),
+        ("Metronômica (não)", df[df["Metronômica"] == 0]),
+        ("Total", df),
+    ]
+
+    tabela = {"Variável": [r for r, _, _ in VARIAVEIS_DEMOGRAFICAS] + ["Range", "Média"]}
+    for nome, g in grupos:
+        n = len(g)
+        celulas = []
+        for _, col, valor in VARIAVEIS_DEMOGRAFICAS:
+            k = int((g[col] == valor).sum())
+            celulas.append(f"{k} ({100 * k / n:.1f}%)" if n else "0 (0.0%)")
+        celulas.append(f"{g['Idades'].min():.2f} – {g['Idades'].max():.2f}")
+        celulas.append(f"{g['Idades'].mean():.2f}")
+        tabela[f"{nome} - n={n}"] = celulas
+
+    return pd.DataFrame(tabela)
+
+
+# =========================================================
+# 🧾 PRESENÇA DE CICLOS
+# =========================================================
+def matriz_presenca(metro: pd.DataFrame, cubo: Cubo) -> np.ndarray:
+    """ciclo × paciente (uint8), nos eixos do cubo."""
+    pac = np.searchsorted(cubo.ids, metro["id_paciente"].to_numpy())
+    cic = np.searchsorted(cubo.ciclos, metro["ciclo"].to_numpy())
+    presenca = np.zeros((len(cubo.ciclos), len(cubo.ids)), dtype=np.uint8)
+    presenca[cic, pac] = 1
+    return presenca
+
+
+def tabela_presenca(presenca: np.ndarray, cubo: Cubo) -> pd.DataFrame:
+    return pd.DataFrame(
+        presenca,
+        index=pd.Index(cubo.ciclos, name="ciclo"),
+        columns=pd.Index(cubo.ids, name="id_paciente"),
+    )
+
+
+# =========================================================
+# 📊 RESUMOS POR CICLO
+# =========================================================
+def resumir_por_ciclo(metro: pd.DataFrame) -> pd.DataFrame:
+    return (
+        metro.groupby("ciclo")
+        .agg(
+            n_registros=("id_paciente", "count"),
+            peso_medio=("pesomt", "mean"),
+            hb_media=("hemoglobinamt", "mean"),
+            leuco_medio=("leucocitosmt", "mean"),
+        )
+        .reset_index()
+    )
+
+
+class DistribuicaoGraus(NamedTuple):
+    ciclos: np.ndarray       # eixo 0
+    colunas: list            # eixo 1: toxicidades
+    graus: np.ndarray        # eixo 2: valores de grau presentes (int)
+    contagem: np.ndarray     # [ciclo, toxicidade, grau] nº de registros
+    media: np.ndarray        # [ciclo, toxicidade] grau médio, NaN sem registro
+
+
+def distribuicao_graus(cubo: Cubo, ciclo_max=None) -> DistribuicaoGraus:
+    """Contagem por (ciclo, toxicidade, grau) e grau médio por (ciclo, toxicidade).
+
+    Uma única passada para todas as toxicidades: cada registro vira uma chave
+    inteira combinada e as contagens/somas saem de um `np.bincount`.
+    """
+    graus, ciclos = np.asarray(cubo.graus), cubo.ciclos
+    if ciclo_max is not None:
+        manter = ciclos <= ciclo_max
+        graus, ciclos = graus[:, manter], ciclos[manter]
+    n_cic, n_tox = graus.shape[1], graus.shape[2]
+
+    registrado = ~np.isnan(graus)
+    _, cic, tox = np.nonzero(registrado)
+    valores = graus[registrado]
+    niveis, g = np.unique(valores, return_inverse=True)
+
+    celula = cic * n_tox + tox
+    contagem = np.bincount(
+        celula * len(niveis) + g, minlength=n_cic * n_tox * len(niveis)
+    ).reshape(n_cic, n_tox, len(niveis))
+    soma = np.bincount(celula, weights=valores, minlength=n_cic * n_tox)
+    n = contagem.sum(axis=2)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(n > 0, soma.reshape(n_cic, n_tox) / n, np.nan)
+
+    return DistribuicaoGraus(
+        ciclos, list(cubo.colunas), niveis.astype(np.int64), contagem, media
+    )
+
+
+def tabela_distribuicao(dist: DistribuicaoGraus, coluna, percentual=False) -> pd.DataFrame:
+    """ciclo × grau de uma toxicidade (só ciclos e graus com registro)."""
+    cont = dist.contagem[:, dist.colunas.index(coluna), :]
+    linhas, cols = cont.sum(axis=1) > 0, cont.sum(axis=0) > 0
+    tabela = pd.DataFrame(
+        cont[np.ix_(linhas, cols)],
+        index=pd.Index(dist.ciclos[linhas], name="ciclo"),
+        columns=pd.Index(dist.graus[cols], name="grau"),
+    )
+    if percentual:
+        tabela = tabela.div(tabela.sum(axis=1), axis=0) * 100
+    return tabela
+
+
+def tabela_intensidade(dist: DistribuicaoGraus, coluna) -> pd.DataFrame:
+    """Grau médio por ciclo de uma toxicidade (coluna `grau`)."""
+    return pd.DataFrame(
+        {"grau": dist.media[:, dist.colunas.index(coluna)]},
+        index=pd.Index(dist.ciclos, name="ciclo"),
+    )
+
+
+def distribuicao_por_ciclo(cubo: Cubo) -> pd.DataFrame:
+    """Nº de registros por (toxicidade, ciclo, grau), formato longo."""
+    dist = distribuicao_graus(cubo)
+    tox, cic, g = np.nonzero(dist.contagem.transpose(1, 0, 2))
+    return pd.DataFrame({
+        "toxicidade": np.asarray(dist.colunas, dtype=object)[tox],
+        "ciclo": dist.ciclos[cic],
+        "grau": dist.graus[g],
+        "n": dist.contagem[cic, tox, g],
+    })
+
+
+# =========================================================
+# 🩸 TABELAS DE TOXICIDADE
+# =========================================================
+GRAUS = [0, 1, 2, 3, 4]
+
+# A planilha codifica a anemia a partir de 1 ("1 - (10 - Normal)"): nas tabelas
+# clínicas do relatório o grau é o código menos 1.
+DESLOCAMENTO_GRAU = {"anemiahbmt": 1}
+
+
+def grau_maximo_por_paciente(cubo: Cubo, escala_clinica=False) -> np.ndarray:
+    """paciente × toxicidade; 99 (não avaliado) ignorado, NaN = nunca avaliado.
+
+    Com `escala_clinica`, aplica `DESLOCAMENTO_GRAU` (graus das tabelas clínicas).
+    """
+    graus = np.asarray(cubo.graus)
+    maximo = np.fmax.reduce(np.where(graus >= 99, np.nan, graus), axis=1)
+    if escala_clinica:
+        deslocamento = [DESLOCAMENTO_GRAU.get(c, 0) for c in cubo.colunas]
+        maximo = np.clip(maximo - deslocamento, 0, None)
+    return maximo
+
+
+def tabela_toxicidade_por_paciente(cubo: Cubo) -> pd.DataFrame:
+    """Nº de pacientes por grau máximo atingido, uma linha por toxicidade."""
+    maximo = grau_maximo_por_paciente(cubo)
+    tabela = pd.DataFrame({"toxicidade": cubo.colunas, "n_pacientes": len(cubo.ids)})
+    for g in GRAUS:
+        tabela[f"grau_{g}"] = (maximo == g).sum(axis=0)
+    tabela["nao_avaliado"] = np.isnan(maximo).sum(axis=0)
+    return tabela
+
+
+def tabela_ciclos(metro: pd.DataFrame, colunas=COLUNAS_TOX) -> pd.DataFrame:
+    """Tabela analisada por ciclo: registros + grau decodificado (`<col>_grau`)."""
+    graus = {
+        f"{c}_grau": decodificar_grau(metro[c]) for c in colunas if c in metro.columns
+    }
+    return metro.assign(**graus)
+
+
+# =========================================================
+# 🧮 TODOS OS AGREGADOS DOS PAINÉIS
+# =========================================================
+def calcular_agregados(metro, baseline, estatistico=None, idades=None, inst=None):
+    """Tudo o que os painéis exibem, a partir das tabelas já projetadas.
+
+    Usado tanto pela construção do pacote de artefatos quanto pelo cálculo
+    ao vivo das apps quando o pacote está ausente ou desatualizado.
+    """
+    inst = inst or Instrumentacao()
+
+    with inst.etapa("normalizacao"):
+        metro = preparar_metronomica(metro)
+
+    with inst.etapa("graus"):
+        cubo = montar_cubo(metro, COLUNAS_TOX)
+
+    with inst.etapa("pivotagem"):
+        agregados = {
+            "metro": metro,
+            "baseline": baseline,
+            "resumo": resumir_por_paciente(metro),
+            "resumo_por_ciclo": resumir_por_ciclo(metro),
+            "distribuicao_por_ciclo": distribuicao_por_ciclo(cubo),
+            "cubo": cubo,
+            "presenca": matriz_presenca(metro, cubo),
+        }
+        if set(COLUNAS_DOSE) <= set(metro.columns):
+            agregados["dose_por_ciclo"] = dose_por_ciclo(metro)
+            agregados["exposicao"] = exposicao_por_paciente(agregados["dose_por_ciclo"])
+        if estatistico is not None and idades is not None:
+            agregados["demografia"] = tabela_demografica(estatistico, idades)
+            agregados["coorte"] = estatistico.merge(idades, on="ID", how="left")
+
+    with inst.etapa("qualidade"):
+        agregados["violacoes"], agregados["qualidade"] = avaliar(
+            metro, baseline, colunas_grau=COLUNAS_TOX
+        )
+
+    return agregados
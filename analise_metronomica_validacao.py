@@ -1,6 +1,18 @@
 import pandas as pd
+from fpdf import FPDF
 from pathlib import Path
 
+import artefatos
+from pdf_tabelas import blocos_arrow, desenhar_tabela
+
+# listagem por ciclo da coorte inteira (geração atual do pacote de `artefatos.py`), se existir
+LISTAGEM = artefatos.caminho_tabela("metro")
+COLUNAS_LISTAGEM = [
+    "id_paciente", "ciclo", "hemoglobinamt", "leucocitosmt",
+    "anemiahbmt", "plaquetopeniamt", "neutropeniamt", "nauseasmt",
+    "vomitosmt", "mucositemt", "diarreiamt",
+]
+
 
 # =========================
 # 1. LEITURA DOS DADOS
@@ -75,25 +87,18 @@ pdf.add_page()
 pdf.set_font("Arial", "B", 14)
 pdf.cell(0, 10, "Relatorio de Analise de Toxicidades", ln=True)
 
-def tabela_pdf(pdf, df, titulo):
-    pdf.ln(5)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, titulo, ln=True)
-    pdf.set_font("Arial", size=9)
-
-    col_width = pdf.w / (len(df.columns) + 1)
-
-    for col in df.columns:
-        pdf.cell(col_width, 8, col, border=1)
-    pdf.ln()
-
-    for _, row in df.iterrows():
-        for item in row:
-            pdf.cell(col_width, 8, str(item), border=1)
-        pdf.ln()
-
-tabela_pdf(pdf, heme, "Toxicidades Hematologicas")
-tabela_pdf(pdf, outras, "Outras Toxicidades")
+# células formatadas por coluna, larguras medidas uma vez, cabeçalho repetido
+# a cada página; listagens longas entram em blocos (ver pdf_tabelas.py)
+desenhar_tabela(pdf, heme, "Toxicidades Hematologicas")
+desenhar_tabela(pdf, outras, "Outras Toxicidades")
+
+if LISTAGEM is not None:
+    pdf.add_page(orientation="L")
+    n = desenhar_tabela(
+        pdf, blocos_arrow(LISTAGEM, colunas=COLUNAS_LISTAGEM), "Listagem por ciclo",
+        casas=2, tamanho_fonte=7,
+    )
+    print(f"✔ Listagem por ciclo: {n} linhas")
 
 pdf.output("Relatorio_Final.pdf")
 print("✔ PDF gerado: Relatorio_Final.pdf")
@@ -0,0 +1,264 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import argparse
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+import artefatos
+
+
+# =========================================================
+# ⚙️ CONFIGURAÇÃO
+# =========================================================
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+
+TIPO_JSON = "application/json; charset=utf-8"
+TIPO_ARROW = "application/vnd.apache.arrow.file"
+
+# Respostas (corpo serializado) mantidas em memória, das menos usadas para as
+# mais usadas; a mais antiga sai quando o limite é atingido.
+MAX_CACHE = 64
+
+
+# =========================================================
+# 📊 RECURSOS
+# =========================================================
+# Cada recurso recebe os agregados e os parâmetros da query e devolve um
+# DataFrame — as mesmas tabelas exibidas em `app_metronomica_dark.py`. Em
+# `RECURSOS`, cada rota declara os parâmetros que aceita (além de `formato`).
+def _resumo(agregados, params):
+    return agregados["resumo"].sort_values("n_ciclos", ascending=False)
+
+
+def _resumo_por_ciclo(agregados, params):
+    return agregados["resumo_por_ciclo"]
+
+
+def _distribuicao(agregados, params):
+    dist = agregados["distribuicao_por_ciclo"]
+    if "toxicidade" in params:
+        dist = dist[dist["toxicidade"] == params["toxicidade"]]
+    return dist
+
+
+def _cubo(agregados, params):
+    """Cubo em formato longo: uma linha por (paciente, ciclo, toxicidade)."""
+    cubo = agregados["cubo"]
+    colunas = list(cubo.colunas)
+    if "toxicidade" in params:
+        colunas = [params["toxicidade"]] if params["toxicidade"] in colunas else []
+    idx = [cubo.colunas.index(c) for c in colunas]
+
+    graus = np.asarray(cubo.graus[:, :, idx])
+    pac, cic, tox = np.nonzero(~np.isnan(graus))
+    return pd.DataFrame({
+        "id_paciente": cubo.ids[pac],
+        "ciclo": cubo.ciclos[cic],
+        "toxicidade": np.asarray(colunas, dtype=object)[tox],
+        "grau": graus[pac, cic, tox].astype(np.int64),
+    })
+
+
+def _demografia(agregados, params):
+    return agregados["demografia"]
+
+
+RECURSOS = {
+    "/resumo": (_resumo, ()),
+    "/resumo_por_ciclo": (_resumo_por_ciclo, ()),
+    "/distribuicao": (_distribuicao, ("toxicidade",)),
+    "/cubo": (_cubo, ("toxicidade",)),
+    "/demografia": (_demografia, ()),
+}
+
+
+# =========================================================
+# 🔁 SERIALIZAÇÃO
+# =========================================================
+def _json(df):
+    return df.to_json(orient="records", force_ascii=False).encode("utf-8")
+
+
+def _arrow(df):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    buf = io.BytesIO()
+    with ipc.new_file(buf, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return buf.getvalue()
+
+
+def _erro(status, mensagem):
+    corpo = json.dumps({"erro": mensagem}, ensure_ascii=False).encode("utf-8")
+    return status, {"Content-Type": TIPO_JSON}, corpo
+
+
+def _formato(params, cabecalhos):
+    if "formato" in params:
+        return params["formato"]
+    return "arrow" if TIPO_ARROW in cabecalhos.get("Accept", "") else "json"
+
+
+# =========================================================
+# 🌐 API (SEM SOCKET)
+# =========================================================
+class Api:
+    """Respostas da API a partir dos agregados, com ETag e cache em memória.
+
+    `responder` não depende de HTTP: o servidor e o `ClienteLocal` chamam o
+    mesmo método. A versão dos dados (hash das planilhas) é conferida a cada
+    requisição; quando muda, os agregados são recarregados e o cache zerado.
+    O cache é LRU (`MAX_CACHE` respostas) e a chave só usa os parâmetros que
+    o recurso aceita: parâmetros desconhecidos são recusados com 400.
+    """
+
+    def __init__(self, fontes=None, destino=artefatos.DIR_PADRAO):
+        self.fontes = fontes or artefatos.fontes_padrao()
+        self.destino = destino
+        self.versao = None
+        self.agregados = None
+        self.cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _atualizar(self):
+        versao = artefatos.versao_fontes(self.fontes)
+        if versao != self.versao:
+            self.versao, self.agregados = artefatos.carregar_agregados(
+                self.fontes, self.destino
+            )
+            self.cache.clear()
+
+    def responder(self, caminho, cabecalhos=None):
+        """(status, cabeçalhos, corpo) para um GET em `caminho`."""
+        cabecalhos = cabecalhos or {}
+        url = urlsplit(caminho)
+        rota = url.path.rstrip("/") or "/"
+        params = dict(parse_qsl(url.query))
+
+        with self._lock:
+            self._atualizar()
+            versao = self.versao
+
+            if rota == "/":
+                corpo = json.dumps({
+                    "versao_dados": versao,
+                    "recursos": {r: list(p) for r, (_, p) in sorted(RECURSOS.items())},
+                    "formatos": ["json", "arrow"],
+                }).encode("utf-8")
+                return 200, {"Content-Type": TIPO_JSON}, corpo
+
+            if rota not in RECURSOS:
+                return _erro(404, "recurso inexistente")
+            funcao, aceitos = RECURSOS[rota]
+
+            formato = _formato(params, cabecalhos)
+            if formato not in ("json", "arrow"):
+                return _erro(400, "formato invalido")
+            desconhecidos = sorted(set(params) - {"formato", *aceitos})
+            if desconhecidos:
+                return _erro(400, f"parametros desconhecidos: {', '.join(desconhecidos)}")
+
+            filtros = tuple(sorted((k, v) for k, v in params.items() if k in aceitos))
+            chave = (rota, filtros, formato)
+            if chave in self.cache:
+                self.cache.move_to_end(chave)
+            else:
+                try:
+                    df = funcao(self.agregados, dict(filtros))
+                except KeyError as e:
+                    # tabela ausente do pacote (ex.: sem planilhas de demografia)
+                    return _erro(404, f"tabela indisponivel: {e.args[0]}")
+                except Exception as e:
+                    return _erro(500, f"{type(e).__name__}: {e}")
+                corpo = _arrow(df) if formato == "arrow" else _json(df)
+                resumo = hashlib.sha256(repr(chave).encode()).hexdigest()[:12]
+                self.cache[chave] = (f'"{versao}-{resumo}"', corpo)
+                if len(self.cache) > MAX_CACHE:
+                    self.cache.popitem(last=False)
+            etag, corpo = self.cache[chave]
+
+        resposta = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Content-Type": TIPO_ARROW if formato == "arrow" else TIPO_JSON,
+        }
+        if etag in (t.strip() for t in cabecalhos.get("If-None-Match", "").split(",")):
+            return 304, resposta, b""
+        return 200, resposta, corpo
+
+
+class ClienteLocal:
+    """Cliente em processo (sem rede) para scripts e verificações offline."""
+
+    def __init__(self, api=None):
+        self.api = api or Api()
+
+    def get(self, caminho, etag=None, arrow=False):
+        cabecalhos = {}
+        if etag:
+            cabecalhos["If-None-Match"] = etag
+        if arrow:
+            cabecalhos["Accept"] = TIPO_ARROW
+        return self.api.responder(caminho, cabecalhos)
+
+    def tabela(self, caminho):
+        status, _, corpo = self.get(caminho, arrow=True)
+        if status != 200:
+            raise ValueError(f"{caminho}: HTTP {status}")
+        return ipc.open_file(pa.BufferReader(corpo)).read_all().to_pandas()
+
+
+# =========================================================
+# 🖥️ SERVIDOR HTTP (SOMENTE LEITURA)
+# =========================================================
+def criar_servidor(api=None, host=HOST_PADRAO, porta=PORTA_PADRAO):
+    api = api or Api()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, cabecalhos, corpo = api.responder(self.path, self.headers)
+            self.send_response(status)
+            for nome, valor in cabecalhos.items():
+                self.send_header(nome, valor)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(corpo)
+
+        do_HEAD = do_GET
+
+    return ThreadingHTTPServer((host, porta), Handler)
+
+
+# =========================================================
+# 🚀 EXECUÇÃO
+# =========================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="API local somente leitura com os agregados da coorte."
+    )
+    parser.add_argument("--host", default=HOST_PADRAO)
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--dados", default=artefatos.BASE_DIR,
+                        help="diretório com as planilhas de origem")
+    args = parser.parse_args()
+
+    servidor = criar_servidor(
+        Api(artefatos.fontes_padrao(args.dados)), args.host, args.porta
+    )
+    print(f"🌐 API em http://{args.host}:{servidor.server_port}/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
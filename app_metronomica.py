@@ -2,14 +2,18 @@
 # 📦 IMPORTS
 # =========================================================
 import os
-from datetime import date
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import streamlit as st
 
+from dados import ler_baseline_anonimizado, ler_metronomica
+from importacao import ModuloTardio
+
+# bibliotecas de gráficos só são importadas na primeira figura
+plt = ModuloTardio("matplotlib.pyplot")
+sns = ModuloTardio("seaborn")
+
 
 # =========================================================
 # ⚙️ CONFIG STREAMLIT
@@ -39,10 +43,26 @@ baseline_file = os.path.join(BIOINFO_DIR, "1_202407_Baseline.xlsx")
 # =========================================================
 # 📂 LEITURA DOS DADOS
 # =========================================================
+# Colunas usadas por esta app (nomes normalizados). Identificadores do
+# baseline nunca são lidos: a projeção anonimizada é o que fica em cache.
+COLUNAS_METRO = [
+    "id_paciente", "ciclo_mt", "pesomt", "hemoglobinamt", "leucocitosmt",
+    "anemiahbmt", "plaquetopeniamt", "neutropeniamt", "neutropeniafebremt",
+    "nauseasmt", "vomitosmt", "mucositemt", "diarreiamt",
+    "renal_creatinamt", "hepatica_bt_mt", "hepatica_tgo_mt", "hepatica_tgp_mt",
+]
+
+
 @st.cache_data
 def load_data():
-    metro = pd.read_excel(metro_file) if os.path.exists(metro_file) else pd.DataFrame()
-    baseline = pd.read_excel(baseline_file) if os.path.exists(baseline_file) else pd.DataFrame()
+    metro = (
+        ler_metronomica(metro_file, COLUNAS_METRO)
+        if os.path.exists(metro_file) else pd.DataFrame()
+    )
+    baseline = (
+        ler_baseline_anonimizado(baseline_file)
+        if os.path.exists(baseline_file) else pd.DataFrame()
+    )
     return metro, baseline
 
 
@@ -53,24 +73,10 @@ metro, baseline = load_data()
 # 🧹 PADRONIZAÇÃO – METRONÔMICA
 # =========================================================
 if not metro.empty:
-    metro.columns = (
-        metro.columns.str.lower()
-        .str.strip()
-        .str.normalize("NFKD")
-        .str.encode("ascii", errors="ignore")
-        .str.decode("utf-8")
-        .str.replace(" ", "_")
-    )
-
-    if "id_paciente" not in metro.columns:
-        for c in metro.columns:
-            if c.startswith("id"):
-                metro.rename(columns={c: "id_paciente"}, inplace=True)
-                break
-
     ciclo_col = next((c for c in metro.columns if "ciclo" in c), None)
     if ciclo_col is None:
-        metro["ciclo"] = 1
+        metro = metro.sort_values("id_paciente")
+        metro["ciclo"] = metro.groupby("id_paciente").cumcount() + 1
         ciclo_col = "ciclo"
 else:
     ciclo_col = "ciclo"
@@ -79,35 +85,9 @@ else:
 # =========================================================
 # 🧹 TRATAMENTO – BASELINE
 # =========================================================
-def calcular_idade(d):
-    try:
-        d = pd.to_datetime(d)
-        hoje = date.today()
-        return hoje.year - d.year - ((hoje.month, hoje.day) < (d.month, d.day))
-    except Exception:
-        return None
-
-
 baseline_data = pd.DataFrame()
 
 if not baseline.empty:
-    baseline.columns = baseline.columns.str.lower().str.strip()
-
-    if "data de nascimento" in baseline.columns:
-        baseline["idade"] = (
-            pd.to_datetime(baseline["data de nascimento"], errors="coerce")
-            .apply(calcular_idade)
-        )
-
-    remover = [
-        "nome", "sobrenome", "iniciais", "rg",
-        "instituição", "registro hospitalar",
-        "data de nascimento", "data tcle"
-    ]
-
-    baseline = baseline[[c for c in baseline.columns if c not in remover]]
-    baseline.rename(columns={"id": "id_paciente"}, inplace=True)
-
     baseline_data = baseline.head(20)
 
 
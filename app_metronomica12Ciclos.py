@@ -2,14 +2,30 @@
 # 📦 IMPORTS
 # =========================================================
 import os
-from datetime import date
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import streamlit as st
 from pathlib import Path
 
+import artefatos
+from agregados import (
+    calcular_agregados,
+    distribuicao_graus,
+    tabela_distribuicao,
+    tabela_intensidade,
+)
+from bootstrap import REPLICAS, SEMENTE, intervalos_agregados, resumo_por_ciclo_ic
+from exportacao import secao_exportacao
+from importacao import ModuloTardio
+from instrumentacao import Instrumentacao, cache_miss
+from paginacao import indexar, tabela_paginada
+from retencao import calcular_retencao, em_risco, tabela_em_risco
+
+# bibliotecas de gráficos só são importadas na primeira figura
+plt = ModuloTardio("matplotlib.pyplot")
+sns = ModuloTardio("seaborn")
+
+# tempos por etapa desta execução (painel de depuração no fim da página)
+inst = Instrumentacao()
+
 # =========================================================
 # 🌙 CONFIG STREAMLIT
 # =========================================================
@@ -33,8 +49,8 @@ def find_file(filename: str) -> Path:
         st.stop()
     return matches[0]
 
-METRO_FILE = find_file("planilha-metronomica-filtrada.xlsx")
-BASELINE_FILE = find_file("1_202407_Baseline.xlsx")
+with inst.etapa("resolucao_arquivos"):
+    FONTES = {nome: find_file(arq) for nome, arq in artefatos.FONTES.items()}
 
 # =========================================================
 # 📌 TÍTULO
@@ -63,37 +79,50 @@ h1, h2, h3 {
 # =========================================================
 # 📂 LEITURA DOS DADOS
 # =========================================================
+# Pacote pré-calculado (`python artefatos.py`) aberto por memory-map; se
+# ausente ou gerado a partir de outras planilhas, recálculo ao vivo do Excel.
+@st.cache_resource(max_entries=1)
+def abrir_artefatos(versao, geracao):
+    cache_miss()
+    return artefatos.abrir(versao=versao)
+
+# pacote ausente ou de outra versão: a primeira réplica a subir publica, as
+# outras esperam a trava e mapeiam a mesma geração (memória compartilhada)
+@st.cache_resource
+def publicar_artefatos(versao):
+    cache_miss()
+    try:
+        return artefatos.publicar(FONTES)
+    except OSError:   # pasta somente leitura: cálculo ao vivo
+        return None
+
 @st.cache_data
-def load_data():
-    metro = pd.read_excel(METRO_FILE)
-    baseline = pd.read_excel(BASELINE_FILE)
-    return metro, baseline
+def load_data(versao):
+    cache_miss()
+    return calcular_agregados(*artefatos.carregar_fontes(FONTES))
 
-metro, baseline = load_data()
+with inst.etapa("versao_dados"):
+    VERSAO = artefatos.versao_fontes(FONTES)
+    geracao = artefatos.geracao_atual()
 
-# =========================================================
-# 🧹 PADRONIZAÇÃO DAS COLUNAS
-# =========================================================
-metro.columns = (
-    metro.columns.str.lower()
-    .str.strip()
-    .str.normalize("NFKD")
-    .str.encode("ascii", errors="ignore")
-    .str.decode("utf-8")
-    .str.replace(" ", "_")
-)
+with inst.etapa("artefatos", cache=True):
+    dados = abrir_artefatos(VERSAO, geracao)
+
+if dados is None:
+    with inst.etapa("publicacao", cache=True):
+        geracao = publicar_artefatos(VERSAO)
+    if geracao is not None:
+        dados = abrir_artefatos(VERSAO, geracao)
 
-baseline.columns = baseline.columns.str.lower().str.strip()
+if dados is None:
+    with inst.etapa("carga_excel", cache=True):
+        dados = load_data(VERSAO)
+
+metro, baseline = dados["metro"], dados["baseline"]
 
 # =========================================================
 # 🔧 GARANTIA DE id_paciente
 # =========================================================
-if "id_paciente" not in metro.columns:
-    for c in metro.columns:
-        if c.startswith("id"):
-            metro.rename(columns={c: "id_paciente"}, inplace=True)
-            break
-
 if "id_paciente" not in metro.columns:
     st.error("❌ Coluna id_paciente não encontrada.")
     st.stop()
@@ -101,13 +130,13 @@ if "id_paciente" not in metro.columns:
 # =========================================================
 # 🔧 CRIAÇÃO DO CICLO (SEQUENCIAL POR PACIENTE)
 # =========================================================
-metro = metro.sort_values(["id_paciente"])
-metro["ciclo"] = metro.groupby("id_paciente").cumcount() + 1
+# ciclo = ordem do registro dentro do paciente (calculado em `calcular_agregados`)
 
 # =========================================================
 # 🔴 CORTE CLÍNICO: LIMITE DE 12 CICLOS
 # =========================================================
-metro = metro[metro["ciclo"] <= 12]
+LIMITE_CICLOS = 12
+metro = metro[metro["ciclo"] <= LIMITE_CICLOS]
 
 # =========================================================
 # 👀 VISUALIZAÇÃO EXPLÍCITA DO NÚMERO DE CICLOS
@@ -130,21 +159,34 @@ st.divider()
 # =========================================================
 # 📌 BASELINE (VISUALIZAÇÃO)
 # =========================================================
-st.header("📌 Baseline (20 primeiros registros – anonimizado)")
+st.header("📌 Baseline (anonimizado)")
 
-baseline_view = baseline.head(20) if not baseline.empty else pd.DataFrame()
-st.dataframe(baseline_view, use_container_width=True)
+# índice (ordens + busca) uma vez por versão; só a página visível vai ao navegador
+@st.cache_data
+def baseline_indexado(versao):
+    cache_miss()
+    return indexar(baseline)
+
+if baseline.empty:
+    st.info("Base de baseline não disponível.")
+else:
+    with inst.etapa("indexacao", cache=True):
+        baseline_idx = baseline_indexado(VERSAO)
+    tabela_paginada(baseline_idx, key="baseline")
 
 st.divider()
 
 # =========================================================
 # 🧾 NÚMERO DE PACIENTES POR CICLO
 # =========================================================
-cycles_df = (
-    metro.groupby("ciclo")["id_paciente"]
-    .nunique()
-    .reset_index(name="N_pacientes")
-)
+# em risco por ciclo a partir do último ciclo de cada paciente (um único bincount)
+with inst.etapa("pivotagem"):
+    retencao = calcular_retencao(dados["cubo"], dados["presenca"])
+    cycles_df = (
+        em_risco(retencao, ciclo_max=LIMITE_CICLOS)
+        .rename(columns={"em_risco": "N_pacientes"})
+        [["ciclo", "N_pacientes", "abandonos"]]
+    )
 
 st.subheader("🧾 Número de pacientes por ciclo")
 st.dataframe(cycles_df, use_container_width=True)
@@ -154,65 +196,54 @@ st.dataframe(cycles_df, use_container_width=True)
 # =========================================================
 st.subheader("🧾 Heatmap — Presença de ciclos")
 
-df_presenca = metro.copy()
-df_presenca["presente"] = 1
-
-hm_presenca = (
-    df_presenca
-    .pivot_table(
-        index="ciclo",
-        columns="id_paciente",
-        values="presente",
-        aggfunc="max"
+with inst.etapa("pivotagem"):
+    df_presenca = metro.copy()
+    df_presenca["presente"] = 1
+
+    hm_presenca = (
+        df_presenca
+        .pivot_table(
+            index="ciclo",
+            columns="id_paciente",
+            values="presente",
+            aggfunc="max"
+        )
+        .fillna(0)
     )
-    .fillna(0)
-)
 
-fig, ax = plt.subplots(figsize=(16, 6))
-sns.heatmap(hm_presenca, cmap="Blues", ax=ax)
-ax.set_xlabel("Paciente")
-ax.set_ylabel("Ciclo")
-st.pyplot(fig)
-plt.close(fig)
+with inst.etapa("figuras"):
+    fig, ax = plt.subplots(figsize=(16, 6))
+    sns.heatmap(hm_presenca, cmap="Blues", ax=ax)
+    ax.set_xlabel("Paciente")
+    ax.set_ylabel("Ciclo")
+    st.pyplot(fig)
+    plt.close(fig)
 
 st.divider()
 
 # =========================================================
 # 📊 RESUMO CLÍNICO POR CICLO
 # =========================================================
-def to_float(x):
-    try:
-        return float(str(x).replace(",", "."))
-    except:
-        return np.nan
-
-for col in ["pesomt", "hemoglobinamt", "leucocitosmt"]:
-    if col in metro.columns:
-        metro[col] = metro[col].apply(to_float)
-
-resumo_ciclo_df = (
-    metro.groupby("ciclo")
-    .agg(
-        n_registros=("id_paciente", "count"),
-        peso_medio=("pesomt", "mean"),
-        hb_media=("hemoglobinamt", "mean"),
-        leuco_medio=("leucocitosmt", "mean"),
-    )
-    .reset_index()
+# agregado por ciclo: o corte em 12 ciclos só remove linhas
+# IC 95% por bootstrap de pacientes (mesma réplica para todas as colunas)
+@st.cache_data
+def calcular_intervalos(versao, semente, replicas):
+    cache_miss()
+    return intervalos_agregados(dados, replicas=replicas, semente=semente)
+
+with inst.etapa("bootstrap", cache=True):
+    ic = calcular_intervalos(VERSAO, SEMENTE, REPLICAS)
+
+resumo_ciclo_df = dados["resumo_por_ciclo"].merge(
+    resumo_por_ciclo_ic(ic["por_ciclo"]), on="ciclo", how="left"
 )
+resumo_ciclo_df = resumo_ciclo_df[resumo_ciclo_df["ciclo"] <= LIMITE_CICLOS]
 
 st.subheader("📊 Resumo clínico por ciclo")
+st.caption("Colunas `_ic`: IC 95% por bootstrap de pacientes "
+           f"({REPLICAS:,} réplicas, semente {SEMENTE}).".replace(",", "."))
 st.dataframe(resumo_ciclo_df, use_container_width=True)
 
-# =========================================================
-# 🧪 FUNÇÃO DE GRAU
-# =========================================================
-def grau(x):
-    try:
-        return int(str(x).split("-")[0])
-    except:
-        return np.nan
-
 # =========================================================
 # 🩸 DISTRIBUIÇÃO DE TOXICIDADE POR CICLO
 # =========================================================
@@ -231,30 +262,32 @@ tox_cols = [
     ("Hepatica_TGP_MT", "hepatica_tgp_mt"),
 ]
 
+# contagens e grau médio de todas as toxicidades numa única passada sobre o
+# cubo paciente × ciclo × toxicidade; alimenta as barras e os heatmaps abaixo
+with inst.etapa("graus"):
+    dist = distribuicao_graus(dados["cubo"], ciclo_max=LIMITE_CICLOS)
+
 for label, col in tox_cols:
-    if col not in metro.columns:
+    if col not in dist.colunas:
         continue
 
-    df = metro.copy()
-    df["grau"] = df[col].apply(grau)
+    with inst.etapa("pivotagem"):
+        dist_pct = tabela_distribuicao(dist, col, percentual=True)
 
-    dist = (
-        df.groupby(["ciclo", "grau"])
-        .size()
-        .unstack(fill_value=0)
-    )
-
-    dist_pct = dist.div(dist.sum(axis=1), axis=0) * 100
+    with inst.etapa("figuras"):
+        fig, ax = plt.subplots(figsize=(10, 4))
+        dist_pct.plot(kind="bar", stacked=True, ax=ax, colormap="Reds")
 
-    fig, ax = plt.subplots(figsize=(10, 4))
-    dist_pct.plot(kind="bar", stacked=True, ax=ax, colormap="Reds")
+        ax.set_title(f"{label} — Distribuição por ciclo")
+        ax.set_xlabel("Ciclo")
+        ax.set_ylabel("Percentual de ciclos (%)")
 
-    ax.set_title(f"{label} — Distribuição por ciclo")
-    ax.set_xlabel("Ciclo")
-    ax.set_ylabel("Percentual de ciclos (%)")
+        st.pyplot(fig)
+        plt.close(fig)
 
-    st.pyplot(fig)
-    plt.close(fig)
+    st.dataframe(
+        tabela_em_risco(retencao, col, ciclo_max=LIMITE_CICLOS), use_container_width=True
+    )
 
 # =========================================================
 # 🔥 HEATMAP — TOXICIDADE MÉDIA POR CICLO
@@ -262,25 +295,30 @@ for label, col in tox_cols:
 st.header("🔥 Heatmaps — Intensidade média por ciclo")
 
 for label, col in tox_cols:
-    if col not in metro.columns:
+    if col not in dist.colunas:
         continue
 
-    heat = (
-        metro.copy()
-        .assign(grau=lambda d: d[col].apply(grau))
-        .groupby("ciclo")["grau"]
-        .mean()
-        .to_frame()
-    )
+    with inst.etapa("pivotagem"):
+        heat = tabela_intensidade(dist, col)
 
-    fig, ax = plt.subplots(figsize=(6, 4))
-    sns.heatmap(heat, cmap="Reds", annot=True, ax=ax)
+    with inst.etapa("figuras"):
+        fig, ax = plt.subplots(figsize=(6, 4))
+        sns.heatmap(heat, cmap="Reds", annot=True, ax=ax)
 
-    ax.set_title(label)
-    ax.set_ylabel("Ciclo")
+        ax.set_title(label)
+        ax.set_ylabel("Ciclo")
 
-    st.pyplot(fig)
-    plt.close(fig)
+        st.pyplot(fig)
+        plt.close(fig)
+
+# =========================================================
+# ⬇️ EXPORTAÇÃO DOS DADOS FILTRADOS
+# =========================================================
+# mesmo corte de 12 ciclos; arquivo gerado só no clique e reaproveitado por
+# (versão dos dados, filtro, formato)
+st.subheader("⬇️ Exportar dados filtrados")
+secao_exportacao(dados, VERSAO, key="exportacao", ciclo_max=LIMITE_CICLOS)
+st.divider()
 
 # =========================================================
 # 📄 RELATÓRIO FINAL
@@ -311,3 +349,14 @@ Este relatório fornece uma base sólida para análises clínicas mais aprofunda
 interpretação científica do perfil de segurança do tratamento metronômico.
 </p>
 """, unsafe_allow_html=True)
+
+
+# =========================================================
+# 🛠️ DEPURAÇÃO — TEMPOS POR ETAPA
+# =========================================================
+with st.expander("🛠️ Depuração — tempos por etapa", expanded=False):
+    st.caption(
+        "Tempo de parede e de CPU, pico de memória e uso do cache em cada "
+        "etapa desta execução."
+    )
+    st.dataframe(inst.tabela(), use_container_width=True)
@@ -2,15 +2,51 @@
 # 📦 IMPORTS
 # =========================================================
 import os
-from datetime import date
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import streamlit as st
 
 from pathlib import Path
 
+import artefatos
+from agregados import calcular_agregados, grau_maximo_por_paciente, tabela_presenca
+from bootstrap import SEMENTE, intervalos_agregados, tabela_toxicidade_ic
+from comparacao import PERMUTACOES, comparar_grupos
+from ctcae import ESCALAS, discordancia_por_ciclo, reconciliar, resumo_concordancia
+from dose import DIAS_CICLO, DOSE_PREVISTA_M2
+from exportacao import secao_exportacao
+from fila_relatorios import FilaRelatorios
+from importacao import ModuloTardio
+from incidencia import (
+    CICLOS_PROTOCOLO,
+    LIMIAR_GRAVE,
+    LIMIARES,
+    censura_por_presenca,
+    curvas_incidencia,
+    grupos_adesao,
+    primeiro_evento,
+    resumo_incidencia,
+)
+from instrumentacao import Instrumentacao, cache_miss
+from paginacao import indexar, tabela_paginada
+from qualidade import resumo_por_regra
+from reducoes import layout_de_cubo, reduzir_por_paciente, tabela_reducoes
+from retencao import (
+    calcular_retencao,
+    em_risco,
+    tabela_abandono,
+    tabela_em_risco,
+    tabela_pacientes_por_ciclo,
+)
+from toxicidade import tabela_heatmap
+
+# bibliotecas de gráficos só são importadas na primeira figura
+plt = ModuloTardio("matplotlib.pyplot")
+sns = ModuloTardio("seaborn")
+
+# tempos por etapa desta execução (painel de depuração no fim da página)
+inst = Instrumentacao()
+
 # raiz do projeto (onde o Streamlit clona o repo)
 PROJECT_ROOT = Path.cwd()
 
@@ -25,8 +61,10 @@ def find_file(filename: str) -> Path:
     return matches[0]
 
 
-METRO_FILE = find_file("planilha-metronomica-filtrada.xlsx")
-BASELINE_FILE = find_file("1_202407_Baseline.xlsx")
+with inst.etapa("resolucao_arquivos"):
+    FONTES = {nome: find_file(arq) for nome, arq in artefatos.FONTES.items()}
+    METRO_FILE = FONTES["metro"]
+    BASELINE_FILE = FONTES["baseline"]
 
 
 # =========================================================
@@ -62,6 +100,53 @@ st.caption(
     "Documento exploratório sem atribuição de autoria científica"
 )
 
+# =========================================================
+# 📂 LEITURA DOS DADOS
+# =========================================================
+# Os agregados vêm do pacote pré-calculado (`python artefatos.py`), aberto por
+# memory-map uma vez por processo. Se ele não existe ou foi gerado a partir de
+# outras planilhas, tudo é recalculado ao vivo a partir do Excel. Identificadores
+# do baseline nunca são lidos.
+@st.cache_resource(max_entries=1)
+def abrir_artefatos(versao, geracao):
+    cache_miss()
+    return artefatos.abrir(versao=versao)
+
+# pacote ausente ou de outra versão: a primeira réplica a subir publica, as
+# outras esperam a trava e mapeiam a mesma geração (memória compartilhada)
+@st.cache_resource
+def publicar_artefatos(versao):
+    cache_miss()
+    try:
+        return artefatos.publicar(FONTES)
+    except OSError:   # pasta somente leitura: cálculo ao vivo
+        return None
+
+@st.cache_data
+def load_data(versao):
+    cache_miss()
+    return calcular_agregados(*artefatos.carregar_fontes(FONTES))
+
+with inst.etapa("versao_dados"):
+    VERSAO = artefatos.versao_fontes(FONTES)
+    geracao = artefatos.geracao_atual()
+
+with inst.etapa("artefatos", cache=True):
+    dados = abrir_artefatos(VERSAO, geracao)
+
+if dados is None:
+    with inst.etapa("publicacao", cache=True):
+        geracao = publicar_artefatos(VERSAO)
+    if geracao is not None:
+        dados = abrir_artefatos(VERSAO, geracao)
+
+if dados is None:
+    with inst.etapa("carga_excel", cache=True):
+        dados = load_data(VERSAO)
+
+metro, baseline, cubo = dados["metro"], dados["baseline"], dados["cubo"]
+
+
 # =========================================================
 # 📊 DADOS DEMOGRÁFICOS
 # =========================================================
@@ -75,60 +160,31 @@ no estudo. Cada porcentagem foi calculada baseada no número de pacientes (n) qu
 </p>
 """, unsafe_allow_html=True)
 
-demo_df = pd.DataFrame({
-    "Variável": [
-        "Gênero (Masculino)",
-        "Gênero (Feminino)",
-        "Local (Pélvico)",
-        "Local (Não pélvico)",
-        "Tamanho do tumor (> 8 cm)",
-        "Tamanho do tumor (< 8 cm)",
-        "Idade (> 14 anos)",
-        "Idade (< 14 anos)",
-        "Range",
-        "Média",
-    ],
-    "Metronômica (sim) - n=96": [
-        "58 (60.4%)",
-        "38 (39.6%)",
-        "19 (19.8%)",
-        "77 (80.2%)",
-        "46 (47.9%)",
-        "50 (52.1%)",
-        "26 (27.1%)",
-        "70 (72.9%)",
-        "1.06 – 26.75",
-        "11.17",
-    ],
-    "Metronômica (não) - n=138": [
-        "77 (55.8%)",
-        "61 (44.2%)",
-        "23 (16.7%)",
-        "115 (83.3%)",
-        "71 (51.4%)",
-        "67 (48.6%)",
-        "42 (30.4%)",
-        "96 (69.6%)",
-        "0.16 – 19.06",
-        "10.60",
-    ],
-    "Total - n=234": [
-        "135 (57.7%)",
-        "99 (42.3%)",
-        "42 (17.9%)",
-        "192 (82.1%)",
-        "117 (50.0%)",
-        "117 (50.0%)",
-        "68 (29.1%)",
-        "166 (70.9%)",
-        "0.16 – 26.75",
-        "10.83",
-    ],
-})
+demo_df = dados["demografia"]
 
 st.subheader("Distribuição dos pacientes por características")
 st.dataframe(demo_df, use_container_width=True)
 
+# todas as variáveis codificadas da tabela estatística, numa única bateria de testes
+@st.cache_data
+def calcular_comparacao(versao, semente, permutacoes):
+    cache_miss()
+    return comparar_grupos(dados["coorte"], permutacoes=permutacoes, semente=semente)
+
+if "coorte" in dados:
+    st.subheader("Comparação entre grupos — Metronômica (sim × não)")
+    st.markdown("""
+<p style="text-align: justify;">
+Categóricas: Fisher exato (2×2) ou qui-quadrado; contínuas: Mann–Whitney (mediana [IQR]).
+O p de permutação embaralha o grupo entre os pacientes; <code>p_holm</code> e <code>p_fdr</code>
+corrigem o p principal para múltiplos testes (Holm e Benjamini–Hochberg).
+</p>
+""", unsafe_allow_html=True)
+
+    with inst.etapa("comparacao", cache=True):
+        comparacao_df = calcular_comparacao(VERSAO, SEMENTE, PERMUTACOES)
+    st.dataframe(comparacao_df, use_container_width=True)
+
 st.divider()
 
 
@@ -158,46 +214,6 @@ h1, h2, h3, h4 {
 """, unsafe_allow_html=True)
 
 
-# =========================================================
-# 📂 LEITURA DOS DADOS
-# =========================================================
-@st.cache_data
-def load_data():
-    metro = pd.read_excel(METRO_FILE)
-    baseline = pd.read_excel(BASELINE_FILE)
-    return metro, baseline
-
-metro, baseline = load_data()
-
-
-# =========================================================
-# 🧹 PADRONIZAÇÃO DAS COLUNAS
-# =========================================================
-metro.columns = (
-    metro.columns.str.lower()
-    .str.strip()
-    .str.normalize("NFKD")
-    .str.encode("ascii", errors="ignore")
-    .str.decode("utf-8")
-    .str.replace(" ", "_")
-)
-
-baseline.columns = (
-    baseline.columns.str.lower()
-    .str.strip()
-)
-
-# Garantir id_paciente
-if "id_paciente" not in metro.columns:
-    for c in metro.columns:
-        if c.startswith("id"):
-            metro.rename(columns={c: "id_paciente"}, inplace=True)
-            break
-
-# Garantir ciclo
-metro = metro.sort_values("id_paciente")
-metro["ciclo"] = metro.groupby("id_paciente").cumcount() + 1
-
 # =========================================================
 # 📂 LEITURA DOS DADOS
 # =========================================================
@@ -247,27 +263,9 @@ if not os.path.exists(BASELINE_FILE):
     # st.stop()
 
 
-# =========================================================
-# 🧹 PADRONIZAÇÃO DAS COLUNAS
-# =========================================================
-metro.columns = (
-    metro.columns.str.lower()
-    .str.strip()
-    .str.normalize("NFKD")
-    .str.encode("ascii", errors="ignore")
-    .str.decode("utf-8")
-    .str.replace(" ", "_")
-)
-
 # =========================================================
 # 🔧 GARANTIA DE id_paciente
 # =========================================================
-if "id_paciente" not in metro.columns:
-    for c in metro.columns:
-        if c.startswith("id"):
-            metro.rename(columns={c: "id_paciente"}, inplace=True)
-            break
-
 if "id_paciente" not in metro.columns:
     st.error("❌ Coluna de identificação do paciente não encontrada.")
     st.stop()
@@ -275,58 +273,68 @@ if "id_paciente" not in metro.columns:
 # =========================================================
 # 🔧 GARANTIA ÚNICA DE CICLO
 # =========================================================
-metro = metro.sort_values("id_paciente")
-metro["ciclo"] = metro.groupby("id_paciente").cumcount() + 1
+# ciclo = ordem do registro dentro do paciente (calculado em `calcular_agregados`)
 ciclo_col = "ciclo"
 
 
 # =========================================================
 # 📌 BASELINE
 # =========================================================
-def calcular_idade(d):
-    try:
-        d = pd.to_datetime(d)
-        hoje = date.today()
-        return hoje.year - d.year - ((hoje.month, hoje.day) < (d.month, d.day))
-    except:
-        return None
-
-baseline_view = pd.DataFrame()
-
-if not baseline.empty:
-    baseline.columns = baseline.columns.str.lower().str.strip()
-    if "data de nascimento" in baseline.columns:
-        baseline["idade"] = pd.to_datetime(
-            baseline["data de nascimento"], errors="coerce"
-        ).apply(calcular_idade)
-
-    remover = [
-        "nome","sobrenome","iniciais","rg",
-        "instituição","registro hospitalar",
-        "data de nascimento","data tcle"
-    ]
-
-    baseline = baseline[[c for c in baseline.columns if c not in remover]]
-    baseline.rename(columns={"id": "id_paciente"}, inplace=True)
-    baseline_view = baseline.head(20)
-
-st.header("📌 Baseline (20 primeiros registros — anonimizado)")
-st.dataframe(baseline_view, use_container_width=True)
+# ordens de cada coluna e texto de busca calculados uma vez por versão dos
+# dados; a cada interação só a página visível é enviada ao navegador
+@st.cache_data
+def tabela_indexada(versao, nome):
+    cache_miss()
+    return indexar(dados[nome])
+
+st.header("📌 Baseline (anonimizado)")
+with inst.etapa("indexacao", cache=True):
+    baseline_idx = tabela_indexada(VERSAO, "baseline")
+tabela_paginada(baseline_idx, key="baseline")
 st.divider()
 
 
 # =========================================================
 # 🧾 Nº DE CICLOS POR PACIENTE
 # =========================================================
+# em risco por ciclo a partir do último ciclo de cada paciente (um único bincount);
+# os filtros de coorte entram como pesos, sem reagrupar a planilha
+with inst.etapa("pivotagem"):
+    retencao = calcular_retencao(cubo, dados["presenca"])
+    cycles_df = tabela_pacientes_por_ciclo(retencao)
 
+st.subheader("🧾 Número de pacientes por ciclo")
+st.dataframe(cycles_df, use_container_width=True)
 
-cycles_df = pd.DataFrame(
-    [["N_pacientes", 96,93,90,88,82,74,71,71,69,68,66,62,35,15,4,2,1,1,1]],
-    columns=["Métrica"] + [f"Ciclo_{i}" for i in range(1, 20)]
+grave = (grau_maximo_por_paciente(cubo, escala_clinica=True) >= 3).any(axis=1)
+curva_retencao = em_risco(
+    retencao, grupos=np.where(grave, "Com grau ≥ 3", "Sem grau ≥ 3")
 )
+curva_retencao = pd.concat([em_risco(retencao), curva_retencao], ignore_index=True)
 
-st.subheader("🧾 Número de pacientes por ciclo")
-st.dataframe(cycles_df, use_container_width=True)
+col1, col2 = st.columns(2)
+with col1, inst.etapa("figuras"):
+    fig, ax = plt.subplots(figsize=(7, 4))
+    for grupo, c in curva_retencao.groupby("grupo", sort=False):
+        ax.step(c["ciclo"], c["retencao"], where="post", label=grupo)
+    ax.axvline(CICLOS_PROTOCOLO, color="grey", linestyle=":", linewidth=1)
+    ax.set_xlabel("Ciclo")
+    ax.set_ylabel("Pacientes em tratamento (%)")
+    ax.set_ylim(0, 105)
+    ax.legend(title="Toxicidade máxima")
+    ax.set_title("Curva de retenção")
+    st.pyplot(fig)
+    plt.close(fig)
+
+with col2:
+    abandono_df = tabela_abandono(retencao)
+    st.markdown("**Saída do tratamento por paciente**")
+    st.dataframe(
+        abandono_df["motivo"].value_counts().rename_axis("Motivo").reset_index(name="Pacientes"),
+        use_container_width=True,
+    )
+    with st.expander("Detalhe por paciente"):
+        st.dataframe(abandono_df, use_container_width=True)
 
 
 # =========================================================
@@ -334,26 +342,16 @@ st.dataframe(cycles_df, use_container_width=True)
 # =========================================================
 st.subheader("🧾 Heatmap — Presença de ciclos por paciente")
 
-df_presenca = metro[["id_paciente", "ciclo"]].copy()
-df_presenca["presente"] = 1
-
-hm_presenca = (
-    df_presenca
-    .pivot_table(
-        index="ciclo",
-        columns="id_paciente",
-        values="presente",
-        aggfunc="max"
-    )
-    .fillna(0)
-)
+with inst.etapa("pivotagem"):
+    hm_presenca = tabela_presenca(dados["presenca"], cubo)
 
-fig, ax = plt.subplots(figsize=(16, 6))
-sns.heatmap(hm_presenca, cmap="Blues", ax=ax)
-ax.set_xlabel("Paciente")
-ax.set_ylabel("Ciclo")
-st.pyplot(fig)
-plt.close(fig)
+with inst.etapa("figuras"):
+    fig, ax = plt.subplots(figsize=(16, 6))
+    sns.heatmap(hm_presenca, cmap="Blues", ax=ax)
+    ax.set_xlabel("Paciente")
+    ax.set_ylabel("Ciclo")
+    st.pyplot(fig)
+    plt.close(fig)
 
 st.markdown("""
 <p style="text-align: justify;">
@@ -368,30 +366,10 @@ ausência de dados.
 # =========================================================
 # 📊 RESUMO POR PACIENTE
 # =========================================================
-def to_float(x):
-    try:
-        return float(str(x).replace(",", "."))
-    except:
-        return np.nan
-
-for col in ["pesomt", "hemoglobinamt", "leucocitosmt"]:
-    if col in metro.columns:
-        metro[col] = metro[col].apply(to_float)
-
-resumo_df = (
-    metro.groupby("id_paciente")
-    .agg(
-        n_ciclos=("id_paciente", "count"),
-        peso_medio=("pesomt", "mean"),
-        hb_media=("hemoglobinamt", "mean"),
-        leuco_medio=("leucocitosmt", "mean"),
-    )
-    .reset_index()
-    .sort_values("n_ciclos", ascending=False)
-)
-
 st.subheader("📊 Resumo por paciente")
-st.dataframe(resumo_df, use_container_width=True)
+with inst.etapa("indexacao", cache=True):
+    resumo_idx = tabela_indexada(VERSAO, "resumo")
+tabela_paginada(resumo_idx, key="resumo", ordenar_por="n_ciclos", crescente=False)
 
 # =========================================================
 # 📊 DISTRIBUIÇÃO DOS GRAUS
@@ -411,13 +389,14 @@ with col1:
         index=["Grau 0", "Grau 1", "Grau 2", "Grau 3", "Grau 4"]
     )
 
-    fig, ax = plt.subplots(figsize=(6, 4))
-    tox_hema.T.plot(kind="bar", stacked=True, ax=ax, colormap="YlOrBr")
-    ax.set_xlabel("Toxicidade")
-    ax.set_ylabel("Percentual de pacientes (%)")
+    with inst.etapa("figuras"):
+        fig, ax = plt.subplots(figsize=(6, 4))
+        tox_hema.T.plot(kind="bar", stacked=True, ax=ax, colormap="YlOrBr")
+        ax.set_xlabel("Toxicidade")
+        ax.set_ylabel("Percentual de pacientes (%)")
 
-    st.pyplot(fig)
-    plt.close(fig)
+        st.pyplot(fig)
+        plt.close(fig)
 
 with col2:
     st.subheader("Toxicidades não hematológicas")
@@ -435,48 +414,86 @@ with col2:
         index=["Grau 0", "Grau 1", "Grau 2", "Grau 3", "Grau 4"]
     )
 
-    fig, ax = plt.subplots(figsize=(6, 4))
-    tox_nao_hema.T.plot(kind="bar", stacked=True, ax=ax, colormap="YlOrBr")
+    with inst.etapa("figuras"):
+        fig, ax = plt.subplots(figsize=(6, 4))
+        tox_nao_hema.T.plot(kind="bar", stacked=True, ax=ax, colormap="YlOrBr")
 
-    # 🔽 ADICIONE ESTAS DUAS LINHAS
-    ax.set_xlabel("Toxicidade")
-    ax.set_ylabel("Percentual de pacientes (%)")
+        # 🔽 ADICIONE ESTAS DUAS LINHAS
+        ax.set_xlabel("Toxicidade")
+        ax.set_ylabel("Percentual de pacientes (%)")
 
-    st.pyplot(fig)
+        st.pyplot(fig)
 
 
 # =========================================================
 # 📋 TABELAS DE TOXICIDADE
 # =========================================================
+# Contagens do grau máximo por paciente, com IC 95% por bootstrap de pacientes
+# (todas as toxicidades e graus saem das mesmas réplicas).
+@st.cache_data
+def calcular_intervalos(versao, semente, replicas):
+    cache_miss()
+    return intervalos_agregados(dados, replicas=replicas, semente=semente)
+
+col_b, col_s = st.columns(2)
+replicas = col_b.selectbox("Réplicas bootstrap", [1_000, 2_000, 5_000, 10_000], index=3)
+semente = col_s.number_input("Semente", value=SEMENTE, step=1)
+
+with inst.etapa("bootstrap", cache=True):
+    ic = calcular_intervalos(VERSAO, int(semente), replicas)
+
+rotulos_tabela = {
+    "anemiahbmt": "AnemiaHBMT", "neutropeniamt": "NeutropeniaMT",
+    "plaquetopeniamt": "PlaquetopeniaMT", "diarreiamt": "DiarreiaMT",
+    "hepatica_bt_mt": "Hepatica_BT_MT", "hepatica_tgo_mt": "Hepatica_TGO_MT",
+    "hepatica_tgp_mt": "Hepatica_TGP_MT", "mucositemt": "MucositeMT",
+    "nauseasmt": "NauseasMT", "neutropeniafebremt": "NeutropeniaFebreMT",
+    "perdadepesomt": "PerdaDePesoMT", "renal_creatinamt": "Renal_CreatinaMT",
+    "vomitosmt": "VomitosMT",
+}
+hematologicas = ["anemiahbmt", "neutropeniamt", "plaquetopeniamt"]
+
+tabela_ic = tabela_toxicidade_ic(ic["toxicidade"])
+tabela_ic = tabela_ic.sort_values("Toxicidade", key=lambda s: s.map(rotulos_tabela))
+hema = tabela_ic["Toxicidade"].isin(hematologicas)
+
 st.header("📋 Tabela de toxicidade por paciente (hematológicas)")
+st.caption(f"n (%) [IC 95% bootstrap, {replicas:,} réplicas de pacientes]".replace(",", "."))
 
-st.dataframe(pd.DataFrame([
-    ["AnemiaHBMT", 96, "51 (53.1%)", "28 (29.2%)", "11 (11.5%)", "3 (3.1%)", "0 (0.0%)", "3 (3.1%)"],
-    ["NeutropeniaMT", 96, "5 (5.2%)", "11 (11.5%)", "10 (10.4%)", "32 (33.3%)", "35 (36.5%)", "3 (3.1%)"],
-    ["PlaquetopeniaMT", 96, "55 (57.3%)", "29 (30.2%)", "2 (2.1%)", "5 (5.2%)", "2 (2.1%)", "3 (3.1%)"],
-], columns=[
-    "Toxicidade", "N pacientes", "Grau 0", "Grau 1",
-    "Grau 2", "Grau 3", "Grau 4", "Não avaliado"
-]), use_container_width=True)
+st.dataframe(
+    tabela_ic[hema].replace({"Toxicidade": rotulos_tabela}).reset_index(drop=True),
+    use_container_width=True,
+)
 
 
 st.header("📋 Tabela de toxicidade por paciente (não hematológicas)")
 
-st.dataframe(pd.DataFrame([
-    ["DiarreiaMT", 96, "81 (84.4%)", "11 (11.5%)", "2 (2.1%)", "0 (0.0%)", "0 (0.0%)", "2 (2.1%)"],
-    ["Hepatica_BT_MT", 96, "87 (90.6%)", "3 (3.1%)", "1 (1.0%)", "0 (0.0%)", "1 (1.0%)", "4 (4.2%)"],
-    ["Hepatica_TGO_MT", 96, "79 (82.3%)", "10 (10.4%)", "1 (1.0%)", "2 (2.1%)", "1 (1.0%)", "3 (3.1%)"],
-    ["Hepatica_TGP_MT", 96, "74 (77.1%)", "11 (11.5%)", "3 (3.1%)", "2 (2.1%)", "3 (3.1%)", "3 (3.1%)"],
-    ["MucositeMT", 96, "86 (89.6%)", "3 (3.1%)", "5 (5.2%)", "0 (0.0%)", "0 (0.0%)", "2 (2.1%)"],
-    ["NauseasMT", 96, "73 (76.0%)", "16 (16.7%)", "5 (5.2%)", "0 (0.0%)", "0 (0.0%)", "2 (2.1%)"],
-    ["NeutropeniaFebreMT", 96, "73 (76.0%)", "0 (0.0%)", "0 (0.0%)", "19 (19.8%)", "2 (2.1%)", "2 (2.1%)"],
-    ["PerdaDePesoMT", 96, "86 (89.6%)", "6 (6.2%)", "1 (1.0%)", "0 (0.0%)", "0 (0.0%)", "3 (3.1%)"],
-    ["Renal_CreatinaMT", 96, "87 (90.6%)", "5 (5.2%)", "0 (0.0%)", "1 (1.0%)", "0 (0.0%)", "3 (3.1%)"],
-    ["VomitosMT", 96, "77 (80.2%)", "9 (9.4%)", "8 (8.3%)", "0 (0.0%)", "0 (0.0%)", "2 (2.1%)"],
-], columns=[
-    "Toxicidade", "N pacientes", "Grau 0", "Grau 1",
-    "Grau 2", "Grau 3", "Grau 4", "Não avaliado"
-]), use_container_width=True)
+st.dataframe(
+    tabela_ic[~hema].replace({"Toxicidade": rotulos_tabela}).reset_index(drop=True),
+    use_container_width=True,
+)
+
+# Pior grau, carga (soma dos graus) e ciclos com grau ≥ k: uma passada de
+# `reduceat` sobre o cubo, todas as toxicidades de uma vez.
+@st.cache_data
+def calcular_reducoes(versao):
+    cache_miss()
+    return tabela_reducoes(reduzir_por_paciente(layout_de_cubo(dados["cubo"], escala_clinica=True)))
+
+with inst.etapa("reducoes", cache=True):
+    reducoes = calcular_reducoes(VERSAO)
+
+with st.expander("Carga de toxicidade por paciente"):
+    tox_carga = st.selectbox(
+        "Toxicidade", list(rotulos_tabela), format_func=rotulos_tabela.get, key="tox_carga"
+    )
+    st.dataframe(
+        reducoes[reducoes["toxicidade"] == tox_carga]
+        .drop(columns="toxicidade")
+        .sort_values(["carga", "pior_grau"], ascending=False)
+        .reset_index(drop=True),
+        use_container_width=True,
+    )
 
 
 # =========================================================
@@ -499,45 +516,225 @@ tox_cols = [
     ("Hepatica_TGP_MT", "hepatica_tgp_mt", "Alterações de TGP."),
 ]
 
-def grau(x):
-    try:
-        return int(str(x).split("-")[0])
-    except:
-        return np.nan
-
+# grau máximo já decodificado no cubo (pacote de artefatos ou cálculo ao vivo)
 # processar heatmaps em pares
 for i in range(0, len(tox_cols), 2):
     cols = st.columns(2)
 
     for j, (label, col, descricao) in enumerate(tox_cols[i:i+2]):
         with cols[j]:
-            if col not in metro.columns:
+            if col not in cubo.colunas:
                 st.warning(f"Coluna {label} não encontrada.")
                 continue
 
-            df = metro.copy()
-            df[col] = df[col].apply(grau)
-
-            tabela = (
-                df.pivot_table(
-                    index="ciclo",
-                    columns="id_paciente",
-                    values=col,
-                    aggfunc="max"
-                )
-                .fillna(0)
-            )
+            with inst.etapa("pivotagem"):
+                tabela = tabela_heatmap(cubo, col)
 
-            fig, ax = plt.subplots(figsize=(7, 4))
-            sns.heatmap(tabela, cmap="Reds", ax=ax, cbar=True)
-            ax.set_title(label)
-            ax.set_xlabel("Paciente")
-            ax.set_ylabel("Ciclo")
+            with inst.etapa("figuras"):
+                fig, ax = plt.subplots(figsize=(7, 4))
+                sns.heatmap(tabela, cmap="Reds", ax=ax, cbar=True)
+                ax.set_title(label)
+                ax.set_xlabel("Paciente")
+                ax.set_ylabel("Ciclo")
+
+                st.pyplot(fig)
+                plt.close(fig)
+
+            st.caption(descricao)
+            st.dataframe(tabela_em_risco(retencao, col), use_container_width=True)
 
+# =========================================================
+# ⏱️ TEMPO ATÉ A PRIMEIRA TOXICIDADE
+# =========================================================
+st.header("⏱️ Tempo até a primeira toxicidade (incidência acumulada por ciclo)")
+
+st.markdown("""
+<p style="text-align: justify;">
+Para cada toxicidade, o evento é o primeiro ciclo em que o paciente atinge o grau escolhido.
+Pacientes sem evento são censurados no último ciclo observado. As curvas mostram a incidência
+acumulada estimada por Kaplan–Meier (1 − S), separadas por adesão ao protocolo
+(completou ou não os 12 ciclos previstos).
+</p>
+""", unsafe_allow_html=True)
+
+@st.cache_data
+def calcular_incidencia(versao):
+    cache_miss()
+    ev = primeiro_evento(cubo, censura=censura_por_presenca(dados["presenca"]))
+    return curvas_incidencia(ev, grupos_adesao(ev))
+
+with inst.etapa("incidencia", cache=True):
+    curvas = calcular_incidencia(VERSAO)
+
+rotulos_tox = {col: label for label, col, _ in tox_cols}
+limiar = st.selectbox(
+    "Grau mínimo do evento", LIMIARES, index=LIMIARES.index(LIMIAR_GRAVE),
+    format_func=lambda g: f"Grau ≥ {g}",
+)
+selecionadas = st.multiselect(
+    "Toxicidades", list(rotulos_tox), default=["neutropeniamt", "hepatica_tgp_mt"],
+    format_func=rotulos_tox.get,
+)
+
+for i in range(0, len(selecionadas), 2):
+    cols = st.columns(2)
+    for j, col in enumerate(selecionadas[i:i+2]):
+        with cols[j], inst.etapa("figuras"):
+            fig, ax = plt.subplots(figsize=(7, 4))
+            sel = curvas[
+                (curvas["toxicidade"] == col) & (curvas["limiar"] == limiar)
+                & (curvas["em_risco"] > 0)
+            ]
+            for grupo, c in sel.groupby("grupo"):
+                ax.step(c["ciclo"], 100 * c["km"], where="post", label=grupo)
+            ax.set_title(f"{rotulos_tox[col]} — grau ≥ {limiar}")
+            ax.set_xlabel("Ciclo")
+            ax.set_ylabel("Incidência acumulada (%)")
+            ax.set_ylim(0, 100)
+            ax.legend(title="Adesão")
             st.pyplot(fig)
             plt.close(fig)
 
-            st.caption(descricao)
+            st.dataframe(
+                sel.pivot(index="grupo", columns="ciclo", values="em_risco")
+                .rename(columns=int).rename_axis("Em risco").fillna(0).astype(int),
+                use_container_width=True,
+            )
+
+resumo_inc = resumo_incidencia(curvas, limiar)
+resumo_inc["toxicidade"] = resumo_inc["toxicidade"].map(rotulos_tox)
+st.subheader(f"Resumo — primeiro evento de grau ≥ {limiar}")
+st.dataframe(resumo_inc, use_container_width=True)
+
+
+# =========================================================
+# 💊 INTENSIDADE DE DOSE E EXPOSIÇÃO
+# =========================================================
+if "exposicao" in dados:
+    st.header("💊 Intensidade de dose e exposição acumulada")
+
+    st.markdown(f"""
+<p style="text-align: justify;">
+A superfície corporal (SC) é recalculada a partir de peso e altura (Mosteller, DuBois e Haycock) e
+comparada à registrada. A intensidade relativa de dose (IRD) compara a dose entregue por m² e por
+dia com a prevista ({DOSE_PREVISTA_M2["vimblastina"]:g} mg/m² de vimblastina e
+{DOSE_PREVISTA_M2["ciclofosfamida"]:g} mg/m² de ciclofosfamida a cada {DIAS_CICLO} dias),
+usando o intervalo real entre as datas de início dos ciclos.
+</p>
+""", unsafe_allow_html=True)
+
+    doses_df = dados["dose_por_ciclo"]
+    exposicao_df = dados["exposicao"]
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.markdown("**Conferência da superfície corporal**")
+        st.dataframe(
+            doses_df["sc_situacao"].value_counts().rename_axis("Situação")
+            .reset_index(name="Registros"),
+            use_container_width=True,
+        )
+    with col2:
+        st.markdown("**Registros com SC divergente ou sem medidas**")
+        st.dataframe(
+            doses_df.loc[doses_df["sc_situacao"] != "ok", [
+                "id_paciente", "ciclo", "peso", "altura", "sc_registrada",
+                "sc_mosteller", "sc_diferenca_rel", "sc_situacao",
+            ]],
+            use_container_width=True,
+        )
+
+    st.subheader("Exposição acumulada por paciente")
+    st.dataframe(exposicao_df, use_container_width=True)
+
+    st.subheader("Toxicidade × exposição")
+    col_t, col_m = st.columns(2)
+    tox_exp = col_t.selectbox(
+        "Toxicidade", list(rotulos_tox), index=list(rotulos_tox).index("neutropeniamt"),
+        format_func=rotulos_tox.get, key="tox_exposicao",
+    )
+    metrica = col_m.selectbox(
+        "Exposição",
+        [f"{f}_{m}" for f in DOSE_PREVISTA_M2 for m in ("acumulada_mg_m2", "ird")],
+    )
+
+    grau_max = pd.DataFrame({
+        "id_paciente": cubo.ids,
+        "grau_maximo": grau_maximo_por_paciente(cubo, escala_clinica=True)[
+            :, cubo.colunas.index(tox_exp)
+        ],
+    })
+    tox_x_exp = exposicao_df.merge(grau_max, on="id_paciente").dropna(
+        subset=["grau_maximo", metrica]
+    )
+
+    with inst.etapa("figuras"):
+        fig, ax = plt.subplots(figsize=(8, 4))
+        sns.boxplot(data=tox_x_exp, x="grau_maximo", y=metrica, ax=ax, color="#f4a582")
+        sns.stripplot(data=tox_x_exp, x="grau_maximo", y=metrica, ax=ax,
+                      color="black", size=3, alpha=0.6)
+        ax.set_xlabel(f"Grau máximo — {rotulos_tox[tox_exp]}")
+        ax.set_ylabel(metrica)
+        st.pyplot(fig)
+        plt.close(fig)
+
+# =========================================================
+# 🧪 QUALIDADE DOS DADOS
+# =========================================================
+# regras de `qualidade.REGRAS`, avaliadas junto com os agregados (uma vez por
+# versão dos dados): duplicidades, faixas laboratoriais, graus ilegíveis e datas
+if "qualidade" in dados:
+    st.header("🧪 Qualidade dos dados")
+    st.markdown("""
+<p style="text-align: justify;">
+Registros que violam as regras de consistência da planilha por ciclo. Códigos de
+"não coletado" (9999, datas em 2999) contam como ausentes; graus ilegíveis viram
+NaN nos heatmaps e valores fora de faixa distorcem as médias laboratoriais.
+</p>
+""", unsafe_allow_html=True)
+
+    st.dataframe(resumo_por_regra(dados["qualidade"]), use_container_width=True, hide_index=True)
+    with st.expander("Violações por registro"):
+        with inst.etapa("indexacao", cache=True):
+            violacoes_idx = tabela_indexada(VERSAO, "violacoes")
+        tabela_paginada(violacoes_idx, key="violacoes")
+    st.divider()
+
+# =========================================================
+# 🔬 GRAUS DERIVADOS DOS EXAMES × REGISTRADOS
+# =========================================================
+# grau recalculado dos valores laboratoriais (faixas do formulário) em todos os
+# ciclos de uma vez, comparado ao grau lançado pelo clínico
+@st.cache_data
+def calcular_reconciliacao(versao):
+    cache_miss()
+    rec = reconciliar(dados["metro"])
+    return rec, resumo_concordancia(rec), discordancia_por_ciclo(rec)
+
+if {e.laboratorio for e in ESCALAS} & set(metro.columns):
+    st.header("🔬 Graus derivados dos exames × registrados")
+    with inst.etapa("ctcae", cache=True):
+        reconciliacao, concordancia, discordancia_ciclo = calcular_reconciliacao(VERSAO)
+
+    st.markdown("""
+<p style="text-align: justify;">
+O grau de cada toxicidade laboratorial é recalculado a partir do exame do ciclo com as
+faixas do formulário (CTCAE adaptado; enzimas e creatinina em múltiplos do limite superior
+da normalidade) e comparado ao grau registrado. Subestimado: registro abaixo do derivado.
+</p>
+""", unsafe_allow_html=True)
+    st.dataframe(concordancia, use_container_width=True, hide_index=True)
+
+    with st.expander("% de discordância por ciclo"):
+        st.dataframe(discordancia_ciclo, use_container_width=True)
+    with st.expander("Registros discordantes"):
+        st.dataframe(
+            reconciliacao[reconciliacao["status"] == "discorda"]
+            .drop(columns="status")
+            .reset_index(drop=True),
+            use_container_width=True,
+        )
+    st.divider()
 
 # =========================================================
 # 📄 RELATÓRIO GERAL — TEXTO COMPLETO
@@ -607,3 +804,96 @@ proporção limitada da coorte. Este relatório fornece uma base descritiva robu
 análises futuras e interpretações clínicas mais aprofundadas.
 </p>
 """, unsafe_allow_html=True)
+
+
+# =========================================================
+# ⬇️ EXPORTAÇÃO DOS DADOS FILTRADOS
+# =========================================================
+# o arquivo só é gerado no clique, em lotes a partir das tabelas em cache, e
+# fica no disco por (versão dos dados, filtro, formato)
+st.subheader("⬇️ Exportar dados filtrados")
+st.caption(
+    "Registros por ciclo (com graus decodificados), resumo por paciente, tabela de "
+    "toxicidade e graus por paciente × ciclo, restritos aos pacientes, ciclos e "
+    "toxicidades escolhidos."
+)
+secao_exportacao(dados, VERSAO, key="exportacao")
+st.divider()
+
+
+# =========================================================
+# 🖨️ RELATÓRIO COMPLETO EM SEGUNDO PLANO
+# =========================================================
+# uma fila por processo, comum a todas as sessões: cliques repetidos (ou de
+# outros usuários) com os mesmos dados e filtros caem na mesma tarefa
+@st.cache_resource
+def fila_relatorios():
+    return FilaRelatorios()
+
+st.subheader("🖨️ Relatório completo (HTML / PDF)")
+st.caption(
+    f"Gerado em segundo plano com os dados atuais e o grau mínimo do evento "
+    f"escolhido na incidência acumulada (grau ≥ {limiar}); relatórios já "
+    "gerados com os mesmos parâmetros são reaproveitados."
+)
+if st.button("Gerar PDF", key="gerar_pdf"):
+    tarefa = fila_relatorios().pedir(VERSAO, FONTES, {"limiar": limiar})
+    st.session_state["relatorio"] = tarefa.chave
+
+def _relatorio_pedido():
+    return fila_relatorios().tarefas.get(st.session_state.get("relatorio"))
+
+def acompanhar_relatorio(em_andamento):
+    fila = fila_relatorios()
+    tarefa = _relatorio_pedido()
+    if tarefa is None:
+        return
+
+    if tarefa.estado in ("na_fila", "executando"):
+        eta = tarefa.eta(fila.duracao_tipica())
+        texto = (
+            "Na fila" if tarefa.estado == "na_fila"
+            else f"Gerando ({tarefa.nos}/{tarefa.total_nos} seções)"
+        )
+        if eta is not None:
+            texto += f" — cerca de {eta:.0f} s restantes"
+        st.progress(tarefa.progresso, text=texto)
+        return
+
+    if em_andamento:
+        st.rerun()   # terminou: uma execução completa desliga o run_every
+
+    if tarefa.estado == "pronto":
+        st.success(f"Relatório pronto (grau ≥ {tarefa.parametros['filtros']['limiar']}).")
+        col1, col2 = st.columns(2)
+        with open(tarefa.arquivos["html"], "rb") as f:
+            col1.download_button("⬇️ HTML (zip com figuras)", f.read(),
+                                 file_name="relatorio_html.zip", mime="application/zip")
+        if "pdf" in tarefa.arquivos:
+            with open(tarefa.arquivos["pdf"], "rb") as f:
+                col2.download_button("⬇️ PDF", f.read(), file_name="relatorio.pdf",
+                                     mime="application/pdf")
+        else:
+            col2.info("PDF indisponível neste servidor (weasyprint ausente); use o HTML.")
+
+    else:
+        st.error("A geração do relatório falhou.")
+        with st.expander("Detalhes"):
+            st.code(tarefa.erro or "")
+
+# só este trecho é reexecutado a cada segundo enquanto a tarefa anda, não a página
+_pedido = _relatorio_pedido()
+_em_andamento = _pedido is not None and _pedido.estado in ("na_fila", "executando")
+st.fragment(acompanhar_relatorio, run_every=1 if _em_andamento else None)(_em_andamento)
+st.divider()
+
+
+# =========================================================
+# 🛠️ DEPURAÇÃO — TEMPOS POR ETAPA
+# =========================================================
+with st.expander("🛠️ Depuração — tempos por etapa", expanded=False):
+    st.caption(
+        "Tempo de parede e de CPU, pico de memória e uso do cache em cada "
+        "etapa desta execução."
+    )
+    st.dataframe(inst.tabela(), use_container_width=True)
@@ -0,0 +1,304 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+try:                       # trava entre réplicas (só POSIX)
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from agregados import (
+    COLUNAS_ESTATISTICO,
+    COLUNAS_IDADES,
+    COLUNAS_METRO,
+    TABELAS_VARIAS_ABAS,
+    calcular_agregados,
+)
+from dados import (
+    ler_baseline_anonimizado,
+    ler_em_paralelo,
+    ler_metronomica,
+    ler_planilha,
+    versao_dados,
+)
+from instrumentacao import Instrumentacao
+from toxicidade import Cubo
+
+
+# =========================================================
+# 📁 PATHS
+# =========================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_PADRAO = os.path.join(BASE_DIR, "output", "artefatos")
+DIR_CACHE_ABAS = os.path.join(BASE_DIR, "output", "cache_abas")
+
+# Fontes, na ordem em que entram no hash de versão.
+FONTES = {
+    "metro": "planilha-metronomica-filtrada.xlsx",
+    "baseline": "1_202407_Baseline.xlsx",
+    "estatistico": "Tabela-ewing_estatistico-22-ago-25.xlsx",
+    "idades": "Idades-range-media.xlsx",
+}
+
+# Sobe quando o layout do pacote muda: pacotes antigos passam a ser ignorados.
+VERSAO_FORMATO = 7
+
+# O manifesto é o cabeçalho versionado do pacote: aponta para a geração
+# (subpasta) atual e é trocado atomicamente. Cada réplica das apps abre a
+# geração por memory-map; as matrizes .npy e as colunas numéricas sem null
+# ficam no page cache do SO, uma vez só para todas as réplicas. Texto,
+# categorias e inteiros com null são convertidos pelo pandas em memória
+# própria de cada processo (metro, baseline, coorte, violacoes). Uma
+# reconstrução grava uma geração nova ao lado e só então vira o manifesto:
+# quem ainda usa a anterior não é afetado.
+MANIFESTO = "manifesto.json"
+TRAVA = ".construcao.lock"
+MANTER_GERACOES = 2
+TABELAS = [
+    "metro", "baseline", "resumo", "resumo_por_ciclo",
+    "distribuicao_por_ciclo", "demografia", "coorte",
+    "dose_por_ciclo", "exposicao", "violacoes", "qualidade",
+]
+MATRIZES = ["cubo_graus", "cubo_ids", "cubo_ciclos", "presenca"]
+
+
+def fontes_padrao(base_dir=BASE_DIR):
+    return {nome: os.path.join(base_dir, arq) for nome, arq in FONTES.items()}
+
+
+def versao_fontes(fontes):
+    return versao_dados(*(fontes[nome] for nome in FONTES))
+
+
+# =========================================================
+# 🏗️ CONSTRUÇÃO DO PACOTE
+# =========================================================
+def carregar_fontes(fontes, inst=None, processos=None, cache_dir=DIR_CACHE_ABAS):
+    """(metro, baseline, estatistico, idades), as quatro planilhas lidas em paralelo.
+
+    Metronômica e estatística: todas as abas compatíveis, com cache por aba.
+    """
+    inst = inst or Instrumentacao()
+    with inst.etapa("carga_excel"):
+        tabelas = ler_em_paralelo({
+            "metro": (ler_metronomica, fontes["metro"], COLUNAS_METRO),
+            "baseline": (ler_baseline_anonimizado, fontes["baseline"]),
+            "estatistico": (ler_planilha, fontes["estatistico"], COLUNAS_ESTATISTICO),
+            "idades": (ler_planilha, fontes["idades"], COLUNAS_IDADES),
+        }, processos, varias_abas=TABELAS_VARIAS_ABAS, cache_dir=cache_dir)
+    return tuple(tabelas.values())
+
+
+def _gravar_tabela(df, path):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    # floats com NaN (não null): colunas numéricas sem null são lidas sem cópia
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_floating(campo.type) and tabela.column(i).null_count:
+            valores = df[campo.name].to_numpy(dtype=campo.type.to_pandas_dtype())
+            tabela = tabela.set_column(i, campo, pa.array(valores, type=campo.type))
+    with pa.OSFile(path, "wb") as sink:
+        with ipc.new_file(sink, tabela.schema) as writer:
+            writer.write_table(tabela)
+
+
+def construir(fontes=None, destino=DIR_PADRAO, inst=None):
+    """Calcula todos os agregados dos painéis e publica uma geração nova em `destino`.
+
+    Tabelas em Arrow IPC (.arrow) e matrizes em .npy, ambas abertas por
+    memory-map na leitura. O manifesto é trocado por último (`os.replace`):
+    uma geração sem manifesto (construção interrompida) nunca é vista.
+    """
+    fontes = fontes or fontes_padrao()
+    inst = inst or Instrumentacao()
+
+    with inst.etapa("versao_dados"):
+        versao = versao_fontes(fontes)
+
+    agregados = calcular_agregados(*carregar_fontes(fontes, inst), inst=inst)
+    cubo = agregados["cubo"]
+
+    with inst.etapa("gravacao"):
+        geracao = f"{versao}-{datetime.now():%Y%m%d%H%M%S%f}"
+        pasta = os.path.join(destino, geracao)
+        os.makedirs(pasta)
+
+        # dose/exposição e demografia/coorte dependem das colunas e planilhas presentes
+        tabelas = [nome for nome in TABELAS if nome in agregados]
+        for nome in tabelas:
+            _gravar_tabela(agregados[nome], os.path.join(pasta, f"{nome}.arrow"))
+
+        matrizes = {
+            "cubo_graus": cubo.graus,
+            "cubo_ids": cubo.ids,
+            "cubo_ciclos": cubo.ciclos,
+            "presenca": agregados["presenca"],
+        }
+        for nome, arr in matrizes.items():
+            np.save(os.path.join(pasta, f"{nome}.npy"), arr)
+
+        manifesto = {
+            "versao_formato": VERSAO_FORMATO,
+            "versao_dados": versao,
+            "geracao": geracao,
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "fontes": {nome: os.path.basename(p) for nome, p in fontes.items()},
+            "cubo_colunas": cubo.colunas,
+            "tabelas": tabelas,
+            "matrizes": MATRIZES,
+        }
+        tmp = os.path.join(destino, MANIFESTO + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, os.path.join(destino, MANIFESTO))
+        _podar_geracoes(destino, geracao)
+
+    return manifesto
+
+
+def _podar_geracoes(destino, atual, manter=MANTER_GERACOES):
+    # apagar uma geração ainda mapeada por outra réplica é seguro no POSIX:
+    # os arquivos só somem quando o último mapeamento é desfeito
+    geracoes = sorted(
+        (g for g in os.listdir(destino)
+         if g != atual and os.path.isdir(os.path.join(destino, g))),
+        key=lambda g: os.path.getmtime(os.path.join(destino, g)), reverse=True,
+    )
+    for antiga in geracoes[manter - 1:]:
+        shutil.rmtree(os.path.join(destino, antiga), ignore_errors=True)
+
+
+def publicar(fontes=None, destino=DIR_PADRAO, inst=None):
+    """Id da geração feita a partir das fontes atuais, construindo só se preciso.
+
+    Com várias réplicas subindo juntas, a primeira constrói (trava em arquivo)
+    e as demais esperam e recebem a geração publicada, em vez de cada uma
+    recalcular tudo em memória própria.
+    """
+    fontes = fontes or fontes_padrao()
+    versao = versao_fontes(fontes)
+
+    def publicada():
+        manifesto = ler_manifesto(destino) or {}
+        atual = (manifesto.get("versao_formato"), manifesto.get("versao_dados"))
+        return manifesto["geracao"] if atual == (VERSAO_FORMATO, versao) else None
+
+    if publicada() is None:
+        os.makedirs(destino, exist_ok=True)
+        with open(os.path.join(destino, TRAVA), "w") as trava:
+            if fcntl is not None:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            if publicada() is None:   # outra réplica pode ter publicado enquanto esperávamos
+                construir(fontes, destino, inst)
+    return publicada()
+
+
+# =========================================================
+# 📂 LEITURA DO PACOTE (MEMORY-MAP)
+# =========================================================
+def ler_manifesto(destino=DIR_PADRAO):
+    try:
+        with open(os.path.join(destino, MANIFESTO)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def geracao_atual(destino=DIR_PADRAO):
+    """Id da geração publicada (muda a cada reconstrução), ou None."""
+    manifesto = ler_manifesto(destino)
+    if manifesto is None or manifesto.get("versao_formato") != VERSAO_FORMATO:
+        return None
+    return manifesto.get("geracao")
+
+
+def caminho_tabela(nome, destino=DIR_PADRAO):
+    """Arquivo .arrow de `nome` na geração atual, ou None."""
+    geracao = geracao_atual(destino)
+    if geracao is None:
+        return None
+    path = os.path.join(destino, geracao, f"{nome}.arrow")
+    return path if os.path.exists(path) else None
+
+
+def abrir(destino=DIR_PADRAO, versao=None):
+    """Agregados do pacote, ou None se ausente, incompleto ou desatualizado.
+
+    Com `versao`, o pacote só é aceito se foi gerado a partir das mesmas
+    fontes (mesmo hash de conteúdo). Matrizes e colunas numéricas sem null
+    ficam apontando para o arquivo mapeado (sem cópia, somente leitura) e são
+    compartilhadas entre réplicas. Texto, categorias e inteiros com null são
+    materializados por `to_pandas` em memória privada de cada processo: nas
+    tabelas por paciente (metro, baseline, coorte, violacoes) a economia se
+    limita à leitura sem parse, não à memória.
+    """
+    manifesto = ler_manifesto(destino)
+    if manifesto is None or manifesto.get("versao_formato") != VERSAO_FORMATO:
+        return None
+    if versao is not None and manifesto.get("versao_dados") != versao:
+        return None
+    pasta = os.path.join(destino, manifesto["geracao"])
+
+    try:
+        tabelas = {}
+        for nome in manifesto["tabelas"]:
+            with pa.memory_map(os.path.join(pasta, f"{nome}.arrow")) as src:
+                tabela = ipc.open_file(src).read_all()
+            tabelas[nome] = tabela.to_pandas(split_blocks=True)
+
+        matrizes = {
+            nome: np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode="r")
+            for nome in manifesto["matrizes"]
+        }
+    except (OSError, KeyError, pa.ArrowInvalid):
+        return None
+
+    return {
+        **tabelas,
+        "cubo": Cubo(
+            matrizes["cubo_ids"],
+            matrizes["cubo_ciclos"],
+            manifesto["cubo_colunas"],
+            matrizes["cubo_graus"],
+        ),
+        "presenca": matrizes["presenca"],
+        "versao_dados": manifesto["versao_dados"],
+        "geracao": manifesto["geracao"],
+    }
+
+
+def carregar_agregados(fontes=None, destino=DIR_PADRAO, inst=None):
+    """(versão, agregados): do pacote se atualizado, senão calculados ao vivo."""
+    fontes = fontes or fontes_padrao()
+    versao = versao_fontes(fontes)
+    agregados = abrir(destino, versao)
+    if agregados is None:
+        agregados = calcular_agregados(*carregar_fontes(fontes, inst), inst=inst)
+    return versao, agregados
+
+
+# =========================================================
+# 🚀 EXECUÇÃO
+# =========================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pré-calcula os agregados dos painéis em um pacote de artefatos."
+    )
+    parser.add_argument("--dados", default=BASE_DIR,
+                        help="diretório com as planilhas de origem")
+    parser.add_argument("--destino", default=DIR_PADRAO)
+    args = parser.parse_args()
+
+    inst = Instrumentacao()
+    manifesto = construir(fontes_padrao(args.dados), args.destino, inst)
+
+    print(inst.tabela().to_string(index=False))
+    print(f"✅ Pacote {manifesto['versao_dados']} → {args.destino}")
@@ -0,0 +1,296 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import argparse
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+import generate_report
+from agregados import (
+    distribuicao_graus,
+    grau_maximo_por_paciente,
+    tabela_ciclos,
+    tabela_toxicidade_por_paciente,
+)
+from bootstrap import REPLICAS, estatisticas_toxicidade, intervalos
+from dados import (
+    normalizar_nome,
+    ler_baseline_anonimizado,
+    ler_metronomica,
+    preparar_metronomica,
+    resumir_por_paciente,
+)
+from exportacao import exportar
+from importacao import perfil_script
+from incidencia import LIMIAR_GRAVE, LIMIARES, primeiro_evento
+from reducoes import (
+    como_groupby,
+    layout_de_tabela,
+    reduzir_com_groupby,
+    reduzir_por_paciente,
+)
+from sintetico import gerar_coorte, salvar_coorte
+from toxicidade import decodificar_grau, montar_cubo, tabela_heatmap
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+ESCALAS_PADRAO = [1, 10, 100, 1000]
+
+# Acima desta escala a etapa de carga não grava/lê xlsx (openpyxl levaria
+# dezenas de minutos só para montar o arquivo) e é registrada como pulada.
+MAX_ESCALA_XLSX = 100
+
+# Pontos de entrada cujo custo de inicialização (imports de topo) é medido.
+ENTRADAS = [
+    "app_metronomica_dark.py",
+    "app_metronomica12Ciclos.py",
+    "app_metronomica.py",
+    "generate_report.py",
+]
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COLUNAS_METRO = generate_report.COLUNAS_METRO
+COLUNAS_TOX = [col for _, col, _ in generate_report.tox_cols]
+
+
+# =========================================================
+# ⏱️ MEDIÇÃO
+# =========================================================
+def medir(func, memoria=True):
+    """Executa `func` medindo tempo de parede, CPU e pico de memória (MB)."""
+    if memoria:
+        tracemalloc.start()
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        resultado = func()
+    finally:
+        parede, cpu = time.perf_counter() - t0, time.process_time() - c0
+        pico = tracemalloc.get_traced_memory()[1] / 2**20 if memoria else None
+        if memoria:
+            tracemalloc.stop()
+    return resultado, {"parede_s": parede, "cpu_s": cpu, "pico_mb": pico}
+
+
+def projetar_em_memoria(metro_bruto):
+    """Mesma projeção de `ler_metronomica`, para escalas sem xlsx."""
+    metro = metro_bruto.rename(columns=normalizar_nome)
+    return metro[[c for c in COLUNAS_METRO if c in metro.columns]]
+
+
+def _render(tabela, cmap):
+    fig, ax = plt.subplots(figsize=(10, 4), dpi=120)
+    sns.heatmap(tabela, cmap=cmap, cbar=True, ax=ax)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    return buf.getbuffer().nbytes
+
+
+# =========================================================
+# 🧪 ETAPAS DO PIPELINE
+# =========================================================
+def executar_escala(escala, seed=0, memoria=True, max_escala_xlsx=MAX_ESCALA_XLSX):
+    resultados = []
+
+    def registrar(etapa, func, **extra):
+        saida, medidas = medir(func, memoria)
+        resultados.append({"etapa": etapa, **medidas, **extra})
+        print(f"  {etapa:<16} {medidas['parede_s']:9.3f}s", flush=True)
+        return saida
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # --- carga ---
+        if escala <= max_escala_xlsx:
+            metro_file, baseline_file = salvar_coorte(tmp, escala, seed)
+            metro, baseline = registrar(
+                "carga",
+                lambda: (
+                    ler_metronomica(metro_file, COLUNAS_METRO),
+                    ler_baseline_anonimizado(baseline_file),
+                ),
+            )
+        else:
+            metro_bruto, baseline_bruto = gerar_coorte(escala, seed)
+            resultados.append({"etapa": "carga", "pulada": True})
+            print(f"  {'carga':<16}   (pulada: escala > {max_escala_xlsx})")
+            metro = projetar_em_memoria(metro_bruto)
+            baseline = baseline_bruto
+            del metro_bruto
+
+        n_linhas, n_pacientes = len(metro), metro["id_paciente"].nunique()
+
+        # --- limpeza ---
+        metro = registrar("limpeza", lambda: preparar_metronomica(metro))
+
+        # --- decodificação de graus ---
+        registrar(
+            "graus",
+            lambda: {c: decodificar_grau(metro[c]) for c in COLUNAS_TOX},
+        )
+
+        # --- cubo paciente × ciclo × toxicidade ---
+        cubo = registrar("cubo", lambda: montar_cubo(metro, COLUNAS_TOX))
+
+        # --- agregações exibidas nos painéis ---
+        def agregacoes():
+            resumo = resumir_por_paciente(metro)
+            por_ciclo = metro.groupby("ciclo")["id_paciente"].nunique()
+            presenca = (
+                metro[["id_paciente", "ciclo"]].assign(presente=1)
+                .pivot_table(index="ciclo", columns="id_paciente",
+                             values="presente", aggfunc="max")
+                .fillna(0)
+            )
+            grau_max = grau_maximo_por_paciente(cubo)
+            dist = distribuicao_graus(cubo)
+            return resumo, por_ciclo, presenca, grau_max, dist
+
+        _, _, presenca, _, _ = registrar("agregacoes", agregacoes)
+
+        # --- IC bootstrap (reamostragem de pacientes) ---
+        registrar(
+            "bootstrap",
+            lambda: intervalos(estatisticas_toxicidade(cubo), replicas=REPLICAS,
+                               processos=None),
+            replicas=REPLICAS,
+        )
+
+        # --- reduções por paciente: kernels segmentados × groupby ---
+        referencia = registrar(
+            "reducoes_groupby", lambda: reduzir_com_groupby(metro, COLUNAS_TOX)
+        )
+        reducoes = registrar(
+            "reducoes_kernel",
+            lambda: reduzir_por_paciente(layout_de_tabela(metro, COLUNAS_TOX)),
+        )
+        kernel = como_groupby(reducoes)
+        resultados[-1]["iguais_groupby"] = bool(np.allclose(
+            kernel.to_numpy(float),
+            referencia.reindex(index=kernel.index, columns=kernel.columns).to_numpy(float),
+            equal_nan=True,
+        ))
+
+        # --- incidência acumulada: eventos de grau ≥ 3 × grau máximo clínico ---
+        ev = registrar("incidencia", lambda: primeiro_evento(cubo))
+        eventos = (ev.indice[:, :, list(LIMIARES).index(LIMIAR_GRAVE)] >= 0).sum(axis=0)
+        graves = (grau_maximo_por_paciente(cubo, escala_clinica=True) >= LIMIAR_GRAVE).sum(axis=0)
+        resultados[-1]["iguais_tabela"] = bool(np.array_equal(eventos, graves))
+
+        # --- renderização de figuras ---
+        registrar(
+            "figuras",
+            lambda: (
+                _render(presenca, "Blues"),
+                _render(tabela_heatmap(cubo, COLUNAS_TOX[0]), "Reds"),
+            ),
+        )
+
+        # --- exportação das tabelas analisadas ---
+        formatos = ("xlsx", "parquet") if escala <= max_escala_xlsx else ("parquet",)
+        registrar(
+            "exportacao",
+            lambda: exportar(
+                os.path.join(tmp, "exportacao"), "metro-analisada",
+                {
+                    "ciclos": tabela_ciclos(metro, COLUNAS_TOX),
+                    "resumo": resumir_por_paciente(metro),
+                    "toxicidade": tabela_toxicidade_por_paciente(cubo),
+                },
+                formatos,
+            ),
+            formatos=list(formatos),
+        )
+
+        # --- relatório completo (HTML, sem PDF) ---
+        registrar(
+            "relatorio",
+            lambda: generate_report.gerar_relatorio(
+                metro, baseline, output_dir=os.path.join(tmp, "relatorio"), pdf=False
+            ),
+        )
+
+    for r in resultados:
+        r.update(escala=escala, n_pacientes=int(n_pacientes), n_linhas=int(n_linhas))
+    return resultados
+
+
+# =========================================================
+# 🐢 INICIALIZAÇÃO (-X importtime)
+# =========================================================
+def perfil_inicializacao(entradas=ENTRADAS):
+    print("⏱️ Imports de topo (-X importtime)", flush=True)
+    perfis = []
+    for script in entradas:
+        perfil = perfil_script(os.path.join(BASE_DIR, script))
+        perfis.append(perfil)
+        if "erro" in perfil:
+            print(f"  {script:<28} erro: {perfil['erro']}")
+            continue
+        pesados = ", ".join(perfil["modulos_pesados"]) or "-"
+        marca = "✅" if perfil["dentro_do_orcamento"] else "⚠️"
+        print(f"  {marca} {script:<28} {perfil['total_s']:7.3f}s  pesados: {pesados}")
+    return perfis
+
+
+# =========================================================
+# 🚀 EXECUÇÃO
+# =========================================================
+def executar(escalas=ESCALAS_PADRAO, seed=0, memoria=True,
+             max_escala_xlsx=MAX_ESCALA_XLSX):
+    inicializacao = perfil_inicializacao()
+
+    resultados = []
+    for escala in escalas:
+        print(f"⏱️ Escala {escala}×", flush=True)
+        resultados.extend(executar_escala(escala, seed, memoria, max_escala_xlsx))
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "seed": seed,
+        "memoria_rastreada": memoria,
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "matplotlib": matplotlib.__version__,
+        },
+        "inicializacao": inicializacao,
+        "resultados": resultados,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline metronômico.")
+    parser.add_argument("--escalas", type=float, nargs="+", default=ESCALAS_PADRAO)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sem-memoria", action="store_true",
+                        help="não usar tracemalloc (tempos sem overhead)")
+    parser.add_argument("--max-escala-xlsx", type=float, default=MAX_ESCALA_XLSX)
+    parser.add_argument("--saida", default=os.path.join("output", "benchmark.json"))
+    args = parser.parse_args()
+
+    relatorio = executar(args.escalas, args.seed, not args.sem_memoria,
+                         args.max_escala_xlsx)
+
+    os.makedirs(os.path.dirname(args.saida) or ".", exist_ok=True)
+    with open(args.saida, "w") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Resultados → {args.saida}")
@@ -0,0 +1,228 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from agregados import GRAUS, grau_maximo_por_paciente
+from toxicidade import Cubo
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+REPLICAS = 10_000
+SEMENTE = 2025
+ALFA = 0.05
+
+# Réplicas por tarefa: cada lote gera a sua matriz de índices a partir de uma
+# semente derivada, então o resultado não depende do número de processos.
+REPLICAS_POR_LOTE = 2_500
+
+CATEGORIAS = [f"grau_{g}" for g in GRAUS] + ["nao_avaliado"]
+
+# resumo por ciclo: (estatística, coluna da planilha) — mesmas de `resumir_por_ciclo`
+MEDIAS_POR_CICLO = [
+    ("peso_medio", "pesomt"),
+    ("hb_media", "hemoglobinamt"),
+    ("leuco_medio", "leucocitosmt"),
+]
+
+
+# =========================================================
+# 🧮 ESTATÍSTICAS COMO RAZÕES DE SOMAS POR PACIENTE
+# =========================================================
+# Toda estatística é soma(numerador) / soma(denominador) sobre os pacientes.
+# Numa réplica, cada paciente entra com a sua multiplicidade w: a estatística
+# vira (w @ numerador) / (w @ denominador), e todas as réplicas de todas as
+# estatísticas saem de dois produtos de matrizes.
+class Estatisticas(NamedTuple):
+    rotulos: pd.DataFrame     # uma linha por estatística
+    numerador: np.ndarray     # [paciente, estatística]
+    denominador: np.ndarray   # [paciente, estatística]
+
+
+def estatisticas_toxicidade(cubo: Cubo) -> Estatisticas:
+    """% de pacientes por grau máximo (escala clínica), toxicidade × categoria."""
+    maximo = grau_maximo_por_paciente(cubo, escala_clinica=True)
+    n_pac, n_tox = maximo.shape
+
+    categoria = np.where(np.isnan(maximo), len(GRAUS), np.nan_to_num(maximo))
+    indicador = categoria[:, :, None] == np.arange(len(CATEGORIAS))   # [p, t, k]
+
+    rotulos = pd.DataFrame({
+        "toxicidade": np.repeat(cubo.colunas, len(CATEGORIAS)),
+        "categoria": np.tile(CATEGORIAS, n_tox),
+    })
+    numerador = 100.0 * indicador.reshape(n_pac, -1)
+    return Estatisticas(rotulos, numerador, np.ones_like(numerador))
+
+
+def estatisticas_por_ciclo(metro: pd.DataFrame, cubo: Cubo) -> Estatisticas:
+    """Registros e médias por ciclo (como `resumir_por_ciclo`), por paciente."""
+    pac = pd.Index(cubo.ids).get_indexer(metro["id_paciente"])
+    cic = pd.Index(cubo.ciclos).get_indexer(metro["ciclo"])
+    ok = (pac >= 0) & (cic >= 0)
+    pac, cic = pac[ok], cic[ok]
+    n_pac, n_cic = len(cubo.ids), len(cubo.ciclos)
+    celula = pac * n_cic + cic
+
+    def por_celula(pesos):
+        return np.bincount(celula, weights=pesos, minlength=n_pac * n_cic).reshape(n_pac, n_cic)
+
+    registros = por_celula(None).astype(float)
+    numeradores, denominadores = [registros], [np.full_like(registros, 1.0 / n_pac)]
+    for _, coluna in MEDIAS_POR_CICLO:
+        valores = pd.to_numeric(metro[coluna], errors="coerce").to_numpy(dtype=float)[ok]
+        presente = ~np.isnan(valores)
+        numeradores.append(por_celula(np.where(presente, valores, 0.0)))
+        denominadores.append(por_celula(presente.astype(float)))
+
+    nomes = ["n_registros"] + [nome for nome, _ in MEDIAS_POR_CICLO]
+    rotulos = pd.DataFrame({
+        "estatistica": np.repeat(nomes, n_cic),
+        "ciclo": np.tile(cubo.ciclos, len(nomes)),
+    })
+    # `n_registros`: denominador 1/n faz w @ d = 1, ou seja, a própria soma
+    return Estatisticas(
+        rotulos, np.hstack(numeradores), np.hstack(denominadores)
+    )
+
+
+def _razao(numerador, denominador):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominador > 0, numerador / denominador, np.nan)
+
+
+# =========================================================
+# 🔁 REAMOSTRAGEM DE PACIENTES
+# =========================================================
+def multiplicidades(indices: np.ndarray, n_pac: int) -> np.ndarray:
+    """[réplica, paciente] nº de vezes que cada paciente foi sorteado."""
+    n_rep = indices.shape[0]
+    chave = (np.arange(n_rep)[:, None] * n_pac + indices).ravel()
+    return np.bincount(chave, minlength=n_rep * n_pac).reshape(n_rep, n_pac)
+
+
+def _replicar_lote(semente, n_rep, numerador, denominador):
+    """Uma matriz de índices para o lote, reutilizada por todas as estatísticas."""
+    n_pac = numerador.shape[0]
+    indices = np.random.default_rng(semente).integers(0, n_pac, size=(n_rep, n_pac))
+    w = multiplicidades(indices, n_pac).astype(float)
+    return _razao(w @ numerador, w @ denominador)
+
+
+def em_lotes(funcao, total, semente, *args, processos=1, por_lote=REPLICAS_POR_LOTE):
+    """`funcao(semente_filha, n, *args)` para lotes que somam `total` réplicas.
+
+    Lotes com sementes filhas de `SeedSequence(semente)`: o resultado é o mesmo
+    com 1 ou N processos. Por padrão roda em série: as apps chamam isto dentro
+    do servidor Streamlit (multi-thread), onde abrir um pool por sessão e
+    rerun não compensa. `processos` > 1 (ou None, todos os núcleos) distribui
+    os lotes num `ProcessPoolExecutor` — opção da CLI e do benchmark.
+    Retorna a lista de resultados.
+    """
+    tamanhos = [por_lote] * (total // por_lote)
+    if total % por_lote:
+        tamanhos.append(total % por_lote)
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+
+    processos = min(processos or os.cpu_count() or 1, len(tamanhos))
+    if processos <= 1:
+        return [funcao(s, n, *args) for s, n in zip(sementes, tamanhos)]
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        return list(pool.map(
+            funcao, sementes, tamanhos, *([a] * len(tamanhos) for a in args)
+        ))
+
+
+def replicas_bootstrap(numerador, denominador, replicas=REPLICAS, semente=SEMENTE,
+                       processos=1):
+    """[réplica, estatística] para `replicas` reamostragens de pacientes."""
+    return np.vstack(em_lotes(
+        _replicar_lote, replicas, semente, numerador, denominador, processos=processos
+    ))
+
+
+# =========================================================
+# 📏 INTERVALOS DE CONFIANÇA (PERCENTIL)
+# =========================================================
+def intervalos(est: Estatisticas, replicas=REPLICAS, semente=SEMENTE, alfa=ALFA,
+               processos=1) -> pd.DataFrame:
+    """Estimativa pontual e IC percentil (1 − alfa) de cada estatística."""
+    valor = _razao(est.numerador.sum(axis=0), est.denominador.sum(axis=0))
+    amostras = replicas_bootstrap(
+        est.numerador, est.denominador, replicas, semente, processos
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # estatística sem dados em todas as réplicas
+        inf, sup = np.nanquantile(amostras, [alfa / 2, 1 - alfa / 2], axis=0)
+    return est.rotulos.assign(valor=valor, ic_inf=inf, ic_sup=sup)
+
+
+def intervalos_agregados(agregados, replicas=REPLICAS, semente=SEMENTE, alfa=ALFA,
+                         processos=1):
+    """ICs das tabelas de toxicidade e do resumo por ciclo, com as mesmas réplicas.
+
+    Toxicidade e resumo por ciclo entram numa única reamostragem: as colunas são
+    concatenadas e a mesma matriz de índices serve para todas.
+    """
+    cubo = agregados["cubo"]
+    tox = estatisticas_toxicidade(cubo)
+    cic = estatisticas_por_ciclo(agregados["metro"], cubo)
+
+    n_tox = len(tox.rotulos)
+    juntas = Estatisticas(
+        pd.concat([tox.rotulos, cic.rotulos], ignore_index=True),
+        np.hstack([tox.numerador, cic.numerador]),
+        np.hstack([tox.denominador, cic.denominador]),
+    )
+    tabela = intervalos(juntas, replicas, semente, alfa, processos)
+
+    ic_tox = tabela.iloc[:n_tox][["toxicidade", "categoria", "valor", "ic_inf", "ic_sup"]]
+    ic_tox = ic_tox.rename(columns={"valor": "pct"}).reset_index(drop=True)
+    ic_tox.insert(2, "n", np.rint(ic_tox["pct"] * len(cubo.ids) / 100).astype(np.int64))
+
+    ic_cic = tabela.iloc[n_tox:][["ciclo", "estatistica", "valor", "ic_inf", "ic_sup"]]
+    return {"toxicidade": ic_tox, "por_ciclo": ic_cic.reset_index(drop=True)}
+
+
+# =========================================================
+# 📋 TABELAS PARA OS PAINÉIS
+# =========================================================
+def tabela_toxicidade_ic(ic_tox: pd.DataFrame, rotulos=None) -> pd.DataFrame:
+    """Formato das tabelas do painel: "n (pct%) [inf–sup]" por grau."""
+    celula = (
+        ic_tox["n"].astype(str) + " (" + ic_tox["pct"].map("{:.1f}%".format) + ") ["
+        + ic_tox["ic_inf"].map("{:.1f}".format) + "–"
+        + ic_tox["ic_sup"].map("{:.1f}".format) + "]"
+    )
+    tabela = (
+        ic_tox.assign(celula=celula)
+        .pivot(index="toxicidade", columns="categoria", values="celula")
+        .reindex(columns=CATEGORIAS)
+    )
+    tabela = tabela.reindex(ic_tox["toxicidade"].unique())
+    tabela.insert(0, "N pacientes", ic_tox.groupby("toxicidade")["n"].sum())
+    tabela.columns = ["N pacientes"] + [f"Grau {g}" for g in GRAUS] + ["Não avaliado"]
+    if rotulos:
+        tabela = tabela.rename(index=rotulos)
+    return tabela.rename_axis("Toxicidade").reset_index()
+
+
+def resumo_por_ciclo_ic(ic_cic: pd.DataFrame, casas=1) -> pd.DataFrame:
+    """ciclo × estatística com colunas `<estatística>_ic` ("inf–sup")."""
+    faixa = (
+        ic_cic["ic_inf"].round(casas).astype(str) + "–"
+        + ic_cic["ic_sup"].round(casas).astype(str)
+    )
+    largo = ic_cic.assign(faixa=faixa).pivot(
+        index="ciclo", columns="estatistica", values="faixa"
+    )
+    largo.columns = [f"{c}_ic" for c in largo.columns]
+    return largo.reset_index()
@@ -0,0 +1,293 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import math
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import em_lotes
+from dados import COLUNA_ABA
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+GRUPO = "Metronômica"          # 1 = aderiu, 0 = não aderiu
+ROTULOS_GRUPO = {1: "Metronômica (sim)", 0: "Metronômica (não)"}
+
+# Variáveis medidas (Mann–Whitney); as demais colunas codificadas são categóricas.
+VARIAVEIS_CONTINUAS = ["N_Ciclos", "Idades"]
+NAO_COMPARADAS = ["ID", GRUPO, COLUNA_ABA]
+
+PERMUTACOES = 10_000
+SEMENTE = 2025
+ALFA = 0.05
+
+
+# =========================================================
+# 📐 DISTRIBUIÇÕES (SEM SCIPY)
+# =========================================================
+def _gama_sup_regularizada(a, x):
+    """Q(a, x): série para x < a + 1, fração contínua (Lentz) acima."""
+    if x <= 0:
+        return 1.0
+    log_pref = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        termo = soma = 1.0 / a
+        ap = a
+        for _ in range(1000):
+            ap += 1
+            termo *= x / ap
+            soma += termo
+            if abs(termo) < abs(soma) * 1e-15:
+                break
+        return max(0.0, 1.0 - soma * math.exp(log_pref))
+
+    b = x + 1 - a
+    c, d = 1e300, 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = 1e-300 if abs(d) < 1e-300 else d
+        c = b + an / c
+        c = 1e-300 if abs(c) < 1e-300 else c
+        d = 1 / d
+        h *= d * c
+        if abs(d * c - 1) < 1e-15:
+            break
+    return math.exp(log_pref) * h
+
+
+def p_qui_quadrado(estatistica, gl):
+    return _gama_sup_regularizada(gl / 2, estatistica / 2) if gl > 0 else np.nan
+
+
+def p_normal_bilateral(z):
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def p_fisher_2x2(a, b, c, d):
+    """Fisher exato bilateral: soma das tabelas tão ou menos prováveis."""
+    linha1, coluna1, n = a + b, a + c, a + b + c + d
+
+    def log_p(k):
+        return (
+            math.lgamma(linha1 + 1) - math.lgamma(k + 1) - math.lgamma(linha1 - k + 1)
+            + math.lgamma(n - linha1 + 1) - math.lgamma(coluna1 - k + 1)
+            - math.lgamma(n - linha1 - coluna1 + k + 1)
+            - (math.lgamma(n + 1) - math.lgamma(coluna1 + 1) - math.lgamma(n - coluna1 + 1))
+        )
+
+    k = np.arange(max(0, coluna1 - (n - linha1)), min(linha1, coluna1) + 1)
+    probs = np.exp([log_p(int(i)) for i in k])
+    return float(min(1.0, probs[probs <= probs[k == a][0] * (1 + 1e-7)].sum()))
+
+
+# =========================================================
+# 🧮 ESTATÍSTICAS EM LOTE (TODAS AS VARIÁVEIS DE UMA VEZ)
+# =========================================================
+# Categóricas: uma matriz indicadora paciente × (variável, nível) para todas as
+# variáveis. As contagens do grupo 1 de todas as tabelas de contingência saem
+# de `g @ indicadora`; com G [permutação, paciente], de `G @ indicadora`.
+# Contínuas: postos médios por variável; somas de postos do grupo 1 = `g @ postos`.
+def matriz_indicadora(categoricas: pd.DataFrame):
+    """(indicadora [paciente, nível], início de cada variável, rótulos dos níveis)."""
+    codigos, niveis = [], []
+    for col in categoricas.columns:
+        cod, uniq = pd.factorize(categoricas[col], sort=True)
+        codigos.append(cod)
+        niveis.append(uniq)
+
+    tamanhos = np.array([len(n) for n in niveis])
+    inicio = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+    codigos = np.column_stack(codigos) if codigos else np.empty((len(categoricas), 0), int)
+
+    indicadora = np.zeros((len(categoricas), tamanhos.sum()))
+    linha, var = np.nonzero(codigos >= 0)
+    indicadora[linha, inicio[var] + codigos[linha, var]] = 1.0
+    return indicadora, inicio, niveis
+
+
+def _qui_quadrado_lote(cont1, total, inicio):
+    """χ² de todas as tabelas k×2; `cont1` [..., nível] é o grupo 1."""
+    seg = np.repeat(np.arange(len(inicio)), np.diff(np.append(inicio, len(total))))
+    n = np.add.reduceat(total, inicio)[seg]
+    n1 = np.add.reduceat(cont1, inicio, axis=-1)[..., seg]
+    esperado1 = total * n1 / n
+    esperado0 = total - esperado1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        parcelas = (
+            np.where(esperado1 > 0, (cont1 - esperado1) ** 2 / esperado1, 0.0)
+            + np.where(esperado0 > 0, (total - cont1 - esperado0) ** 2 / esperado0, 0.0)
+        )
+    return np.add.reduceat(parcelas, inicio, axis=-1)
+
+
+def postos(continuas: pd.DataFrame):
+    """(postos médios com NaN → 0, máscara de observados, correção de empates)."""
+    r = continuas.rank(method="average").to_numpy(dtype=float)
+    observado = ~np.isnan(r)
+    empates = []
+    for col in continuas.columns:
+        t = continuas[col].dropna().value_counts().to_numpy(dtype=float)
+        empates.append((t ** 3 - t).sum())
+    return np.nan_to_num(r), observado.astype(float), np.array(empates)
+
+
+def _z_mann_whitney(soma1, n1, n, empates):
+    """z de Mann–Whitney (U do grupo 1) com correção de empates e continuidade."""
+    n2 = n - n1
+    u = soma1 - n1 * (n1 + 1) / 2
+    media = n1 * n2 / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = n1 * n2 / 12 * ((n + 1) - empates / (n * (n - 1)))
+        desvio = np.abs(u - media) - 0.5
+        return np.where(var > 0, np.maximum(desvio, 0) / np.sqrt(var), np.nan)
+
+
+def _permutar_lote(semente, n_perm, g, indicadora, inicio, r, observado, empates,
+                   qui_obs, z_obs):
+    """Nº de permutações com estatística ≥ observada, por variável.
+
+    Uma matriz G [permutação, paciente] para o lote, reutilizada por todas as
+    variáveis categóricas e contínuas.
+    """
+    rng = np.random.default_rng(semente)
+    G = rng.permuted(np.broadcast_to(g, (n_perm, len(g))), axis=1)
+
+    qui = _qui_quadrado_lote(G @ indicadora, indicadora.sum(axis=0), inicio)
+    z = _z_mann_whitney(G @ r, G @ observado, observado.sum(axis=0), empates)
+    tol = 1e-9
+    return np.concatenate([
+        (qui >= qui_obs - tol).sum(axis=0),
+        (z >= z_obs - tol).sum(axis=0),
+    ])
+
+
+# =========================================================
+# 🧪 CORREÇÃO PARA MÚLTIPLOS TESTES
+# =========================================================
+def _ajustar_finitos(p, ajuste):
+    """Aplica `ajuste` só aos p finitos; NaN (teste indefinido) continua NaN e
+    não entra no número de testes m."""
+    p = np.asarray(p, dtype=float)
+    saida = np.full_like(p, np.nan)
+    finito = np.isfinite(p)
+    if finito.any():
+        saida[finito] = ajuste(p[finito])
+    return saida
+
+
+def _holm(p):
+    ordem = np.argsort(p)
+    ajustado = np.maximum.accumulate((len(p) - np.arange(len(p))) * p[ordem])
+    saida = np.empty_like(p)
+    saida[ordem] = np.minimum(ajustado, 1.0)
+    return saida
+
+
+def _benjamini_hochberg(p):
+    ordem = np.argsort(p)[::-1]
+    m = len(p)
+    ajustado = np.minimum.accumulate(p[ordem] * m / np.arange(m, 0, -1))
+    saida = np.empty_like(p)
+    saida[ordem] = np.minimum(ajustado, 1.0)
+    return saida
+
+
+def holm(p):
+    return _ajustar_finitos(p, _holm)
+
+
+def benjamini_hochberg(p):
+    return _ajustar_finitos(p, _benjamini_hochberg)
+
+
+# =========================================================
+# 📊 COMPARAÇÃO ENTRE GRUPOS
+# =========================================================
+def _resumo_categorica(serie, niveis):
+    n = serie.notna().sum()
+    contagem = serie.value_counts()
+    return "; ".join(
+        f"{nivel}: {contagem.get(nivel, 0)} ({100 * contagem.get(nivel, 0) / n:.1f}%)"
+        for nivel in niveis
+    ) if n else "—"
+
+
+def _resumo_continua(serie):
+    s = serie.dropna()
+    if s.empty:
+        return "—"
+    q1, med, q3 = s.quantile([0.25, 0.5, 0.75])
+    return f"{med:.1f} [{q1:.1f}–{q3:.1f}]"
+
+
+def comparar_grupos(coorte: pd.DataFrame, grupo=GRUPO, permutacoes=PERMUTACOES,
+                    semente=SEMENTE, processos=1) -> pd.DataFrame:
+    """Testa todas as variáveis da coorte entre os dois grupos de `grupo`.
+
+    - categóricas: χ² (Fisher exato quando 2×2) e teste de permutação do χ²
+    - contínuas: Mann–Whitney (aprox. normal) e permutação do |z|
+    - `p_holm` / `p_fdr`: correções de Holm e Benjamini–Hochberg do p principal
+    """
+    coorte = coorte[coorte[grupo].isin(ROTULOS_GRUPO)]
+    g = (coorte[grupo] == 1).to_numpy(dtype=float)
+
+    variaveis = [c for c in coorte.columns if c not in NAO_COMPARADAS and c != grupo]
+    continuas = [c for c in variaveis if c in VARIAVEIS_CONTINUAS]
+    categoricas = [c for c in variaveis if c not in VARIAVEIS_CONTINUAS]
+
+    indicadora, inicio, niveis = matriz_indicadora(coorte[categoricas])
+    total = indicadora.sum(axis=0)
+    qui_obs = _qui_quadrado_lote(g @ indicadora, total, inicio)
+
+    r, observado, empates = postos(coorte[continuas])
+    z_obs = _z_mann_whitney(g @ r, g @ observado, observado.sum(axis=0), empates)
+
+    extremos = sum(em_lotes(
+        _permutar_lote, permutacoes, semente,
+        g, indicadora, inicio, r, observado, empates, qui_obs, z_obs,
+        processos=processos,
+    )) if permutacoes else np.full(len(variaveis), np.nan)
+    p_perm = (1 + extremos) / (1 + permutacoes)
+
+    sim, nao = coorte[g == 1], coorte[g == 0]
+    linhas = []
+    for i, col in enumerate(categoricas):
+        uniq = niveis[i]
+        cont1 = (g @ indicadora[:, inicio[i]:inicio[i] + len(uniq)]).astype(int)
+        tot = total[inicio[i]:inicio[i] + len(uniq)].astype(int)
+        if len(uniq) == 2:
+            teste = "Fisher exato"
+            p = p_fisher_2x2(cont1[0], cont1[1], tot[0] - cont1[0], tot[1] - cont1[1])
+        else:
+            teste = "Qui-quadrado"
+            p = p_qui_quadrado(qui_obs[i], len(uniq) - 1)
+        linhas.append({
+            "variavel": col, "tipo": "categórica", "niveis": len(uniq),
+            "resumo_sim": _resumo_categorica(sim[col], uniq),
+            "resumo_nao": _resumo_categorica(nao[col], uniq),
+            "teste": teste, "estatistica": qui_obs[i], "p_valor": p,
+            "p_permutacao": p_perm[i],
+        })
+    for j, col in enumerate(continuas):
+        linhas.append({
+            "variavel": col, "tipo": "contínua", "niveis": np.nan,
+            "resumo_sim": _resumo_continua(sim[col]),
+            "resumo_nao": _resumo_continua(nao[col]),
+            "teste": "Mann–Whitney", "estatistica": z_obs[j],
+            "p_valor": p_normal_bilateral(z_obs[j]),
+            "p_permutacao": p_perm[len(categoricas) + j],
+        })
+
+    tabela = pd.DataFrame(linhas)
+    tabela.insert(3, "n_sim", len(sim))
+    tabela.insert(4, "n_nao", len(nao))
+    tabela["p_holm"] = holm(tabela["p_valor"])
+    tabela["p_fdr"] = benjamini_hochberg(tabela["p_valor"])
+    tabela["significativo"] = tabela["p_fdr"] < ALFA
+    return tabela
@@ -0,0 +1,186 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import filecmp
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import Instrumentacao, cache_miss
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+# Sobe quando o formato do cache muda: entradas antigas deixam de casar.
+VERSAO_CACHE = 1
+
+SAIDA = "saida.pkl"
+ARQUIVOS = "arquivos"
+
+# Versões guardadas por nó (as mais recentes): voltar a uma correção
+# desfeita ainda acha o cache, sem que ele cresça sem limite.
+MANTER_POR_NO = 5
+
+
+# =========================================================
+# 🔑 HASH DE CONTEÚDO
+# =========================================================
+def _alimentar(h, obj):
+    """Atualiza `h` com o conteúdo de `obj` (DataFrames, arrays, coleções, escalares)."""
+    if isinstance(obj, pd.DataFrame):
+        h.update(b"df")
+        h.update(json.dumps([str(c) for c in obj.columns]).encode())
+        h.update(json.dumps([str(t) for t in obj.dtypes]).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        _alimentar(h, obj.to_frame())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"nd{obj.dtype}{obj.shape}".encode())
+        if obj.dtype == object:
+            _alimentar(h, obj.tolist())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for k in sorted(obj, key=str):
+            _alimentar(h, str(k))
+            _alimentar(h, obj[k])
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for item in obj:
+            _alimentar(h, item)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode())
+
+
+def chave(*objs) -> str:
+    h = hashlib.sha256()
+    for obj in objs:
+        _alimentar(h, obj)
+    return h.hexdigest()[:16]
+
+
+def conteudo_arquivos(*paths):
+    """Bytes dos arquivos (template, CSS) como entrada de um nó."""
+    conteudo = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            conteudo[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+    return conteudo
+
+
+def fonte_codigo(*codigo):
+    """Fonte dos módulos (pelo nome) e funções que um nó executa além da sua."""
+    return [
+        inspect.getsource(importlib.import_module(c) if isinstance(c, str) else c)
+        for c in codigo
+    ]
+
+
+# =========================================================
+# 🧱 CONSTRUÇÃO INCREMENTAL
+# =========================================================
+class Construcao:
+    """Grafo de nós com saídas em cache no disco, chaveadas pelo conteúdo.
+
+    Um nó é `funcao(destino, **entradas)`: grava os seus arquivos em `destino`
+    e retorna um valor serializável (nomes de figuras, registros de tabela).
+    A chave é o hash do nome, do código da função e do que ela chama
+    (`codigo`: módulos e funções), dos `arquivos` que lê (templates), das
+    entradas (a fatia de dados que o nó usa e os parâmetros) e das chaves dos
+    nós de que depende.
+    Com a chave no cache a função não roda: os arquivos são copiados para
+    `publicar_em` (só os que diferem do que já está lá) e o valor é relido.
+    """
+
+    def __init__(self, cache_dir, inst=None):
+        self.cache_dir = cache_dir
+        self.inst = inst or Instrumentacao()
+        self.chaves = {}
+        self.log = []
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def no(self, nome, funcao, entradas, publicar_em, dependencias=(), etapa=None,
+           codigo=(), arquivos=()):
+        k = chave(
+            VERSAO_CACHE, nome, fonte_codigo(funcao, *codigo),
+            conteudo_arquivos(*arquivos), entradas,
+            [self.chaves[d] for d in dependencias],
+        )
+        pasta = os.path.join(self.cache_dir, nome, k)
+
+        with self.inst.etapa(etapa or nome, cache=True):
+            if os.path.exists(os.path.join(pasta, SAIDA)):
+                status = "reutilizado"
+                os.utime(pasta)   # poda mantém as versões usadas mais recentemente
+            else:
+                cache_miss()
+                status = "gerado"
+                self._executar(pasta, funcao, entradas)
+                self._podar(os.path.dirname(pasta))
+
+            with open(os.path.join(pasta, SAIDA), "rb") as f:
+                valor = pickle.load(f)
+            arquivos = self._publicar(os.path.join(pasta, ARQUIVOS), publicar_em)
+
+        self.chaves[nome] = k
+        self.log.append({"no": nome, "chave": k, "status": status, "arquivos": arquivos})
+        print(f"  {'♻️' if status == 'reutilizado' else '🔨'} {nome} ({status})")
+        return valor
+
+    def _executar(self, pasta, funcao, entradas):
+        # grava numa pasta temporária e renomeia: nó interrompido não vira cache
+        os.makedirs(os.path.dirname(pasta), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(pasta))
+        try:
+            os.makedirs(os.path.join(tmp, ARQUIVOS))
+            valor = funcao(os.path.join(tmp, ARQUIVOS), **entradas)
+            with open(os.path.join(tmp, SAIDA), "wb") as f:
+                pickle.dump(valor, f)
+            try:
+                os.replace(tmp, pasta)
+            except OSError:
+                # outro processo (cache compartilhado) gravou a mesma chave antes
+                if not os.path.exists(os.path.join(pasta, SAIDA)):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @staticmethod
+    def _podar(pasta_no):
+        versoes = sorted(
+            (os.path.join(pasta_no, v) for v in os.listdir(pasta_no)),
+            key=os.path.getmtime, reverse=True,
+        )
+        for antiga in versoes[MANTER_POR_NO:]:
+            shutil.rmtree(antiga, ignore_errors=True)
+
+    @staticmethod
+    def _publicar(origem, destino):
+        os.makedirs(destino, exist_ok=True)
+        arquivos = sorted(os.listdir(origem))
+        for nome in arquivos:
+            src, dst = os.path.join(origem, nome), os.path.join(destino, nome)
+            if not (os.path.exists(dst) and filecmp.cmp(src, dst, shallow=False)):
+                shutil.copy2(src, dst)
+        return arquivos
+
+    def resumo(self):
+        gerados = sum(r["status"] == "gerado" for r in self.log)
+        return {"gerados": gerados, "reutilizados": len(self.log) - gerados, "nos": self.log}
+
+    def salvar_log(self, path):
+        with open(path, "w") as f:
+            json.dump(self.resumo(), f, indent=2, ensure_ascii=False)
+        return path
@@ -0,0 +1,165 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from agregados import DESLOCAMENTO_GRAU
+from dados import para_float
+from qualidade import SENTINELA_NUMERO
+from toxicidade import decodificar_grau
+
+
+# =========================================================
+# 📏 ESCALAS DE GRAU
+# =========================================================
+# Bordas das faixas impressas no formulário da planilha (CTCAE adaptado): é
+# contra elas que o clínico registrou o grau. Diferenças para o CTCAE v5:
+# plaquetopenia G3/G4 em 10 mil (v5: 25 mil), anemia G3 a partir de 6,5 g/dL
+# e transaminases G1 até 2,5 × LSN (v5: 3 ×).
+class Escala(NamedTuple):
+    registro: str            # coluna do grau registrado
+    laboratorio: str         # coluna do valor bruto
+    limites: tuple           # bordas crescentes (valor, ou múltiplo do LSN)
+    decrescente: bool        # citopenias: o grau sobe quando o valor cai
+    unidade: str
+    lsn: float | None = None # limite superior da normalidade (escalas × LSN)
+
+
+ESCALAS = [
+    #      grau registrado     exame           bordas                    ↓      unidade    LSN
+    Escala("anemiahbmt",       "hemoglobinamt", (6.5, 8.0, 10.0),        True,  "g/dL"),
+    Escala("neutropeniamt",    "neutrofilosmt", (0.5, 1.0, 1.5, 2.0),    True,  "mil/µL"),
+    Escala("plaquetopeniamt",  "plaquetasmt",   (10.0, 50.0, 75.0, 150.0), True, "mil/µL"),
+    Escala("renal_creatinamt", "creatinamt",    (1.0, 1.5, 3.0, 6.0),    False, "mg/dL", 1.2),
+    Escala("hepatica_bt_mt",   "btmt",          (1.0, 1.5, 3.0, 10.0),   False, "mg/dL", 1.2),
+    Escala("hepatica_tgo_mt",  "tgomt",         (1.0, 2.5, 5.0, 20.0),   False, "U/L",   40.0),
+    Escala("hepatica_tgp_mt",  "tgpmt",         (1.0, 2.5, 5.0, 20.0),   False, "U/L",   40.0),
+]
+
+# Contagens lançadas ora em mil/µL (2,2), ora em células/µL (2200): acima do
+# corte o valor está em /µL e é dividido por 1000.
+CORTE_POR_MICROLITRO = {"neutrofilosmt": 100.0, "plaquetasmt": 2000.0}
+
+
+# =========================================================
+# 🧮 DERIVAÇÃO VETORIZADA
+# =========================================================
+def valores_laboratorio(serie: pd.Series, coluna) -> np.ndarray:
+    """Coluna em float na unidade da escala; 0, negativos e 9999 → NaN."""
+    valores = para_float(serie).to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        valores = np.where((valores > 0) & (valores < SENTINELA_NUMERO), valores, np.nan)
+        corte = CORTE_POR_MICROLITRO.get(coluna)
+        if corte is not None:
+            valores = np.where(valores >= corte, valores / 1000, valores)
+    return valores
+
+
+def derivar_grau(valores, escala: Escala, lsn=None) -> np.ndarray:
+    """Grau (escala clínica) de cada valor, com um `searchsorted` na coluna toda.
+
+    Citopenias: grau k quando o valor está abaixo da borda k a partir do topo
+    (a borda pertence à faixa de cima: Hb 10,0 é grau 0). Escalas × LSN: grau k
+    quando o múltiplo do LSN passa da borda k (a borda pertence à faixa de
+    baixo: 1,5 × LSN é grau 1). `lsn` (escalar ou um valor por linha)
+    substitui o da escala.
+    """
+    valores = np.asarray(valores, dtype=float)
+    limites = np.asarray(escala.limites)
+    if escala.lsn is not None:
+        valores = valores / (escala.lsn if lsn is None else np.asarray(lsn, dtype=float))
+    if escala.decrescente:
+        grau = len(limites) - np.searchsorted(limites, valores, side="right")
+    else:
+        grau = np.searchsorted(limites, valores, side="left")
+    return np.where(np.isnan(valores), np.nan, grau)
+
+
+def grau_registrado(serie: pd.Series, coluna) -> np.ndarray:
+    """Grau do formulário na escala clínica; 99 (não avaliado) e ilegíveis → NaN."""
+    graus = decodificar_grau(serie).to_numpy(dtype=float)
+    graus = np.where(graus >= 99, np.nan, graus)
+    return np.clip(graus - DESLOCAMENTO_GRAU.get(coluna, 0), 0, None)
+
+
+# =========================================================
+# ⚖️ CONCORDÂNCIA COM O REGISTRO
+# =========================================================
+def reconciliar(metro: pd.DataFrame, escalas=ESCALAS, lsn=None) -> pd.DataFrame:
+    """Uma linha por (registro, toxicidade): valor, grau derivado e registrado.
+
+    `status`: concorda, discorda, sem_exame (só o grau) ou sem_grau (só o
+    exame; 99 ou vazio). `diferenca` = registrado − derivado (negativo: o
+    formulário subestima). `lsn` = {coluna do exame: LSN} sobrepõe a escala.
+    """
+    lsn = lsn or {}
+    escalas = [e for e in escalas if {e.registro, e.laboratorio} <= set(metro.columns)]
+    ids = metro["id_paciente"].to_numpy()
+    ciclos = metro["ciclo"].to_numpy()
+
+    partes = []
+    for e in escalas:
+        valores = valores_laboratorio(metro[e.laboratorio], e.laboratorio)
+        derivado = derivar_grau(valores, e, lsn.get(e.laboratorio))
+        registrado = grau_registrado(metro[e.registro], e.registro)
+
+        tem_exame, tem_grau = ~np.isnan(derivado), ~np.isnan(registrado)
+        status = np.select(
+            [tem_exame & tem_grau & (derivado == registrado), tem_exame & tem_grau,
+             tem_grau, tem_exame],
+            ["concorda", "discorda", "sem_exame", "sem_grau"],
+            default="vazio",
+        )
+        partes.append(pd.DataFrame({
+            "id_paciente": ids,
+            "ciclo": ciclos,
+            "toxicidade": e.registro,
+            "exame": e.laboratorio,
+            "valor": valores,
+            "grau_derivado": derivado,
+            "grau_registrado": registrado,
+            "diferenca": registrado - derivado,
+            "status": status,
+        }))
+
+    colunas = ["id_paciente", "ciclo", "toxicidade", "exame", "valor",
+               "grau_derivado", "grau_registrado", "diferenca", "status"]
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumo_concordancia(rec: pd.DataFrame) -> pd.DataFrame:
+    """Por toxicidade: pares comparáveis, % de concordância e direção das discordâncias."""
+    comparados = rec[rec["status"].isin(["concorda", "discorda"])]
+    resumo = comparados.assign(
+        concordantes=comparados["status"] == "concorda",
+        subestimados=comparados["diferenca"] < 0,
+        superestimados=comparados["diferenca"] > 0,
+    ).groupby("toxicidade", sort=False).agg(
+        comparados=("status", "size"),
+        concordantes=("concordantes", "sum"),
+        subestimados=("subestimados", "sum"),
+        superestimados=("superestimados", "sum"),
+        diferenca_media=("diferenca", "mean"),
+    )
+    resumo["concordancia_pct"] = (100 * resumo["concordantes"] / resumo["comparados"]).round(1)
+    status = pd.crosstab(rec["toxicidade"], rec["status"])
+    for s in ["sem_exame", "sem_grau"]:
+        resumo[s] = status[s] if s in status.columns else 0
+    return resumo.round({"diferenca_media": 2}).reset_index()
+
+
+def discordancia_por_ciclo(rec: pd.DataFrame) -> pd.DataFrame:
+    """ciclo × toxicidade: % de discordância entre os pares comparáveis."""
+    comparados = rec[rec["status"].isin(["concorda", "discorda"])]
+    return (
+        comparados.assign(discorda=comparados["status"] == "discorda")
+        .pivot_table(index="ciclo", columns="toxicidade", values="discorda",
+                     aggfunc="mean", sort=True)
+        .mul(100)
+        .round(1)
+    )
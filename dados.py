@@ -0,0 +1,412 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import tempfile
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from functools import lru_cache
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+
+# =========================================================
+# 🔒 COLUNAS IDENTIFICADORAS (NUNCA LIDAS)
+# =========================================================
+# Nomes já normalizados como no baseline (lower + strip).
+COLUNAS_PII = [
+    "nome", "sobrenome", "iniciais", "rg",
+    "instituição", "registro hospitalar",
+    "data de nascimento", "data tcle",
+]
+
+
+# =========================================================
+# 🧹 NORMALIZAÇÃO DE NOMES DE COLUNAS
+# =========================================================
+def normalizar_nome(nome) -> str:
+    """Mesma regra usada nas apps: minúsculas, sem acento, espaços → "_"."""
+    nome = str(nome).lower().strip()
+    nome = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("utf-8")
+    return nome.replace(" ", "_")
+
+
+def normalizar_nome_baseline(nome) -> str:
+    return str(nome).lower().strip()
+
+
+# =========================================================
+# 📂 PLANILHA METRONÔMICA (PROJEÇÃO NA LEITURA)
+# =========================================================
+def ler_metronomica(path, colunas, aba=0) -> pd.DataFrame:
+    """Lê apenas as colunas declaradas pelo consumidor (nomes normalizados).
+
+    Se `id_paciente` for pedido e não existir com esse nome, a primeira coluna
+    iniciada por "id" é usada no lugar, como as apps já faziam.
+    """
+    colunas = set(colunas)
+    pede_id = "id_paciente" in colunas
+
+    def manter(nome):
+        nome = normalizar_nome(nome)
+        return nome in colunas or (pede_id and nome.startswith("id"))
+
+    metro = pd.read_excel(path, sheet_name=aba, usecols=manter)
+    metro.columns = [normalizar_nome(c) for c in metro.columns]
+
+    if pede_id and "id_paciente" not in metro.columns:
+        for c in metro.columns:
+            if c.startswith("id"):
+                metro = metro.rename(columns={c: "id_paciente"})
+                break
+
+    extras = [c for c in metro.columns if c not in colunas]
+    return metro.drop(columns=extras)
+
+
+# =========================================================
+# 📌 BASELINE ANONIMIZADO (PROJEÇÃO NA LEITURA)
+# =========================================================
+def calcular_idade(nascimento: pd.Series) -> pd.Series:
+    nascimento = pd.to_datetime(nascimento, errors="coerce")
+    hoje = date.today()
+    ainda_nao = (nascimento.dt.month > hoje.month) | (
+        (nascimento.dt.month == hoje.month) & (nascimento.dt.day > hoje.day)
+    )
+    return hoje.year - nascimento.dt.year - ainda_nao.astype(int)
+
+
+def ler_baseline_anonimizado(path, colunas=None) -> pd.DataFrame:
+    """Lê o baseline sem as colunas de `COLUNAS_PII`.
+
+    `colunas=None` mantém todas as colunas não identificadoras. A data de
+    nascimento só é lida quando `idade` é pedida e é descartada logo após o
+    cálculo, de modo que nenhum identificador chega ao cache.
+    """
+    colunas = None if colunas is None else set(colunas)
+    pede_idade = colunas is None or "idade" in colunas
+
+    def manter(nome):
+        nome = normalizar_nome_baseline(nome)
+        if nome == "data de nascimento":
+            return pede_idade
+        if nome in COLUNAS_PII:
+            return False
+        return colunas is None or nome == "id" or nome in colunas
+
+    baseline = pd.read_excel(path, usecols=manter)
+    baseline.columns = [normalizar_nome_baseline(c) for c in baseline.columns]
+
+    if "data de nascimento" in baseline.columns:
+        baseline["idade"] = calcular_idade(baseline.pop("data de nascimento"))
+
+    return baseline.rename(columns={"id": "id_paciente"})
+
+
+# =========================================================
+# 📂 OUTRAS PLANILHAS (PROJEÇÃO POR NOME EXATO)
+# =========================================================
+def ler_planilha(path, colunas, aba=0) -> pd.DataFrame:
+    colunas = set(colunas)
+    return pd.read_excel(path, sheet_name=aba, usecols=lambda c: c in colunas)
+
+
+# =========================================================
+# 📑 PASTAS DE TRABALHO COM VÁRIAS ABAS
+# =========================================================
+# Extrações que chegam com uma aba por centro ou por ano: as abas com o mesmo
+# esquema são lidas (cada uma num processo), marcadas e empilhadas.
+COLUNA_ABA = "aba_origem"
+
+# Sobe quando o formato do cache de abas muda: entradas antigas deixam de casar.
+VERSAO_CACHE_ABAS = 1
+
+# Arquivos guardados por tabela (os usados mais recentemente).
+MANTER_ABAS = 32
+
+_NS_PLANILHA = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_RELACAO = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_TEXTO_COMPARTILHADO = re.compile(rb"<(?:\w+:)?si\b.*?</(?:\w+:)?si>", re.S)
+_REFERENCIA_TEXTO = re.compile(rb'<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)<')
+
+
+def abas_compativeis(path, colunas) -> list:
+    """Abas com as mesmas colunas pedidas (nomes normalizados) que a primeira.
+
+    A referência é a primeira aba que tem alguma coluna pedida; abas de outro
+    formato (dicionário, notas) ficam de fora. Só os cabeçalhos são lidos.
+    """
+    pedidas = {normalizar_nome(c) for c in colunas}
+    cabecalhos = pd.read_excel(path, sheet_name=None, nrows=0)
+    projecoes = {
+        aba: {normalizar_nome(c) for c in df.columns} & pedidas
+        for aba, df in cabecalhos.items()
+    }
+    referencia = next((p for p in projecoes.values() if p), None)
+    return [aba for aba, p in projecoes.items() if p and p == referencia]
+
+
+def _partes_das_abas(z) -> dict:
+    """aba → XML da aba dentro do .xlsx."""
+    livro = ElementTree.fromstring(z.read("xl/workbook.xml"))
+    relacoes = ElementTree.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+    alvos = {r.get("Id"): r.get("Target") for r in relacoes}
+    partes = {}
+    for aba in livro.iter(f"{_NS_PLANILHA}sheet"):
+        alvo = alvos[aba.get(f"{_NS_RELACAO}id")]
+        partes[aba.get("name")] = alvo.lstrip("/") if alvo.startswith("/") else f"xl/{alvo}"
+    return partes
+
+
+def assinaturas_abas(path) -> dict:
+    """aba → hash do conteúdo, sem abrir a pasta no openpyxl.
+
+    Entram o XML da aba, os textos compartilhados que ela referencia e os
+    estilos (o formato decide se a coluna vira data). Editar uma aba não muda a
+    assinatura das outras, mesmo quando a tabela de textos do arquivo cresce.
+    """
+    with zipfile.ZipFile(path) as z:
+        nomes = set(z.namelist())
+        textos = (
+            _TEXTO_COMPARTILHADO.findall(z.read("xl/sharedStrings.xml"))
+            if "xl/sharedStrings.xml" in nomes else []
+        )
+        estilos = z.read("xl/styles.xml") if "xl/styles.xml" in nomes else b""
+        assinaturas = {}
+        for aba, parte in _partes_das_abas(z).items():
+            xml = z.read(parte)
+            h = hashlib.sha256(estilos)
+            h.update(xml)
+            for i in sorted({int(i) for i in _REFERENCIA_TEXTO.findall(xml)}):
+                h.update(b"%d:" % i + (textos[i] if i < len(textos) else b""))
+            assinaturas[aba] = h.hexdigest()
+    return assinaturas
+
+
+def _chave_aba(leitor, args, assinatura):
+    h = hashlib.sha256()
+    for parte in (str(VERSAO_CACHE_ABAS), inspect.getsource(leitor), repr(args), assinatura):
+        h.update(parte.encode())
+    return h.hexdigest()[:16]
+
+
+def _ler_cache(path):
+    try:
+        with open(path, "rb") as f:
+            df = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    os.utime(path)   # poda mantém as abas usadas mais recentemente
+    return df
+
+
+def _gravar_cache(path, df):
+    # grava num temporário e renomeia: leitura concorrente nunca vê meio arquivo
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _podar_cache(pasta, manter):
+    arquivos = sorted(
+        (e.path for e in os.scandir(pasta) if e.name.endswith(".pkl")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for antigo in arquivos[max(manter, MANTER_ABAS):]:
+        try:
+            os.remove(antigo)
+        except OSError:
+            pass
+
+
+def empilhar_abas(partes: dict) -> pd.DataFrame:
+    """{aba: DataFrame} → uma tabela com `COLUNA_ABA` (categórica), num único concat."""
+    tabelas = list(partes.values())
+    df = pd.concat(tabelas, ignore_index=True) if len(tabelas) > 1 else tabelas[0].reset_index(drop=True)
+    codigos = np.repeat(np.arange(len(tabelas), dtype=np.int32), [len(t) for t in tabelas])
+    df[COLUNA_ABA] = pd.Categorical.from_codes(codigos, categories=[str(a) for a in partes])
+    return df
+
+
+# =========================================================
+# 🚀 LEITURA PARALELA DE VÁRIAS PLANILHAS
+# =========================================================
+def ler_em_paralelo(tarefas, processos=None, varias_abas=(), cache_dir=None) -> dict:
+    """{nome: (leitor, path, *args)} → {nome: DataFrame}, uma planilha por processo.
+
+    O parse do openpyxl é CPU e segura o GIL: em processos separados o tempo
+    total fica perto do da planilha mais lenta, não da soma. `leitor` precisa
+    ser uma função de módulo (vai por pickle). Falhas não interrompem as
+    outras leituras: ao fim, todas sobem juntas num `ExceptionGroup`, cada
+    uma com o nome e o arquivo anotados.
+
+    Para os nomes em `varias_abas` (o leitor aceita `aba=` e o primeiro
+    argumento são as colunas), cada aba compatível (`abas_compativeis`) é uma
+    tarefa do pool e o resultado é `empilhar_abas`. Com `cache_dir`, cada aba
+    lida fica em cache pela sua assinatura: uma aba alterada não relê as outras.
+    """
+    resultados, erros, pendentes = {}, [], {}
+    abas, caches = {}, {}
+
+    def falhou(nome, path, erro, aba=None):
+        erro.add_note(f"{nome}: {path}" + (f" [aba {aba}]" if aba is not None else ""))
+        erros.append(erro)
+
+    for nome, (leitor, path, *args) in tarefas.items():
+        if nome not in varias_abas:
+            pendentes[nome] = (leitor, path, args, {})
+            continue
+        try:
+            abas[nome] = abas_compativeis(path, args[0])
+            assinaturas = assinaturas_abas(path) if cache_dir else {}
+        except Exception as erro:
+            falhou(nome, path, erro)
+            continue
+        for aba in abas[nome]:
+            if cache_dir:
+                caches[nome, aba] = os.path.join(
+                    cache_dir, nome, f"{_chave_aba(leitor, args, assinaturas[aba])}.pkl"
+                )
+                df = _ler_cache(caches[nome, aba])
+                if df is not None:
+                    resultados[nome, aba] = df
+                    continue
+            pendentes[nome, aba] = (leitor, path, args, {"aba": aba})
+
+    processos = min(processos or os.cpu_count() or 1, len(pendentes))
+    if processos <= 1:
+        for chave, (leitor, path, args, opcoes) in pendentes.items():
+            try:
+                resultados[chave] = leitor(path, *args, **opcoes)
+            except Exception as erro:
+                falhou(_nome_tarefa(chave), path, erro, opcoes.get("aba"))
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            futuros = {
+                pool.submit(leitor, path, *args, **opcoes): (chave, path, opcoes.get("aba"))
+                for chave, (leitor, path, args, opcoes) in pendentes.items()
+            }
+            for futuro in as_completed(futuros):
+                chave, path, aba = futuros[futuro]
+                try:
+                    resultados[chave] = futuro.result()
+                except Exception as erro:
+                    falhou(_nome_tarefa(chave), path, erro, aba)
+
+    for chave in pendentes.keys() & caches.keys() & resultados.keys():
+        _gravar_cache(caches[chave], resultados[chave])
+    for nome, lista in abas.items():
+        if not lista:
+            falhou(nome, tarefas[nome][1], ValueError("nenhuma aba com as colunas pedidas"))
+            continue
+        if cache_dir:
+            _podar_cache(os.path.join(cache_dir, nome), len(lista))
+        if all((nome, aba) in resultados for aba in lista):
+            resultados[nome] = empilhar_abas({aba: resultados.pop((nome, aba)) for aba in lista})
+
+    if erros:
+        raise ExceptionGroup(
+            f"{len(erros)} de {len(tarefas)} planilha(s) não puderam ser lidas", erros
+        )
+    return {nome: resultados[nome] for nome in tarefas}
+
+
+def _nome_tarefa(chave):
+    return chave[0] if isinstance(chave, tuple) else chave
+
+
+# =========================================================
+# 🔖 VERSÃO DOS DADOS
+# =========================================================
+@lru_cache(maxsize=64)
+def _hash_arquivo(path, tamanho, mtime_ns):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def versao_dados(*paths) -> str:
+    """Hash do conteúdo dos arquivos-fonte (recalculado só se mudarem)."""
+    h = hashlib.sha256()
+    for path in paths:
+        info = os.stat(path)
+        h.update(os.path.basename(str(path)).encode())
+        h.update(_hash_arquivo(str(path), info.st_size, info.st_mtime_ns).encode())
+    return h.hexdigest()[:16]
+
+
+# =========================================================
+# 🔢 CONVERSÕES VETORIZADAS
+# =========================================================
+def mapear_unicos(serie: pd.Series, func) -> pd.Series:
+    """Aplica `func` uma vez por valor distinto e espalha o resultado.
+
+    Mantém exatamente a semântica das funções elemento a elemento das apps
+    (`to_float`, `grau`), com custo proporcional ao nº de valores distintos.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    valores = np.array([func(u) for u in unicos], dtype=float)
+    return pd.Series(valores[codigos], index=serie.index, name=serie.name)
+
+
+def to_float(x):
+    try:
+        return float(str(x).replace(",", "."))
+    except Exception:
+        return np.nan
+
+
+def para_float(serie: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    return mapear_unicos(serie, to_float)
+
+
+# =========================================================
+# 🧹 LIMPEZA DA PLANILHA METRONÔMICA
+# =========================================================
+COLUNAS_NUMERICAS = ["pesomt", "hemoglobinamt", "leucocitosmt"]
+
+
+def preparar_metronomica(metro: pd.DataFrame) -> pd.DataFrame:
+    """Ciclo sequencial por paciente + colunas laboratoriais em float."""
+    metro = metro.sort_values("id_paciente")
+    metro["ciclo"] = metro.groupby("id_paciente").cumcount() + 1
+
+    for col in COLUNAS_NUMERICAS:
+        if col in metro.columns:
+            metro[col] = para_float(metro[col])
+
+    return metro
+
+
+# =========================================================
+# 📊 RESUMO POR PACIENTE
+# =========================================================
+def resumir_por_paciente(metro: pd.DataFrame) -> pd.DataFrame:
+    return (
+        metro.groupby("id_paciente")
+        .agg(
+            n_ciclos=("id_paciente", "count"),
+            peso_medio=("pesomt", "mean"),
+            hb_media=("hemoglobinamt", "mean"),
+            leuco_medio=("leucocitosmt", "mean"),
+        )
+        .reset_index()
+    )
@@ -0,0 +1,176 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import numpy as np
+import pandas as pd
+
+from dados import para_float
+
+
+# =========================================================
+# ⚙️ PROTOCOLO E LIMITES
+# =========================================================
+COLUNAS_DOSE = [
+    "data_1_dia_mt", "pesomt", "alturamt", "superficiecorporalmt",
+    "vimblastina", "ciclofosfamida",
+]
+
+# Dose prevista por ciclo (mg/m²) e duração do ciclo (dias). Doses na planilha
+# estão em mg; divididas pela SC registrada, as medianas são 3,0 e 25 mg/m², e
+# o intervalo mais comum entre ciclos é de 28 dias.
+DOSE_PREVISTA_M2 = {"vimblastina": 3.0, "ciclofosfamida": 25.0}
+DIAS_CICLO = 28
+
+# Faixas plausíveis: fora delas o valor é tratado como ausente (0, 9999, erros
+# de unidade como peso em gramas).
+FAIXAS = {
+    "pesomt": (2.0, 200.0),             # kg
+    "alturamt": (40.0, 230.0),          # cm
+    "superficiecorporalmt": (0.1, 3.0), # m²
+    "vimblastina": (0.01, 50.0),        # mg
+    "ciclofosfamida": (0.01, 500.0),    # mg
+}
+
+# Diferença relativa aceita entre a SC registrada e a recalculada (Mosteller).
+TOLERANCIA_SC = 0.10
+
+
+# =========================================================
+# 📐 SUPERFÍCIE CORPORAL
+# =========================================================
+FORMULAS_SC = {
+    "mosteller": lambda p, a: np.sqrt(p * a / 3600),
+    "dubois": lambda p, a: 0.007184 * p ** 0.425 * a ** 0.725,
+    "haycock": lambda p, a: 0.024265 * p ** 0.5378 * a ** 0.3964,
+}
+
+
+def medida(serie: pd.Series, coluna) -> np.ndarray:
+    """Coluna em float, com valores fora de `FAIXAS[coluna]` como NaN."""
+    valores = para_float(serie).to_numpy(dtype=float)
+    minimo, maximo = FAIXAS[coluna]
+    with np.errstate(invalid="ignore"):
+        return np.where((valores >= minimo) & (valores <= maximo), valores, np.nan)
+
+
+def superficie_corporal(peso, altura, formula="mosteller") -> np.ndarray:
+    """SC (m²) a partir de peso (kg) e altura (cm)."""
+    return FORMULAS_SC[formula](np.asarray(peso, float), np.asarray(altura, float))
+
+
+def conferir_superficie(metro: pd.DataFrame) -> pd.DataFrame:
+    """SC registrada × recalculada, uma linha por registro.
+
+    `sc_situacao`: ok, divergente (> `TOLERANCIA_SC` da Mosteller),
+    sem_registro (SC ausente/implausível) ou sem_medidas (sem peso/altura
+    válidos para conferir). A SC usada nas doses é a registrada, exceto quando
+    diverge ou falta — aí entra a recalculada.
+    """
+    peso, altura = medida(metro["pesomt"], "pesomt"), medida(metro["alturamt"], "alturamt")
+    registrada = medida(metro["superficiecorporalmt"], "superficiecorporalmt")
+
+    calculadas = {f"sc_{nome}": superficie_corporal(peso, altura, nome) for nome in FORMULAS_SC}
+    mosteller = calculadas["sc_mosteller"]
+    with np.errstate(invalid="ignore"):
+        diferenca = registrada / mosteller - 1
+
+    situacao = np.select(
+        [np.isnan(mosteller), np.isnan(registrada), np.abs(diferenca) > TOLERANCIA_SC],
+        ["sem_medidas", "sem_registro", "divergente"],
+        "ok",
+    )
+    usada = np.where(
+        ~np.isnan(registrada) & (situacao != "divergente"), registrada, mosteller
+    )
+    return pd.DataFrame({
+        "peso": peso, "altura": altura, "sc_registrada": registrada,
+        **calculadas,
+        "sc_diferenca_rel": diferenca, "sc_situacao": situacao, "sc_usada": usada,
+    }, index=metro.index)
+
+
+# =========================================================
+# 💊 INTENSIDADE DE DOSE POR CICLO
+# =========================================================
+def dose_por_ciclo(metro: pd.DataFrame) -> pd.DataFrame:
+    """Dose (mg/m²) e intensidade relativa de dose (IRD) por registro.
+
+    Os ciclos de cada paciente são ordenados pela data do 1º dia; a duração
+    de um ciclo é o intervalo até o ciclo seguinte (o último recebe
+    `DIAS_CICLO`). IRD = (dose/m² ÷ dose prevista) × (`DIAS_CICLO` ÷ duração).
+    """
+    sc = conferir_superficie(metro)
+    data = pd.to_datetime(metro["data_1_dia_mt"], errors="coerce").to_numpy()
+    pac, _ = pd.factorize(metro["id_paciente"], sort=True)
+
+    # próximo ciclo do mesmo paciente, em ordem de data (NaT no fim)
+    ordem = np.lexsort((data, pac))
+    mesmo = pac[ordem][1:] == pac[ordem][:-1]
+    dias_ord = np.full(len(ordem), float(DIAS_CICLO))
+    dias_ord[:-1][mesmo] = (
+        (data[ordem][1:] - data[ordem][:-1]).astype("timedelta64[D]").astype(float)
+    )[mesmo]
+    dias = np.empty_like(dias_ord)
+    dias[ordem] = dias_ord
+    dias = np.where(dias > 0, dias, np.nan)   # datas repetidas/ausentes
+
+    tabela = pd.DataFrame({
+        "id_paciente": metro["id_paciente"].to_numpy(),
+        "ciclo": metro["ciclo"].to_numpy(),
+        "data_1_dia_mt": metro["data_1_dia_mt"].to_numpy(),
+        "dias_ciclo": dias,
+    }, index=metro.index)
+    tabela = pd.concat([tabela, sc], axis=1)
+
+    for farmaco, prevista in DOSE_PREVISTA_M2.items():
+        mg = medida(metro[farmaco], farmaco)
+        mg_m2 = mg / sc["sc_usada"].to_numpy()
+        tabela[f"{farmaco}_mg"] = mg
+        tabela[f"{farmaco}_mg_m2"] = mg_m2
+        tabela[f"{farmaco}_ird"] = (mg_m2 / prevista) * (DIAS_CICLO / dias)
+    return tabela.reset_index(drop=True)
+
+
+# =========================================================
+# 📦 EXPOSIÇÃO ACUMULADA POR PACIENTE
+# =========================================================
+def exposicao_por_paciente(doses: pd.DataFrame) -> pd.DataFrame:
+    """Doses acumuladas e IRD global por paciente (somas com `np.bincount`).
+
+    IRD global = dose/m² entregue ÷ dose/m² prevista para o tempo em
+    tratamento (soma das durações dos ciclos com dose registrada).
+    """
+    pac, ids = pd.factorize(doses["id_paciente"], sort=True)
+    n = len(ids)
+
+    def somar(valores):
+        """Soma por paciente ignorando NaN; NaN se o paciente não tem nenhum valor."""
+        valores = np.asarray(valores, dtype=float)
+        ok = ~np.isnan(valores)
+        soma = np.bincount(pac[ok], weights=valores[ok], minlength=n)
+        return np.where(np.bincount(pac[ok], minlength=n) > 0, soma, np.nan)
+
+    sc = doses["sc_usada"].to_numpy(dtype=float)
+    tabela = pd.DataFrame({
+        "id_paciente": ids,
+        "n_ciclos": np.bincount(pac, minlength=n),
+        "sc_media": somar(sc) / somar(np.where(np.isnan(sc), np.nan, 1.0)),
+        "sc_divergentes": np.bincount(
+            pac, weights=doses["sc_situacao"].to_numpy() == "divergente", minlength=n
+        ).astype(np.int64),
+    })
+
+    for farmaco, prevista in DOSE_PREVISTA_M2.items():
+        mg_m2 = doses[f"{farmaco}_mg_m2"].to_numpy(dtype=float)
+        com_dose = ~np.isnan(mg_m2) & ~np.isnan(doses["dias_ciclo"].to_numpy())
+        dias = somar(np.where(com_dose, doses["dias_ciclo"], np.nan))
+
+        tabela[f"{farmaco}_acumulada_mg"] = somar(doses[f"{farmaco}_mg"])
+        tabela[f"{farmaco}_acumulada_mg_m2"] = somar(mg_m2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tabela[f"{farmaco}_ird"] = np.where(
+                dias > 0,
+                somar(np.where(com_dose, mg_m2, np.nan)) / (prevista * dias / DIAS_CICLO),
+                np.nan,
+            )
+    return tabela
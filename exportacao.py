@@ -0,0 +1,409 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import argparse
+import os
+import shutil
+import tempfile
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+import artefatos
+from agregados import tabela_ciclos, tabela_toxicidade_por_paciente
+from construcao import chave
+from dados import resumir_por_paciente
+from toxicidade import Cubo
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+DIR_PADRAO = os.path.join(artefatos.BASE_DIR, "output", "exportacao")
+
+FORMATOS = ("xlsx", "csv", "parquet")
+
+# Linhas convertidas por vez: limita a memória extra a um lote.
+TAMANHO_LOTE = 50_000
+
+# Limite do Excel (inclui o cabeçalho): acima disso a aba continua em "<aba>_2".
+LIMITE_LINHAS_XLSX = 1_048_576
+
+FORMATO_DATA = "dd/mm/yyyy"
+FORMATO_DECIMAL = "0.00"
+
+
+# =========================================================
+# 🔁 LOTES
+# =========================================================
+def _lotes(fonte, tamanho_lote=TAMANHO_LOTE):
+    """Aceita um DataFrame ou um iterável de DataFrames (ex.: leitura em partes)."""
+    if isinstance(fonte, pd.DataFrame):
+        for i in range(0, max(len(fonte), 1), tamanho_lote):
+            yield fonte.iloc[i:i + tamanho_lote]
+    else:
+        yield from fonte
+
+
+def _formato_coluna(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return FORMATO_DATA
+    if pd.api.types.is_float_dtype(serie):
+        return FORMATO_DECIMAL
+    return None
+
+
+# =========================================================
+# 📗 XLSX EM STREAMING (openpyxl write-only)
+# =========================================================
+class _AbaXlsx:
+    """Uma aba em modo write-only: as linhas vão direto para o arquivo
+    temporário da aba, nada fica retido no Workbook."""
+
+    path = None  # gravada junto com o Workbook
+
+    def __init__(self, wb, nome):
+        self.wb = wb
+        self.nome = nome
+        self.partes = 0
+        self.ws = None
+        self.colunas = None
+
+    def _nova_parte(self):
+        self.partes += 1
+        titulo = self.nome if self.partes == 1 else f"{self.nome}_{self.partes}"
+        self.ws = self.wb.create_sheet(titulo[:31])
+        self.linhas = 0
+
+        # largura e cabeçalho precisam vir antes da primeira linha
+        for i, (coluna, _) in enumerate(self.colunas, start=1):
+            largura = min(max(len(str(coluna)) + 2, 10), 40)
+            self.ws.column_dimensions[get_column_letter(i)].width = largura
+        self.ws.freeze_panes = "A2"
+
+        negrito = Font(bold=True)
+        cabecalho = []
+        for coluna, _ in self.colunas:
+            celula = WriteOnlyCell(self.ws, value=str(coluna))
+            celula.font = negrito
+            cabecalho.append(celula)
+        self.ws.append(cabecalho)
+        self.linhas = 1
+
+    def escrever(self, lote):
+        if self.colunas is None:
+            self.colunas = [(c, _formato_coluna(lote[c])) for c in lote.columns]
+            self._nova_parte()
+
+        formatados = [i for i, (_, fmt) in enumerate(self.colunas) if fmt]
+        valores = lote.astype(object).where(lote.notna(), None).to_numpy()
+
+        for linha in valores:
+            if self.linhas >= LIMITE_LINHAS_XLSX:
+                self._nova_parte()
+            linha = list(linha)
+            for i in formatados:
+                if linha[i] is not None:
+                    celula = WriteOnlyCell(self.ws, value=linha[i])
+                    celula.number_format = self.colunas[i][1]
+                    linha[i] = celula
+            self.ws.append(linha)
+            self.linhas += 1
+
+    def fechar(self):
+        pass
+
+
+# =========================================================
+# 📄 SAÍDAS LATERAIS (CSV / PARQUET)
+# =========================================================
+class _SaidaCsv:
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        self.cabecalho = True
+
+    def escrever(self, lote):
+        lote.to_csv(self.f, header=self.cabecalho, index=False)
+        self.cabecalho = False
+
+    def fechar(self):
+        self.f.close()
+
+
+class _SaidaParquet:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def escrever(self, lote):
+        if self.writer is None:
+            tabela = pa.Table.from_pandas(lote, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.path, tabela.schema)
+        else:
+            tabela = pa.Table.from_pandas(
+                lote, schema=self.writer.schema, preserve_index=False
+            )
+        self.writer.write_table(tabela)
+
+    def fechar(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# =========================================================
+# 🚀 EXPORTAÇÃO
+# =========================================================
+def exportar(destino, nome, abas, formatos=("xlsx",), tamanho_lote=TAMANHO_LOTE):
+    """Grava várias tabelas numa única passada, lote a lote.
+
+    `abas` mapeia nome da aba → DataFrame ou iterável de DataFrames. O xlsx
+    recebe uma aba por tabela (`<nome>.xlsx`); CSV e Parquet, um arquivo por
+    tabela (`<nome>-<aba>.csv`). Retorna os caminhos gravados.
+    """
+    desconhecidos = set(formatos) - set(FORMATOS)
+    if desconhecidos:
+        raise ValueError(f"Formatos não suportados: {sorted(desconhecidos)}")
+    os.makedirs(destino, exist_ok=True)
+
+    gravados = []
+    wb = Workbook(write_only=True) if "xlsx" in formatos else None
+
+    for aba, fonte in abas.items():
+        saidas = []
+        if wb is not None:
+            saidas.append(_AbaXlsx(wb, aba))
+        if "csv" in formatos:
+            saidas.append(_SaidaCsv(os.path.join(destino, f"{nome}-{aba}.csv")))
+        if "parquet" in formatos:
+            saidas.append(_SaidaParquet(os.path.join(destino, f"{nome}-{aba}.parquet")))
+
+        try:
+            for lote in _lotes(fonte, tamanho_lote):
+                for saida in saidas:
+                    saida.escrever(lote)
+        finally:
+            for saida in saidas:
+                saida.fechar()
+        gravados.extend(s.path for s in saidas if s.path)
+
+    if wb is not None:
+        path = os.path.join(destino, f"{nome}.xlsx")
+        wb.save(path)
+        gravados.insert(0, path)
+
+    return gravados
+
+
+def exportar_xlsx(path, abas, tamanho_lote=TAMANHO_LOTE):
+    """Atalho para um único .xlsx (substitui `DataFrame.to_excel`)."""
+    destino, arquivo = os.path.split(os.path.abspath(path))
+    return exportar(destino, os.path.splitext(arquivo)[0], abas, ("xlsx",), tamanho_lote)[0]
+
+
+# =========================================================
+# ✂️ FATIAS FILTRADAS (DOWNLOADS DAS APPS)
+# =========================================================
+DIR_FATIAS = os.path.join(DIR_PADRAO, "fatias")
+
+# Sobe quando o conteúdo de uma fatia muda: arquivos antigos deixam de casar.
+VERSAO_FATIAS = 1
+
+# Arquivos guardados (os baixados mais recentemente): repetir o download do
+# mesmo filtro só relê o disco.
+MANTER_FATIAS = 40
+
+MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+TABELAS_FATIA = {
+    "ciclos": "Registros por ciclo",
+    "resumo": "Resumo por paciente",
+    "toxicidade": "Toxicidade por paciente",
+    "cubo": "Graus (paciente × ciclo)",
+}
+
+COLUNAS_RESUMO = ["id_paciente", "pesomt", "hemoglobinamt", "leucocitosmt"]
+
+
+def filtro_fatia(pacientes=(), ciclos=None, toxicidades=None) -> dict:
+    """Filtro normalizado: a mesma seleção sempre gera a mesma chave."""
+    return {
+        "pacientes": sorted(pacientes),
+        "ciclos": None if ciclos is None else [int(ciclos[0]), int(ciclos[1])],
+        "toxicidades": None if toxicidades is None else list(toxicidades),
+    }
+
+
+def linhas_filtradas(metro: pd.DataFrame, filtro) -> np.ndarray:
+    """Posições das linhas da tabela por ciclo que passam no filtro."""
+    manter = np.ones(len(metro), bool)
+    if filtro["pacientes"]:
+        manter &= metro["id_paciente"].isin(filtro["pacientes"]).to_numpy()
+    if filtro["ciclos"] is not None:
+        ciclo = metro["ciclo"].to_numpy()
+        manter &= (ciclo >= filtro["ciclos"][0]) & (ciclo <= filtro["ciclos"][1])
+    return np.flatnonzero(manter)
+
+
+def fatiar_cubo(cubo: Cubo, filtro) -> Cubo:
+    pac = np.isin(cubo.ids, filtro["pacientes"]) if filtro["pacientes"] else np.ones(len(cubo.ids), bool)
+    cic = np.ones(len(cubo.ciclos), bool)
+    if filtro["ciclos"] is not None:
+        cic = (cubo.ciclos >= filtro["ciclos"][0]) & (cubo.ciclos <= filtro["ciclos"][1])
+    tox = [i for i, c in enumerate(cubo.colunas)
+           if filtro["toxicidades"] is None or c in filtro["toxicidades"]]
+    graus = np.asarray(cubo.graus)[np.ix_(pac, cic, tox)]
+    return Cubo(cubo.ids[pac], cubo.ciclos[cic], [cubo.colunas[i] for i in tox], graus)
+
+
+def lotes_linhas(df, posicoes, colunas=None, transformar=None, tamanho_lote=TAMANHO_LOTE):
+    """Lotes das linhas `posicoes` lidos direto do frame em cache: a fatia
+    inteira (e a versão com graus decodificados) nunca é montada."""
+    if colunas is not None:
+        df = df[colunas]
+    for i in range(0, max(len(posicoes), 1), tamanho_lote):
+        lote = df.iloc[posicoes[i:i + tamanho_lote]]
+        yield transformar(lote) if transformar else lote
+
+
+def lotes_cubo(cubo: Cubo, tamanho_lote=TAMANHO_LOTE):
+    """Cubo em formato longo (id_paciente, ciclo, toxicidade, grau), só as
+    células com registro, em blocos de pacientes."""
+    graus = np.asarray(cubo.graus)
+    passo = max(tamanho_lote // max(int(np.prod(graus.shape[1:])), 1), 1)
+    colunas = np.asarray(cubo.colunas, dtype=object)
+    for i in range(0, max(len(cubo.ids), 1), passo):
+        bloco = graus[i:i + passo]
+        pac, cic, tox = np.nonzero(~np.isnan(bloco))
+        yield pd.DataFrame({
+            "id_paciente": cubo.ids[i:i + passo][pac],
+            "ciclo": cubo.ciclos[cic],
+            "toxicidade": colunas[tox],
+            "grau": bloco[pac, cic, tox],
+        })
+
+
+def fontes_fatia(dados, filtro):
+    """nome → função que devolve os lotes daquela tabela na fatia."""
+    metro = dados["metro"]
+    posicoes = linhas_filtradas(metro, filtro)
+    cubo = fatiar_cubo(dados["cubo"], filtro)
+    fora = set(dados["cubo"].colunas) - set(cubo.colunas)   # toxicidades não escolhidas
+    colunas = [c for c in metro.columns if c not in fora]
+    return {
+        "ciclos": lambda: lotes_linhas(
+            metro, posicoes, colunas, partial(tabela_ciclos, colunas=cubo.colunas)
+        ),
+        "resumo": lambda: [resumir_por_paciente(metro[COLUNAS_RESUMO].iloc[posicoes])],
+        "toxicidade": lambda: [tabela_toxicidade_por_paciente(cubo)],
+        "cubo": lambda: lotes_cubo(cubo),
+    }
+
+
+def exportar_fatia(nome, fonte, formato, chave_fatia, destino=DIR_FATIAS,
+                   tamanho_lote=TAMANHO_LOTE):
+    """Arquivo de uma fatia, gravado em lotes uma única vez por chave.
+
+    `fonte` (função que devolve os lotes) só é chamada quando o arquivo da
+    chave ainda não existe; ele é gravado numa pasta temporária e renomeado,
+    então downloads simultâneos nunca leem um arquivo pela metade.
+    """
+    path = os.path.join(destino, f"{nome}-{chave_fatia}.{formato}")
+    if os.path.exists(path):
+        os.utime(path)   # poda mantém os arquivos baixados mais recentemente
+        return path
+
+    os.makedirs(destino, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=destino)
+    try:
+        gravado, = exportar(tmp, nome, {nome: fonte()}, (formato,), tamanho_lote)
+        os.replace(gravado, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    _podar_fatias(destino)
+    return path
+
+
+def _podar_fatias(destino):
+    arquivos = sorted(
+        (e.path for e in os.scandir(destino) if e.is_file()),
+        key=os.path.getmtime, reverse=True,
+    )
+    for antigo in arquivos[MANTER_FATIAS:]:
+        try:
+            os.remove(antigo)
+        except OSError:   # outro processo já podou
+            pass
+
+
+def baixar_fatia(dados, versao, nome, filtro, formato):
+    """Bytes do download; o botão só chama isto no clique."""
+    k = chave(VERSAO_FATIAS, versao, nome, filtro, formato)
+    path = exportar_fatia(nome, fontes_fatia(dados, filtro)[nome], formato, k)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def secao_exportacao(dados, versao, key="exportacao", ciclo_max=None):
+    """Filtros da fatia + um botão de download por tabela (Streamlit)."""
+    import streamlit as st
+
+    cubo = dados["cubo"]
+    ciclos = cubo.ciclos if ciclo_max is None else cubo.ciclos[cubo.ciclos <= ciclo_max]
+    faixa = (int(ciclos.min()), int(ciclos.max())) if len(ciclos) else (0, 0)
+
+    c_pac, c_cic = st.columns([3, 2])
+    pacientes = c_pac.multiselect(
+        "Pacientes", cubo.ids.tolist(), key=f"{key}_pacientes", placeholder="todos"
+    )
+    if faixa[0] < faixa[1]:
+        faixa = c_cic.slider("Ciclos", *faixa, value=faixa, key=f"{key}_ciclos")
+    c_tox, c_fmt = st.columns([3, 2])
+    toxicidades = c_tox.multiselect(
+        "Toxicidades", cubo.colunas, default=cubo.colunas, key=f"{key}_toxicidades"
+    )
+    formato = c_fmt.radio("Formato", FORMATOS, horizontal=True, key=f"{key}_formato")
+
+    filtro = filtro_fatia(pacientes, faixa, [c for c in cubo.colunas if c in toxicidades])
+    for col, (nome, rotulo) in zip(st.columns(len(TABELAS_FATIA)), TABELAS_FATIA.items()):
+        col.download_button(
+            f"⬇️ {rotulo}", partial(baixar_fatia, dados, versao, nome, filtro, formato),
+            file_name=f"{nome}.{formato}", mime=MIME[formato], on_click="ignore",
+            key=f"{key}_baixar_{nome}",
+        )
+
+
+def abas_analisadas(agregados):
+    """Tabela por ciclo, resumo por paciente e tabela de toxicidade."""
+    return {
+        "ciclos": tabela_ciclos(agregados["metro"]),
+        "resumo": agregados["resumo"],
+        "toxicidade": tabela_toxicidade_por_paciente(agregados["cubo"]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta as tabelas analisadas (xlsx em streaming, CSV, Parquet)."
+    )
+    parser.add_argument("--formatos", nargs="+", default=["xlsx"], choices=FORMATOS)
+    parser.add_argument("--destino", default=DIR_PADRAO)
+    parser.add_argument("--nome", default="metro-analisada")
+    parser.add_argument("--dados", default=artefatos.BASE_DIR,
+                        help="diretório com as planilhas de origem")
+    args = parser.parse_args()
+
+    _, agregados = artefatos.carregar_agregados(artefatos.fontes_padrao(args.dados))
+    for path in exportar(args.destino, args.nome, abas_analisadas(agregados), args.formatos):
+        print("✔️ SALVO:", path)
@@ -0,0 +1,192 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from construcao import chave
+
+
+# =========================================================
+# 📁 PATHS E PARÂMETROS
+# =========================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_PADRAO = os.path.join(BASE_DIR, "output", "relatorios")
+
+CONCLUIDO = "concluido.json"
+PACOTE_HTML = "relatorio_html.zip"
+# Entra na chave das tarefas: relatórios prontos de um formato de pacote
+# anterior (zip com caminhos absolutos do servidor) não são reaproveitados.
+VERSAO_PACOTE = 2
+
+# Nós do relatório (ver `Construcao`) quando ainda não há execução anterior
+# para contar: só serve para a barra de progresso da primeira tarefa.
+NOS_PADRAO = 20
+
+
+# =========================================================
+# 🧾 TAREFA
+# =========================================================
+class Tarefa:
+    """Estado de uma geração de relatório (lido pela interface a cada rerun)."""
+
+    def __init__(self, chave, pasta, parametros):
+        self.chave = chave
+        self.pasta = pasta
+        self.parametros = parametros
+        self.estado = "na_fila"       # na_fila, executando, pronto, falhou
+        self.nos = 0                  # nós do relatório já concluídos
+        self.total_nos = NOS_PADRAO
+        self.inicio = None
+        self.duracao = None
+        self.erro = None
+        self.arquivos = {}            # html (zip com figuras), pdf
+
+    @property
+    def progresso(self):
+        if self.estado == "pronto":
+            return 1.0
+        return min(self.nos / self.total_nos, 0.99)
+
+    def eta(self, duracao_tipica=None):
+        """Segundos restantes estimados, ou None sem base para estimar."""
+        if self.estado != "executando" or self.inicio is None:
+            return duracao_tipica if self.estado == "na_fila" else None
+        decorrido = time.time() - self.inicio
+        if self.nos:
+            return decorrido * (1 - self.progresso) / self.progresso
+        if duracao_tipica is not None:
+            return max(duracao_tipica - decorrido, 0.0)
+        return None
+
+
+# =========================================================
+# 🧵 FILA COM POOL DE WORKERS
+# =========================================================
+class FilaRelatorios:
+    """Fila local de gerações de relatório, uma por (versão dos dados, filtros).
+
+    Pedidos iguais devolvem a mesma tarefa (na fila, em execução ou pronta);
+    relatórios prontos ficam em `destino/<chave>/` e são reaproveitados
+    inclusive depois de reiniciar o processo. Cada tarefa roda
+    `generate_report.py` num subprocesso (matplotlib não é thread-safe e a
+    sessão não fica bloqueada); os workers só acompanham a saída dele para
+    contar os nós concluídos. O cache de seções é comum a todas as tarefas,
+    então filtros diferentes reaproveitam as figuras que não mudam.
+    """
+
+    def __init__(self, destino=DIR_PADRAO, processos=1):
+        self.destino = destino
+        self.cache_dir = os.path.join(destino, ".cache")
+        self.tarefas = {}
+        self.duracoes = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=processos, thread_name_prefix="relatorio")
+        os.makedirs(destino, exist_ok=True)
+
+    def pedir(self, versao, fontes, filtros, pdf=True) -> Tarefa:
+        parametros = {"versao": versao, "filtros": dict(filtros), "pdf": pdf, "pacote": VERSAO_PACOTE}
+        k = chave(parametros)
+        with self._lock:
+            tarefa = self.tarefas.get(k)
+            if tarefa is not None and tarefa.estado != "falhou":
+                return tarefa
+
+            tarefa = Tarefa(k, os.path.join(self.destino, k), parametros)
+            self.tarefas[k] = tarefa
+            if self._ler_concluida(tarefa):
+                return tarefa
+            self._pool.submit(self._executar, tarefa, fontes)
+            return tarefa
+
+    def duracao_tipica(self):
+        return sum(self.duracoes) / len(self.duracoes) if self.duracoes else None
+
+    def _ler_concluida(self, tarefa):
+        try:
+            with open(os.path.join(tarefa.pasta, CONCLUIDO)) as f:
+                concluido = json.load(f)
+        except (OSError, ValueError):
+            return False
+        arquivos = {n: os.path.join(tarefa.pasta, a) for n, a in concluido["arquivos"].items()}
+        if not all(os.path.exists(p) for p in arquivos.values()):
+            return False
+        tarefa.estado, tarefa.arquivos = "pronto", arquivos
+        tarefa.duracao = concluido.get("duracao_s")
+        return True
+
+    def _total_nos(self):
+        # nº de nós da última execução de qualquer tarefa (varia com os dados)
+        for t in self.tarefas.values():
+            log = os.path.join(t.pasta, "relatorio_construcao.json")
+            if t.estado == "pronto" and os.path.exists(log):
+                with open(log) as f:
+                    return max(len(json.load(f)["nos"]), 1)
+        return NOS_PADRAO
+
+    def _comando(self, tarefa, fontes):
+        p = tarefa.parametros
+        comando = [
+            sys.executable, "-u", os.path.join(BASE_DIR, "generate_report.py"),
+            "--sem-pipeline", "--portatil", "--saida", tarefa.pasta, "--cache", self.cache_dir,
+            "--metro", str(fontes["metro"]), "--baseline", str(fontes["baseline"]),
+            "--estatistico", str(fontes["estatistico"]), "--idades", str(fontes["idades"]),
+        ]
+        for nome, valor in p["filtros"].items():
+            comando += [f"--{nome}", str(valor)]
+        if not p["pdf"]:
+            comando.append("--sem-pdf")
+        return comando
+
+    def _executar(self, tarefa, fontes):
+        tarefa.total_nos = self._total_nos()
+        tarefa.estado, tarefa.inicio = "executando", time.time()
+        saida = []
+        try:
+            proc = subprocess.Popen(
+                self._comando(tarefa, fontes), cwd=BASE_DIR, text=True,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            )
+            for linha in proc.stdout:
+                saida.append(linha)
+                if linha.lstrip().startswith(("🔨", "♻️")):   # um nó do relatório concluído
+                    tarefa.nos += 1
+            codigo = proc.wait()
+            html = os.path.join(tarefa.pasta, "relatorio.html")
+            if codigo != 0 or not os.path.exists(html):
+                raise RuntimeError(f"código {codigo}")
+            self._concluir(tarefa)
+        except Exception as erro:
+            tarefa.estado = "falhou"
+            tarefa.erro = f"{erro}\n{''.join(saida)[-2000:]}"
+
+    def _concluir(self, tarefa):
+        # HTML + figuras + páginas das tabelas + logo num zip; o relatório da fila
+        # é gerado com caminhos relativos (`--portatil`), então abre fora do servidor
+        pacote = os.path.join(tarefa.pasta, PACOTE_HTML)
+        with zipfile.ZipFile(pacote, "w", zipfile.ZIP_DEFLATED) as z:
+            z.write(os.path.join(tarefa.pasta, "relatorio.html"), "relatorio.html")
+            for sub in ("figs", "tabelas", "assets"):
+                for raiz, _, nomes in os.walk(os.path.join(tarefa.pasta, sub)):
+                    for nome in nomes:
+                        path = os.path.join(raiz, nome)
+                        z.write(path, os.path.relpath(path, tarefa.pasta))
+
+        arquivos = {"html": PACOTE_HTML}
+        if os.path.exists(os.path.join(tarefa.pasta, "relatorio.pdf")):
+            arquivos["pdf"] = "relatorio.pdf"
+        tarefa.duracao = time.time() - tarefa.inicio
+        with open(os.path.join(tarefa.pasta, CONCLUIDO), "w") as f:
+            json.dump({"parametros": tarefa.parametros, "arquivos": arquivos,
+                       "duracao_s": round(tarefa.duracao, 1)}, f, indent=2, ensure_ascii=False)
+
+        with self._lock:
+            self.duracoes.append(tarefa.duracao)
+        tarefa.arquivos = {n: os.path.join(tarefa.pasta, a) for n, a in arquivos.items()}
+        tarefa.estado = "pronto"
@@ -1,16 +1,41 @@
 # =========================================================
 # 📦 IMPORTS
 # =========================================================
+import argparse
 import os
-import subprocess
-from datetime import datetime, date
+import shutil
+from datetime import datetime
 
-import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from jinja2 import Environment, FileSystemLoader
 
+from agregados import COLUNAS_ESTATISTICO, COLUNAS_IDADES, TABELAS_VARIAS_ABAS
+from comparacao import comparar_grupos
+from construcao import Construcao, conteudo_arquivos
+from dados import (
+    ler_baseline_anonimizado,
+    ler_em_paralelo,
+    ler_metronomica,
+    ler_planilha,
+    preparar_metronomica,
+    resumir_por_paciente,
+)
+from importacao import ModuloTardio
+from incidencia import (
+    LIMIAR_GRAVE,
+    curvas_incidencia,
+    grupos_adesao,
+    primeiro_evento,
+    resumo_incidencia,
+)
+from instrumentacao import Instrumentacao
+from paginacao import POR_PAGINA, paginar_registros
+from toxicidade import montar_cubo, tabela_heatmap
+
+# bibliotecas de gráficos só são importadas na primeira figura
+plt = ModuloTardio("matplotlib.pyplot")
+sns = ModuloTardio("seaborn")
+
 
 # =========================================================
 # 📁 PATHS E DIRETÓRIOS
@@ -20,298 +45,578 @@ BIOINFO_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-FIGS_DIR = os.path.join(OUTPUT_DIR, "figs")
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(FIGS_DIR, exist_ok=True)
+METRO_FILE = os.path.join(BIOINFO_DIR, "planilha-metronomica-filtrada.xlsx")
+BASELINE_FILE = os.path.join(BIOINFO_DIR, "1_202407_Baseline.xlsx")
+ESTATISTICO_FILE = os.path.join(BIOINFO_DIR, "Tabela-ewing_estatistico-22-ago-25.xlsx")
+IDADES_FILE = os.path.join(BIOINFO_DIR, "Idades-range-media.xlsx")
+
+# Colunas usadas pelo relatório (nomes normalizados). Identificadores do
+# baseline nunca são lidos.
+COLUNAS_METRO = [
+    "id_paciente", "ciclo_mt", "pesomt", "hemoglobinamt", "leucocitosmt",
+    "anemiahbmt", "plaquetopeniamt", "neutropeniamt", "neutropeniafebremt",
+    "nauseasmt", "vomitosmt", "mucositemt", "diarreiamt",
+    "renal_creatinamt", "hepatica_bt_mt", "hepatica_tgo_mt", "hepatica_tgp_mt",
+]
+
+tox_cols = [
+    ("AnemiaHBMT", "anemiahbmt", "Hemoglobina baixa — queda de Hb."),
+    ("PlaquetopeniaMT", "plaquetopeniamt", "Plaquetas reduzidas."),
+    ("NeutropeniaMT", "neutropeniamt", "Neutrófilos reduzidos."),
+    ("NeutropeniaFebreMT", "neutropeniafebremt", "Neutropenia + febre."),
+    ("NauseasMT", "nauseasmt", "Náuseas."),
+    ("VomitosMT", "vomitosmt", "Vômitos."),
+    ("MucositeMT", "mucositemt", "Mucosite."),
+    ("DiarreiaMT", "diarreiamt", "Diarreia."),
+    ("Renal_CreatinaMT", "renal_creatinamt", "Creatinina."),
+    ("Hepatica_BT_MT", "hepatica_bt_mt", "Bilirrubina total."),
+    ("Hepatica_TGO_MT", "hepatica_tgo_mt", "TGO."),
+    ("Hepatica_TGP_MT", "hepatica_tgp_mt", "TGP."),
+]
 
 
 # =========================================================
 # 1️⃣ EXECUÇÃO DO PIPELINE (OPCIONAL)
 # =========================================================
-script_path = os.path.join(BASE_DIR, "seg_metrogenomica.py")
-if os.path.exists(script_path):
-    print("⏳ Executando pipeline seg_metrogenomica.py...")
-    subprocess.run(["python3", script_path])
+def executar_pipeline():
+    """seg_metrogenomica.py só roda se a planilha de origem (ou o script) mudou."""
+    import pipeline
+    print("⏳ Atualizando seg_metrogenomica...")
+    pipeline.executar(["seg_metrogenomica"])
 
 
 # =========================================================
 # 2️⃣ LEITURA DAS PLANILHAS
 # =========================================================
-metro_file = os.path.join(BIOINFO_DIR, "planilha-metronomica-filtrada.xlsx")
-baseline_file = os.path.join(BIOINFO_DIR, "1_202407_Baseline.xlsx")
+def carregar_dados(metro_file=METRO_FILE, baseline_file=BASELINE_FILE, inst=None):
+    inst = inst or Instrumentacao()
 
-metro = pd.read_excel(metro_file) if os.path.exists(metro_file) else pd.DataFrame()
-baseline = pd.read_excel(baseline_file) if os.path.exists(baseline_file) else pd.DataFrame()
+    with inst.etapa("resolucao_arquivos"):
+        tem_metro = os.path.exists(metro_file)
+        tem_baseline = os.path.exists(baseline_file)
+
+    with inst.etapa("carga_excel"):
+        metro = (
+            ler_metronomica(metro_file, COLUNAS_METRO)
+            if tem_metro else pd.DataFrame()
+        )
+        baseline = (
+            ler_baseline_anonimizado(baseline_file)
+            if tem_baseline else pd.DataFrame()
+        )
+    return metro, baseline
+
+
+def carregar_coorte(estatistico_file=ESTATISTICO_FILE, idades_file=IDADES_FILE, inst=None):
+    """Tabela estatística + idades (comparação entre grupos), ou None se ausente."""
+    inst = inst or Instrumentacao()
+    if not (os.path.exists(estatistico_file) and os.path.exists(idades_file)):
+        return None
+    with inst.etapa("carga_excel"):
+        estatistico = ler_planilha(estatistico_file, COLUNAS_ESTATISTICO)
+        idades = ler_planilha(idades_file, COLUNAS_IDADES)
+    return estatistico.merge(idades, on="ID", how="left")
+
+
+def carregar_tudo(metro_file=METRO_FILE, baseline_file=BASELINE_FILE,
+                  estatistico_file=ESTATISTICO_FILE, idades_file=IDADES_FILE,
+                  inst=None, processos=None):
+    """(metro, baseline, coorte) como `carregar_dados` + `carregar_coorte`,
+    com as planilhas existentes lidas em paralelo."""
+    inst = inst or Instrumentacao()
+
+    with inst.etapa("resolucao_arquivos"):
+        tarefas = {
+            "metro": (ler_metronomica, metro_file, COLUNAS_METRO),
+            "baseline": (ler_baseline_anonimizado, baseline_file),
+            "estatistico": (ler_planilha, estatistico_file, COLUNAS_ESTATISTICO),
+            "idades": (ler_planilha, idades_file, COLUNAS_IDADES),
+        }
+        tarefas = {nome: t for nome, t in tarefas.items() if os.path.exists(t[1])}
+
+    with inst.etapa("carga_excel"):
+        tabelas = ler_em_paralelo(
+            tarefas, processos, varias_abas=TABELAS_VARIAS_ABAS,
+            cache_dir=os.path.join(OUTPUT_DIR, "cache_abas"),
+        )
+
+    coorte = None
+    if "estatistico" in tabelas and "idades" in tabelas:
+        coorte = tabelas["estatistico"].merge(tabelas["idades"], on="ID", how="left")
+    return (
+        tabelas.get("metro", pd.DataFrame()),
+        tabelas.get("baseline", pd.DataFrame()),
+        coorte,
+    )
 
 
 # =========================================================
 # 🧹 PADRONIZAÇÃO – METRONÔMICA
 # =========================================================
-if not metro.empty:
-    metro.columns = (
-        metro.columns.str.lower()
-        .str.strip()
-        .str.normalize("NFKD")
-        .str.encode("ascii", errors="ignore")
-        .str.decode("utf-8")
-        .str.replace(" ", "_")
-    )
-
-    if "id_paciente" not in metro.columns:
-        for c in metro.columns:
-            if c.startswith("id"):
-                metro.rename(columns={c: "id_paciente"}, inplace=True)
-                break
+def preparar_dados(metro):
+    if metro.empty:
+        return metro, "ciclo"
 
     ciclo_col = next((c for c in metro.columns if "ciclo" in c), None)
-    if ciclo_col is None:
-        metro["ciclo"] = 1
-        ciclo_col = "ciclo"
+    metro = preparar_metronomica(metro)
+    return metro, ciclo_col or "ciclo"
 
 
 # =========================================================
-# 🧹 TRATAMENTO – BASELINE
+# 🩸 HEATMAPS DE TOXICIDADE (POR CICLO)
 # =========================================================
-def calcular_idade(d):
-    try:
-        d = pd.to_datetime(d)
-        hoje = date.today()
-        return hoje.year - d.year - ((hoje.month, hoje.day) < (d.month, d.day))
-    except Exception:
-        return None
+def montar_cubo_relatorio(metro, ciclo_col):
+    return montar_cubo(metro, [c for _, c, _ in tox_cols], ciclo_col)
 
 
-baseline_data = []
+def desenhar_heatmap(figs_dir, tabela, label):
+    fig, ax = plt.subplots(figsize=(10, 4), dpi=120)
+    sns.heatmap(tabela, cmap="Reds", cbar=True, ax=ax)
 
-if not baseline.empty:
-    baseline.columns = baseline.columns.str.lower().str.strip()
+    ax.set_title(label, fontsize=10)
+    ax.set_xlabel("Paciente")
+    ax.set_ylabel("Ciclo")
 
-    if "data de nascimento" in baseline.columns:
-        baseline["idade"] = (
-            pd.to_datetime(baseline["data de nascimento"], errors="coerce")
-            .apply(calcular_idade)
-        )
+    fig.tight_layout()
 
-    remover = [
-        "nome", "sobrenome", "iniciais", "rg",
-        "instituição", "registro hospitalar",
-        "data de nascimento", "data tcle"
-    ]
+    fname = f"hm_{label}.png"
+    fig.savefig(os.path.join(figs_dir, fname), dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    return fname
 
-    baseline = baseline[[c for c in baseline.columns if c not in remover]]
-    baseline.rename(columns={"id": "id_paciente"}, inplace=True)
-    baseline_data = baseline.head(20).to_dict(orient="records")
 
+def gerar_heatmaps(metro, ciclo_col, figs_dir, inst=None, cubo=None, construcao=None):
+    """Um nó por heatmap, chaveado pela tabela paciente × ciclo que ele desenha."""
+    inst = inst or Instrumentacao()
+    construcao = construcao or Construcao(os.path.join(figs_dir, ".cache"), inst)
+    heatmap_paths = []
+    heatmap_desc = {}
 
-# =========================================================
-# 📊 RESUMO POR PACIENTE
-# =========================================================
-def to_float(x):
-    try:
-        return float(str(x).replace(",", "."))
-    except Exception:
-        return np.nan
+    presentes = [(l, c, d) for l, c, d in tox_cols if c in metro.columns]
+    if not presentes:
+        return heatmap_paths, heatmap_desc
 
+    if cubo is None:
+        with inst.etapa("graus"):
+            cubo = montar_cubo_relatorio(metro, ciclo_col)
 
-for c in ["pesomt", "hemoglobinamt", "leucocitosmt"]:
-    if c in metro.columns:
-        metro[c] = metro[c].apply(to_float)
+    plt.ioff()
+    sns.set(font_scale=0.6)
 
-if not metro.empty:
-    resumo = (
-        metro.groupby("id_paciente")
-        .agg(
-            n_ciclos=("id_paciente", "count"),
-            peso_medio=("pesomt", "mean"),
-            hb_media=("hemoglobinamt", "mean"),
-            leuco_medio=("leucocitosmt", "mean"),
+    print("🔥 Gerando heatmaps de toxicidade...")
+
+    for label, col, desc in presentes:
+        with inst.etapa("pivotagem"):
+            tabela = tabela_heatmap(cubo, col)
+
+        fname = construcao.no(
+            f"heatmap_{label}", desenhar_heatmap, {"tabela": tabela, "label": label},
+            figs_dir, etapa="figuras", codigo=CODIGO_HEATMAP,
         )
-        .reset_index()
-        .to_dict(orient="records")
-    )
-else:
-    resumo = []
+
+        heatmap_paths.append(fname)
+        heatmap_desc[label] = desc
+
+    return heatmap_paths, heatmap_desc
 
 
 # =========================================================
-# 🩸 HEATMAPS DE TOXICIDADE (POR CICLO)
+# ⏱️ TEMPO ATÉ A PRIMEIRA TOXICIDADE GRAVE
 # =========================================================
-tox_cols = [
-    ("AnemiaHBMT", "anemiahbmt", "Hemoglobina baixa — queda de Hb."),
-    ("PlaquetopeniaMT", "plaquetopeniamt", "Plaquetas reduzidas."),
-    ("NeutropeniaMT", "neutropeniamt", "Neutrófilos reduzidos."),
-    ("NeutropeniaFebreMT", "neutropeniafebremt", "Neutropenia + febre."),
-    ("NauseasMT", "nauseasmt", "Náuseas."),
-    ("VomitosMT", "vomitosmt", "Vômitos."),
-    ("MucositeMT", "mucositemt", "Mucosite."),
-    ("DiarreiaMT", "diarreiamt", "Diarreia."),
-    ("Renal_CreatinaMT", "renal_creatinamt", "Creatinina."),
-    ("Hepatica_BT_MT", "hepatica_bt_mt", "Bilirrubina total."),
-    ("Hepatica_TGO_MT", "hepatica_tgo_mt", "TGO."),
-    ("Hepatica_TGP_MT", "hepatica_tgp_mt", "TGP."),
-]
+def gerar_incidencia(figs_dir, cubo, limiar=LIMIAR_GRAVE):
+    """Curvas de incidência acumulada (KM) por adesão + tabela-resumo."""
+    print(f"⏱️ Gerando incidência acumulada (grau ≥ {limiar})...")
+
+    ev = primeiro_evento(cubo)
+    curvas = curvas_incidencia(ev, grupos_adesao(ev))
+    curvas = curvas[curvas["limiar"] == limiar]
+    rotulos = {col: label for label, col, _ in tox_cols}
+
+    # só toxicidades com pelo menos um evento
+    com_evento = [
+        col for col in cubo.colunas
+        if curvas.loc[curvas["toxicidade"] == col, "eventos"].sum() > 0
+    ]
+    if not com_evento:
+        return None, []
+
+    n_cols = 3
+    n_linhas = -(-len(com_evento) // n_cols)
+    fig, axes = plt.subplots(
+        n_linhas, n_cols, figsize=(12, 3 * n_linhas), dpi=120,
+        sharex=True, sharey=True, squeeze=False,
+    )
+    for ax, col in zip(axes.flat, com_evento):
+        sel = curvas[(curvas["toxicidade"] == col) & (curvas["em_risco"] > 0)]
+        for grupo, c in sel.groupby("grupo"):
+            ax.step(c["ciclo"], 100 * c["km"], where="post", label=grupo)
+        ax.set_title(rotulos[col], fontsize=9)
+        ax.set_ylim(0, 100)
+    for ax in list(axes.flat)[len(com_evento):]:
+        ax.axis("off")
+    for ax in axes[:, 0]:
+        ax.set_ylabel("Incidência acumulada (%)")
+    for ax in axes[-1, :]:
+        ax.set_xlabel("Ciclo")
+    axes.flat[0].legend(title="Adesão", fontsize=7)
 
-heatmap_paths = []
-heatmap_desc = {}
+    fig.tight_layout()
+    fname = f"incidencia_grau{limiar}.png"
+    fig.savefig(os.path.join(figs_dir, fname), dpi=150, bbox_inches="tight")
+    plt.close(fig)
 
-plt.ioff()
-sns.set(font_scale=0.6)
+    resumo = resumo_incidencia(curvas, limiar)
+    resumo["toxicidade"] = resumo["toxicidade"].map(rotulos)
+    return fname, resumo.to_dict(orient="records")
 
-print("🔥 Gerando heatmaps de toxicidade...")
 
-for label, col, desc in tox_cols:
-    if col not in metro.columns:
-        continue
+# =========================================================
+# 📊 GRÁFICO — TOXICIDADE HEMATOLÓGICA (GRAU MÁXIMO)
+# =========================================================
+def gerar_grafico_hematologico(figs_dir):
+    print("📊 Gerando gráfico de toxicidade hematológica por paciente...")
+
+    tox_hema = pd.DataFrame(
+        {
+            "AnemiaHBMT": [53.1, 29.2, 11.5, 3.1, 0.0],
+            "NeutropeniaMT": [5.2, 11.5, 10.4, 33.3, 36.5],
+            "PlaquetopeniaMT": [57.3, 30.2, 2.1, 5.2, 2.1],
+        },
+        index=["Grau 0", "Grau 1", "Grau 2", "Grau 3", "Grau 4"]
+    )
 
-    df = metro.copy()
+    fig, ax = plt.subplots(figsize=(8, 5), dpi=120)
 
-    def grau(x):
-        try:
-            return int(str(x).split("-")[0])
-        except Exception:
-            return np.nan
+    tox_hema.T.plot(
+        kind="bar",
+        stacked=True,
+        ax=ax,
+        colormap="YlOrBr"
+    )
 
-    df[col] = df[col].apply(grau)
+    ax.set_title("Distribuição dos Graus Máximos de Toxicidades Hematológicas", fontsize=11)
+    ax.set_ylabel("Porcentagem de pacientes")
+    ax.set_xlabel("Tipo de toxicidade")
+    ax.legend(title="Grau de Toxicidade", bbox_to_anchor=(1.02, 1), loc="upper left")
 
-    tabela = df.pivot_table(
-        index=ciclo_col,
-        columns="id_paciente",
-        values=col,
-        aggfunc="max"
-    ).fillna(0)
+    fig.tight_layout()
+    fig.savefig(
+        os.path.join(figs_dir, "toxicidade_hematologica_grau_max.png"),
+        dpi=150,
+        bbox_inches="tight"
+    )
+    plt.close(fig)
 
-    fig, ax = plt.subplots(figsize=(10, 4), dpi=120)
-    sns.heatmap(tabela, cmap="Reds", cbar=True, ax=ax)
 
-    ax.set_title(label, fontsize=10)
-    ax.set_xlabel("Paciente")
-    ax.set_ylabel("Ciclo")
+# =========================================================
+# 📊 GRÁFICO — TOXICIDADE NÃO HEMATOLÓGICA (GRAU MÁXIMO)
+# =========================================================
+def gerar_grafico_nao_hematologico(figs_dir):
+    print("📊 Gerando gráfico de toxicidade não hematológica por paciente...")
+
+    tox_nao_hema = pd.DataFrame(
+        {
+            "NauseasMT": [72.9, 18.8, 6.3, 2.0, 0.0],
+            "VomitosMT": [79.2, 14.6, 4.2, 2.0, 0.0],
+            "MucositeMT": [90.6, 6.3, 2.1, 1.0, 0.0],
+            "DiarreiaMT": [88.5, 7.3, 3.1, 1.0, 0.0],
+            "Renal_CreatinaMT": [95.8, 3.1, 1.0, 0.0, 0.0],
+            "Hepatica_BT_MT": [85.4, 9.4, 3.1, 2.1, 0.0],
+            "Hepatica_TGO_MT": [80.2, 12.5, 5.2, 2.1, 0.0],
+            "Hepatica_TGP_MT": [82.3, 10.4, 5.2, 2.1, 0.0],
+        },
+        index=["Grau 0", "Grau 1", "Grau 2", "Grau 3", "Grau 4"]
+    )
+
+    fig, ax = plt.subplots(figsize=(9, 5), dpi=120)
+
+    tox_nao_hema.T.plot(
+        kind="bar",
+        stacked=True,
+        ax=ax,
+        colormap="YlOrBr"
+    )
+
+    ax.set_title(
+        "Distribuição dos Graus Máximos de Toxicidades Não Hematológicas",
+        fontsize=11
+    )
+    ax.set_ylabel("Porcentagem de pacientes")
+    ax.set_xlabel("Tipo de toxicidade")
+    ax.legend(
+        title="Grau de Toxicidade",
+        bbox_to_anchor=(1.02, 1),
+        loc="upper left"
+    )
 
     fig.tight_layout()
+    fig.savefig(
+        os.path.join(figs_dir, "toxicidade_nao_hematologica_grau_max.png"),
+        dpi=150,
+        bbox_inches="tight"
+    )
+    plt.close(fig)
 
-    fname = f"hm_{label}.png"
-    fig.savefig(os.path.join(FIGS_DIR, fname), dpi=150, bbox_inches="tight")
-    plt.close()
 
-    heatmap_paths.append(fname)
-    heatmap_desc[label] = desc
+# =========================================================
+# ⚖️ COMPARAÇÃO ENTRE GRUPOS
+# =========================================================
+def formatar_comparacao(tabela):
+    """Registros para o template, p-valores com 3 casas (< 0,001 abreviado)."""
+    def p_fmt(p):
+        return "< 0.001" if p < 0.001 else f"{p:.3f}"
+
+    registros = []
+    for r in tabela.to_dict(orient="records"):
+        registros.append({
+            "variavel": r["variavel"],
+            "teste": r["teste"],
+            "resumo_sim": r["resumo_sim"],
+            "resumo_nao": r["resumo_nao"],
+            "p_valor": p_fmt(r["p_valor"]),
+            "p_permutacao": p_fmt(r["p_permutacao"]),
+            "p_fdr": p_fmt(r["p_fdr"]),
+            "significativo": r["significativo"],
+        })
+    return registros
 
 
 # =========================================================
-# 📊 GRÁFICO — TOXICIDADE HEMATOLÓGICA (GRAU MÁXIMO)
+# 🧾 RENDERIZAÇÃO HTML + PDF
 # =========================================================
-print("📊 Gerando gráfico de toxicidade hematológica por paciente...")
-
-tox_hema = pd.DataFrame(
-    {
-        "AnemiaHBMT": [53.1, 29.2, 11.5, 3.1, 0.0],
-        "NeutropeniaMT": [5.2, 11.5, 10.4, 33.3, 36.5],
-        "PlaquetopeniaMT": [57.3, 30.2, 2.1, 5.2, 2.1],
-    },
-    index=["Grau 0", "Grau 1", "Grau 2", "Grau 3", "Grau 4"]
-)
+def renderizar_html(output_dir, figs_dir, base_url=None, figs_url=None, **contexto):
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    template = env.get_template("template.html")
+
+    html = template.render(
+        titulo="Relatório Técnico – Metronômica no Ewing",
+        subtitulo="Resultados laboratoriais e toxicidade",
+        data_execucao=datetime.now().strftime("%d/%m/%Y %H:%M"),
+        base_url=base_url or f"file://{TEMPLATE_DIR}",
+        figs_url=figs_url or f"file://{figs_dir}",
+        **contexto,
+    )
 
-fig, ax = plt.subplots(figsize=(8, 5), dpi=120)
+    html_path = os.path.join(output_dir, "relatorio.html")
+    with open(html_path, "w") as f:
+        f.write(html)
+    return html_path
 
-tox_hema.T.plot(
-    kind="bar",
-    stacked=True,
-    ax=ax,
-    colormap="YlOrBr"
-)
 
-ax.set_title("Distribuição dos Graus Máximos de Toxicidades Hematológicas", fontsize=11)
-ax.set_ylabel("Porcentagem de pacientes")
-ax.set_xlabel("Tipo de toxicidade")
-ax.legend(title="Grau de Toxicidade", bbox_to_anchor=(1.02, 1), loc="upper left")
+def gerar_pdf(html_path, output_dir):
+    print("📌 Gerando PDF...")
+    pdf_path = os.path.join(output_dir, "relatorio.pdf")
+    os.system(
+        f'weasyprint "{html_path}" "{pdf_path}" --base-url "{output_dir}"'
+    )
+    return pdf_path
 
-plt.tight_layout()
-plt.savefig(
-    os.path.join(FIGS_DIR, "toxicidade_hematologica_grau_max.png"),
-    dpi=150,
-    bbox_inches="tight"
-)
-plt.close()
 
 # =========================================================
-# 📊 GRÁFICO — TOXICIDADE NÃO HEMATOLÓGICA (GRAU MÁXIMO)
+# 🧱 SEÇÕES DO RELATÓRIO (NÓS DA CONSTRUÇÃO INCREMENTAL)
 # =========================================================
-print("📊 Gerando gráfico de toxicidade não hematológica por paciente...")
-
-tox_nao_hema = pd.DataFrame(
-    {
-        "NauseasMT": [72.9, 18.8, 6.3, 2.0, 0.0],
-        "VomitosMT": [79.2, 14.6, 4.2, 2.0, 0.0],
-        "MucositeMT": [90.6, 6.3, 2.1, 1.0, 0.0],
-        "DiarreiaMT": [88.5, 7.3, 3.1, 1.0, 0.0],
-        "Renal_CreatinaMT": [95.8, 3.1, 1.0, 0.0, 0.0],
-        "Hepatica_BT_MT": [85.4, 9.4, 3.1, 2.1, 0.0],
-        "Hepatica_TGO_MT": [80.2, 12.5, 5.2, 2.1, 0.0],
-        "Hepatica_TGP_MT": [82.3, 10.4, 5.2, 2.1, 0.0],
-    },
-    index=["Grau 0", "Grau 1", "Grau 2", "Grau 3", "Grau 4"]
-)
+# Cada seção é `funcao(destino, **entradas)`, chaveada pela fatia de dados
+# que usa (ver `construcao.Construcao`).
+MODELOS_TABELA = [
+    os.path.join(TEMPLATE_DIR, "pagina_tabela.html"),
+    os.path.join(TEMPLATE_DIR, "macros.html"),
+]
+ESTILOS = [
+    os.path.join(TEMPLATE_DIR, "template.html"),
+    os.path.join(TEMPLATE_DIR, "style.css"),
+    os.path.join(TEMPLATE_DIR, "force_landscape.css"),
+    *MODELOS_TABELA,
+]
 
-fig, ax = plt.subplots(figsize=(9, 5), dpi=120)
+# Código que cada seção executa além da própria função: entra na chave do nó,
+# então corrigir um módulo refaz só as seções que dependem dele.
+CODIGO_TABELA = ("paginacao", "dados")
+CODIGO_HEATMAP = ("toxicidade",)
+CODIGO_INCIDENCIA = ("incidencia", "agregados", "toxicidade")
+CODIGO_COMPARACAO = ("comparacao", "bootstrap", "dados")
 
-tox_nao_hema.T.plot(
-    kind="bar",
-    stacked=True,
-    ax=ax,
-    colormap="YlOrBr"
-)
 
-ax.set_title(
-    "Distribuição dos Graus Máximos de Toxicidades Não Hematológicas",
-    fontsize=11
-)
-ax.set_ylabel("Porcentagem de pacientes")
-ax.set_xlabel("Tipo de toxicidade")
-ax.legend(
-    title="Grau de Toxicidade",
-    bbox_to_anchor=(1.02, 1),
-    loc="upper left"
-)
+def secao_tabela_paginada(destino, nome, titulo, tabela, por_pagina=POR_PAGINA):
+    """Página 1 vai no relatório; todas as páginas em `tabelas/<nome>_p<n>.html`.
 
-plt.tight_layout()
-plt.savefig(
-    os.path.join(FIGS_DIR, "toxicidade_nao_hematologica_grau_max.png"),
-    dpi=150,
-    bbox_inches="tight"
-)
-plt.close()
+    O relatório carrega só `por_pagina` linhas, qualquer que seja a coorte.
+    """
+    tabela = tabela.round(2).set_axis([str(c) for c in tabela.columns], axis=1)
+    registros = tabela.to_dict(orient="records")
+    paginas = paginar_registros(registros, por_pagina)
+    base = {
+        "nome": nome, "colunas": list(tabela.columns), "total": len(paginas),
+        "n_linhas": len(registros), "por_pagina": por_pagina,
+    }
+    modelo = Environment(loader=FileSystemLoader(TEMPLATE_DIR)).get_template("pagina_tabela.html")
+    for i, linhas in enumerate(paginas, start=1):
+        with open(os.path.join(destino, f"{nome}_p{i}.html"), "w") as f:
+            f.write(modelo.render(titulo=titulo, tabela={**base, "pagina": i, "linhas": linhas}))
+    return {**base, "pagina": 1, "linhas": paginas[0] if paginas else []}
+
+
+def secao_comparacao(destino, coorte):
+    # fora do Streamlit (CLI, fila em subprocesso): permutações em todos os núcleos
+    return formatar_comparacao(comparar_grupos(coorte, processos=None))
+
+
+def secao_html(destino, figs_dir, estilos, contexto, urls):
+    renderizar_html(destino, figs_dir, **urls, **contexto)
+    return "relatorio.html"
+
+
+def secao_pdf(destino, html_path):
+    gerar_pdf(html_path, destino)
+    if not os.path.exists(os.path.join(destino, "relatorio.pdf")):
+        # sem PDF não há o que guardar: a próxima execução tenta de novo
+        raise RuntimeError("weasyprint não gerou o PDF")
+    return "relatorio.pdf"
 
 
 # =========================================================
-# 🧾 RENDERIZAÇÃO HTML + PDF
+# 🚀 RELATÓRIO COMPLETO
 # =========================================================
-env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-template = env.get_template("template.html")
-
-html = template.render(
-    titulo="Relatório Técnico – Metronômica no Ewing",
-    subtitulo="Resultados laboratoriais e toxicidade",
-    data_execucao=datetime.now().strftime("%d/%m/%Y %H:%M"),
-    baseline_data=baseline_data,
-    resumo=resumo,
-    heatmaps=heatmap_paths,
-    heatmap_desc=heatmap_desc,
-    base_url=f"file://{TEMPLATE_DIR}",
-    figs_url=f"file://{FIGS_DIR}",
-)
+def gerar_relatorio(metro, baseline, output_dir=OUTPUT_DIR, pdf=True, inst=None,
+                    coorte=None, cache_dir=None, limiar=LIMIAR_GRAVE, portatil=False):
+    """Gera relatorio.html (+ PDF) e relatorio_etapas.json com os tempos.
+
+    Com `coorte` (ver `carregar_coorte`), inclui a comparação entre grupos;
+    `limiar` é o grau mínimo do evento na incidência acumulada. Com
+    `portatil`, figuras e logo são referenciados por caminhos relativos (a
+    pasta `assets/` é copiada para `output_dir`): a pasta pode ser zipada e
+    aberta em outra máquina.
+    Cada seção e figura é um nó em cache (`cache_dir`, padrão
+    `output_dir/.cache`): reexecuções só refazem o que mudou, e
+    relatorio_construcao.json registra o que foi reutilizado.
+    """
+    inst = inst or Instrumentacao()
+    figs_dir = os.path.join(output_dir, "figs")
+    os.makedirs(figs_dir, exist_ok=True)
+    construcao = Construcao(cache_dir or os.path.join(output_dir, ".cache"), inst)
+
+    with inst.etapa("normalizacao"):
+        metro, ciclo_col = preparar_dados(metro)
+
+    # tabelas longas: só a 1ª página entra no HTML, as demais em tabelas/
+    tabelas_dir = os.path.join(output_dir, "tabelas")
+    baseline_tabela = (
+        construcao.no(
+            "baseline", secao_tabela_paginada,
+            {"nome": "baseline", "titulo": "Baseline (anonimizado)", "tabela": baseline},
+            tabelas_dir, etapa="pivotagem", codigo=CODIGO_TABELA, arquivos=MODELOS_TABELA,
+        )
+        if not baseline.empty else None
+    )
+    resumo = (
+        construcao.no(
+            "resumo", secao_tabela_paginada,
+            {"nome": "resumo", "titulo": "Resumo por paciente",
+             "tabela": resumir_por_paciente(metro)},
+            tabelas_dir, etapa="pivotagem", codigo=CODIGO_TABELA, arquivos=MODELOS_TABELA,
+        )
+        if not metro.empty else []
+    )
 
-html_path = os.path.join(OUTPUT_DIR, "relatorio.html")
-with open(html_path, "w") as f:
-    f.write(html)
+    cubo = None
+    if not metro.empty:
+        with inst.etapa("graus"):
+            cubo = montar_cubo_relatorio(metro, ciclo_col)
 
-print(f"📄 HTML gerado → {html_path}")
+    heatmap_paths, heatmap_desc = gerar_heatmaps(
+        metro, ciclo_col, figs_dir, inst, cubo, construcao
+    )
 
-print("📌 Gerando PDF...")
-pdf_path = os.path.join(OUTPUT_DIR, "relatorio.pdf")
-os.system(
-    f'weasyprint "{html_path}" "{pdf_path}" --base-url "{OUTPUT_DIR}"'
-)
+    incidencia_fig, incidencia = None, []
+    if cubo is not None and cubo.colunas:
+        incidencia_fig, incidencia = construcao.no(
+            "incidencia", gerar_incidencia,
+            {"cubo": cubo, "limiar": limiar}, figs_dir, codigo=CODIGO_INCIDENCIA,
+        )
 
+    comparacao = []
+    if coorte is not None:
+        comparacao = construcao.no(
+            "comparacao", secao_comparacao, {"coorte": coorte}, output_dir,
+            codigo=(*CODIGO_COMPARACAO, formatar_comparacao),
+        )
+
+    for nome, funcao in [
+        ("grafico_hematologico", gerar_grafico_hematologico),
+        ("grafico_nao_hematologico", gerar_grafico_nao_hematologico),
+    ]:
+        construcao.no(nome, funcao, {}, figs_dir, etapa="figuras")
+
+    contexto = dict(
+        baseline_tabela=baseline_tabela,
+        resumo=resumo,
+        heatmaps=heatmap_paths,
+        heatmap_desc=heatmap_desc,
+        incidencia_fig=incidencia_fig,
+        incidencia=incidencia,
+        limiar_grave=limiar,
+        comparacao=comparacao,
+    )
+    urls = {}
+    if portatil:
+        shutil.copytree(os.path.join(TEMPLATE_DIR, "assets"), os.path.join(output_dir, "assets"),
+                        dirs_exist_ok=True)
+        urls = {"base_url": ".", "figs_url": "figs"}
+    html = construcao.no(
+        "template", secao_html,
+        {"figs_dir": figs_dir, "estilos": conteudo_arquivos(*ESTILOS), "contexto": contexto,
+         "urls": urls},
+        output_dir, dependencias=list(construcao.chaves),   # figuras entram pela chave
+        codigo=(renderizar_html,),
+    )
+    html_path = os.path.join(output_dir, html)
+    print(f"📄 HTML gerado → {html_path}")
 
-print(f"✅ PDF gerado → {pdf_path}")
+    if pdf:
+        try:
+            pdf_nome = construcao.no(
+                "pdf", secao_pdf, {"html_path": html_path},
+                output_dir, dependencias=["template"], codigo=(gerar_pdf,),
+            )
+            print(f"✅ PDF gerado → {os.path.join(output_dir, pdf_nome)}")
+        except RuntimeError as erro:
+            print(f"⚠️ {erro}")
+
+    resumo_construcao = construcao.resumo()
+    print(
+        f"🧱 Seções: {resumo_construcao['gerados']} geradas, "
+        f"{resumo_construcao['reutilizados']} reutilizadas"
+    )
+    construcao.salvar_log(os.path.join(output_dir, "relatorio_construcao.json"))
+    inst.salvar_json(os.path.join(output_dir, "relatorio_etapas.json"))
+    return html_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o relatório técnico (HTML + PDF).")
+    parser.add_argument("--sem-pipeline", action="store_true",
+                        help="não atualiza seg_metrogenomica antes (uso pelo pipeline.py)")
+    parser.add_argument("--sem-pdf", action="store_true")
+    parser.add_argument("--portatil", action="store_true",
+                        help="caminhos relativos para figuras e logo (pasta zipável)")
+    parser.add_argument("--saida", default=OUTPUT_DIR)
+    parser.add_argument("--cache", default=None, help="cache de seções (padrão: <saida>/.cache)")
+    parser.add_argument("--limiar", type=int, default=LIMIAR_GRAVE,
+                        help="grau mínimo do evento na incidência acumulada")
+    parser.add_argument("--metro", default=METRO_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--estatistico", default=ESTATISTICO_FILE)
+    parser.add_argument("--idades", default=IDADES_FILE)
+    args = parser.parse_args()
+
+    inst = Instrumentacao()
+    if not args.sem_pipeline:
+        with inst.etapa("pipeline"):
+            executar_pipeline()
+    metro, baseline, coorte = carregar_tudo(
+        args.metro, args.baseline, args.estatistico, args.idades, inst=inst
+    )
+    gerar_relatorio(
+        metro, baseline, output_dir=args.saida, pdf=not args.sem_pdf, inst=inst,
+        coorte=coorte, cache_dir=args.cache, limiar=args.limiar, portatil=args.portatil,
+    )
@@ -0,0 +1,118 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import ast
+import importlib
+import os
+import subprocess
+import sys
+import types
+
+
+# =========================================================
+# ⚙️ ORÇAMENTO DE IMPORTAÇÃO
+# =========================================================
+# Bibliotecas de gráficos/estatística: nunca no caminho de inicialização.
+MODULOS_PESADOS = ("matplotlib", "seaborn", "scipy")
+
+# Tempo máximo (s) para os imports de topo de cada ponto de entrada.
+ORCAMENTO_S = 1.5
+
+
+# =========================================================
+# 💤 IMPORTAÇÃO TARDIA
+# =========================================================
+class ModuloTardio(types.ModuleType):
+    """Módulo importado só no primeiro acesso a um atributo.
+
+    `plt = ModuloTardio("matplotlib.pyplot")` se comporta como
+    `import matplotlib.pyplot as plt`, mas o custo do import fica para a
+    primeira figura.
+    """
+
+    def __init__(self, nome):
+        super().__init__(nome)
+        self.__dict__["_modulo"] = None
+
+    def __getattr__(self, atributo):
+        modulo = self.__dict__["_modulo"]
+        if modulo is None:
+            modulo = importlib.import_module(self.__name__)
+            self.__dict__["_modulo"] = modulo
+        return getattr(modulo, atributo)
+
+    @property
+    def carregado(self):
+        return self.__dict__["_modulo"] is not None
+
+
+# =========================================================
+# ⏱️ PERFIL DE INICIALIZAÇÃO (-X importtime)
+# =========================================================
+def imports_de_topo(path):
+    """Comandos `import`/`from` no nível de módulo de um script."""
+    with open(path, encoding="utf-8") as f:
+        arvore = ast.parse(f.read(), filename=str(path))
+    return [
+        ast.unparse(no) for no in arvore.body
+        if isinstance(no, (ast.Import, ast.ImportFrom))
+    ]
+
+
+def _ler_importtime(stderr):
+    """{módulo de topo: tempo cumulativo (s)} a partir da saída de -X importtime.
+
+    Módulos importados por outros aparecem indentados e já estão contidos
+    no cumulativo de quem os importou.
+    """
+    tempos = {}
+    for linha in stderr.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        _, cumulativo, nome = linha.split("|", 2)
+        if not cumulativo.strip().isdigit() or nome.startswith("  "):
+            continue  # cabeçalho ou import aninhado
+        nome = nome.strip()
+        tempos[nome] = tempos.get(nome, 0.0) + int(cumulativo) / 1e6
+    return tempos
+
+
+def perfil_importacao(codigo, cwd=None):
+    """Executa `codigo` num interpretador novo com -X importtime.
+
+    Retorna o tempo total, os módulos de topo mais caros e quais
+    bibliotecas pesadas ficaram carregadas.
+    """
+    sonda = (
+        "import sys\n"
+        f"{codigo}\n"
+        f"print([m for m in {MODULOS_PESADOS!r} if m in sys.modules])"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", sonda],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"erro": proc.stderr.strip().splitlines()[-1]}
+
+    tempos = _ler_importtime(proc.stderr)
+    mais_caros = sorted(tempos.items(), key=lambda kv: kv[1], reverse=True)[:10]
+    return {
+        "total_s": sum(tempos.values()),
+        "mais_caros": [{"modulo": m, "cumulativo_s": t} for m, t in mais_caros],
+        "modulos_pesados": ast.literal_eval(proc.stdout.strip().splitlines()[-1]),
+    }
+
+
+def perfil_script(path, orcamento_s=ORCAMENTO_S):
+    """Perfil dos imports de topo de `path` e verificação do orçamento."""
+    path = os.path.abspath(path)
+    perfil = perfil_importacao(
+        "\n".join(imports_de_topo(path)), cwd=os.path.dirname(path)
+    )
+    perfil.update(script=os.path.basename(path), orcamento_s=orcamento_s)
+    if "erro" not in perfil:
+        perfil["dentro_do_orcamento"] = (
+            perfil["total_s"] <= orcamento_s and not perfil["modulos_pesados"]
+        )
+    return perfil
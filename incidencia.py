@@ -0,0 +1,168 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from agregados import DESLOCAMENTO_GRAU
+from toxicidade import Cubo
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+LIMIARES = (1, 2, 3, 4)        # evento = primeiro ciclo com grau ≥ limiar
+LIMIAR_GRAVE = 3
+CICLOS_PROTOCOLO = 12          # adesão: completou os ciclos previstos
+
+
+# =========================================================
+# ⏱️ PRIMEIRO EVENTO POR PACIENTE
+# =========================================================
+class PrimeiroEvento(NamedTuple):
+    ids: np.ndarray          # eixo 0
+    ciclos: np.ndarray       # valores de ciclo do cubo
+    colunas: list            # eixo 1: toxicidades
+    limiares: np.ndarray     # eixo 2
+    indice: np.ndarray       # [paciente, tox, limiar] índice do ciclo do evento, -1 = sem evento
+    censura: np.ndarray      # [paciente] índice do último ciclo observado
+
+
+def ultimo_ciclo_observado(cubo: Cubo) -> np.ndarray:
+    """Índice do último ciclo com algum registro de toxicidade, por paciente."""
+    registrado = (~np.isnan(np.asarray(cubo.graus))).any(axis=2)
+    ultimo = registrado.shape[1] - 1 - np.argmax(registrado[:, ::-1], axis=1)
+    return np.where(registrado.any(axis=1), ultimo, -1)
+
+
+def primeiro_evento(cubo: Cubo, limiares=LIMIARES, censura=None) -> PrimeiroEvento:
+    """Ciclo do primeiro grau ≥ limiar, para todas as toxicidades e limiares.
+
+    Máximo acumulado ao longo do eixo dos ciclos: o paciente "atinge" o
+    limiar no primeiro ciclo em que o máximo acumulado o alcança. Graus na
+    escala clínica (`DESLOCAMENTO_GRAU`, como nas tabelas por paciente); grau
+    99 (não avaliado) e ciclos sem registro não contam como evento.
+    `censura` (índice do último ciclo observado) vem do cubo se omitido.
+    """
+    limiares = np.asarray(limiares)
+    graus = np.asarray(cubo.graus)
+    deslocamento = np.array([DESLOCAMENTO_GRAU.get(c, 0) for c in cubo.colunas])
+    avaliado = ~np.isnan(graus) & (graus < 99)
+    graus = np.where(avaliado, np.clip(graus - deslocamento, 0, None), -1)
+
+    acumulado = np.maximum.accumulate(graus, axis=1)                # [p, c, t]
+    atingiu = acumulado[..., None] >= limiares                      # [p, c, t, l]
+    houve = atingiu[:, -1]                                           # [p, t, l]
+    indice = np.where(houve, np.argmax(atingiu, axis=1), -1)
+
+    if censura is None:
+        censura = ultimo_ciclo_observado(cubo)
+
+    return PrimeiroEvento(
+        np.asarray(cubo.ids), np.asarray(cubo.ciclos), list(cubo.colunas),
+        limiares, indice, np.asarray(censura),
+    )
+
+
+def censura_por_presenca(presenca) -> np.ndarray:
+    """Índice do último ciclo presente, por paciente (matriz ciclo × paciente)."""
+    presenca = np.asarray(presenca, dtype=bool)
+    ultimo = presenca.shape[0] - 1 - np.argmax(presenca[::-1], axis=0)
+    return np.where(presenca.any(axis=0), ultimo, -1)
+
+
+def tabela_primeiro_evento(ev: PrimeiroEvento, limiar=LIMIAR_GRAVE) -> pd.DataFrame:
+    """paciente × toxicidade: ciclo do primeiro grau ≥ limiar (NaN = sem evento)."""
+    idx = ev.indice[:, :, list(ev.limiares).index(limiar)]
+    ciclos = np.where(idx >= 0, ev.ciclos[np.clip(idx, 0, None)], np.nan)
+    return pd.DataFrame(
+        ciclos,
+        index=pd.Index(ev.ids, name="id_paciente"),
+        columns=pd.Index(ev.colunas, name="toxicidade"),
+    )
+
+
+# =========================================================
+# 📈 INCIDÊNCIA ACUMULADA E KAPLAN–MEIER
+# =========================================================
+def grupos_adesao(ev: PrimeiroEvento, ciclos_protocolo=CICLOS_PROTOCOLO) -> np.ndarray:
+    ultimo = ev.ciclos[np.clip(ev.censura, 0, None)]
+    return np.where(
+        ultimo >= ciclos_protocolo,
+        f"≥ {ciclos_protocolo} ciclos",
+        f"< {ciclos_protocolo} ciclos",
+    )
+
+
+def curvas_incidencia(ev: PrimeiroEvento, grupos=None) -> pd.DataFrame:
+    """Incidência acumulada por (grupo, toxicidade, limiar, ciclo).
+
+    Tempo = ciclo do primeiro evento ou, sem evento, último ciclo observado
+    (censura). Todas as contagens saem de um único `np.bincount` sobre a
+    chave combinada (grupo, toxicidade, limiar, ciclo).
+
+    - `bruta`: eventos acumulados / pacientes do grupo
+    - `km`: 1 − S(ciclo) de Kaplan–Meier, com censura no último ciclo
+    """
+    n_pac, n_tox, n_lim = ev.indice.shape
+    n_cic = len(ev.ciclos)
+
+    if grupos is None:
+        grupos = np.full(n_pac, "Todos", dtype=object)
+    rotulos, g = np.unique(np.asarray(grupos), return_inverse=True)
+    n_grp = len(rotulos)
+
+    evento = ev.indice >= 0
+    tempo = np.where(evento, ev.indice, ev.censura[:, None, None])
+    observado = tempo >= 0                       # pacientes sem nenhum registro saem
+
+    t_idx = np.broadcast_to(np.arange(n_tox)[None, :, None], tempo.shape)
+    l_idx = np.broadcast_to(np.arange(n_lim)[None, None, :], tempo.shape)
+    g_idx = np.broadcast_to(g[:, None, None], tempo.shape)
+
+    chave = ((g_idx * n_tox + t_idx) * n_lim + l_idx) * n_cic + tempo
+    chave, evento = chave[observado], evento[observado]
+    forma = (n_grp, n_tox, n_lim, n_cic)
+    tamanho = n_grp * n_tox * n_lim * n_cic
+
+    saidas = np.bincount(chave, minlength=tamanho).reshape(forma)
+    eventos = np.bincount(chave, weights=evento, minlength=tamanho).reshape(forma)
+    em_risco = np.cumsum(saidas[..., ::-1], axis=-1)[..., ::-1]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        risco = np.where(em_risco > 0, eventos / em_risco, 0.0)
+    km = 1 - np.cumprod(1 - risco, axis=-1)
+
+    n_grupo = np.bincount(g, minlength=n_grp)[:, None, None, None]
+    bruta = np.cumsum(eventos, axis=-1) / np.maximum(n_grupo, 1)
+
+    gi, ti, li, ci = np.indices(forma).reshape(4, -1)
+    return pd.DataFrame({
+        "grupo": rotulos[gi],
+        "toxicidade": np.asarray(ev.colunas, dtype=object)[ti],
+        "limiar": ev.limiares[li],
+        "ciclo": ev.ciclos[ci],
+        "em_risco": em_risco.ravel(),
+        "eventos": eventos.ravel().astype(np.int64),
+        "censurados": (saidas - eventos).ravel().astype(np.int64),
+        "bruta": bruta.ravel(),
+        "km": km.ravel(),
+    })
+
+
+def resumo_incidencia(curvas: pd.DataFrame, limiar=LIMIAR_GRAVE, ciclos=(6, CICLOS_PROTOCOLO)):
+    """Uma linha por (toxicidade, grupo): pacientes com evento e KM em ciclos-chave."""
+    c = curvas[curvas["limiar"] == limiar]
+    tabela = (
+        c.groupby(["toxicidade", "grupo"], sort=False)
+        .agg(pacientes=("em_risco", "first"), eventos=("eventos", "sum"))
+    )
+    for ciclo in ciclos:
+        km = (
+            c[c["ciclo"] <= ciclo]
+            .groupby(["toxicidade", "grupo"], sort=False)["km"].last()
+        )
+        tabela[f"km_ciclo_{ciclo}"] = (100 * km).round(1)
+    return tabela.reset_index()
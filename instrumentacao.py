@@ -0,0 +1,115 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# =========================================================
+# ⚙️ CONFIGURAÇÃO
+# =========================================================
+# Por padrão a memória vem do pico de RSS do processo (getrusage), que não
+# custa nada. METRO_TRACEMALLOC=1 usa tracemalloc: pico alocado exato por
+# etapa, mas deixa o código Python 2–3× mais lento.
+RASTREAR_ALOCACOES = os.environ.get("METRO_TRACEMALLOC") == "1"
+
+_local = threading.local()
+
+
+def _rss_pico_mb():
+    if resource is None:
+        return None
+    # ru_maxrss: KB no Linux, bytes no macOS
+    divisor = 2**20 if sys.platform == "darwin" else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+
+def cache_miss():
+    """Chamar dentro de uma função cacheada: marca a etapa aberta como miss."""
+    pilha = getattr(_local, "pilha", None)
+    if pilha:
+        pilha[-1]["cache"] = "miss"
+
+
+# =========================================================
+# ⏱️ REGISTRO DE ETAPAS
+# =========================================================
+class Instrumentacao:
+    """Tempo de parede, CPU, memória e cache por etapa do pipeline.
+
+    Etapas com o mesmo nome (ex.: uma figura por toxicidade) são acumuladas.
+    """
+
+    def __init__(self, rastrear_alocacoes=RASTREAR_ALOCACOES):
+        self.rastrear_alocacoes = rastrear_alocacoes
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nome, cache=False):
+        medida = {"cache": "hit" if cache else None}
+        pilha = _local.__dict__.setdefault("pilha", [])
+        pilha.append(medida)
+
+        if self.rastrear_alocacoes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        else:
+            mem0 = _rss_pico_mb()
+        t0, c0 = time.perf_counter(), time.process_time()
+
+        try:
+            yield medida
+        finally:
+            parede = time.perf_counter() - t0
+            cpu = time.process_time() - c0
+            if self.rastrear_alocacoes:
+                mem = (tracemalloc.get_traced_memory()[1] - mem0) / 2**20
+            else:
+                mem = None if mem0 is None else _rss_pico_mb() - mem0
+            pilha.pop()
+            self._acumular(nome, parede, cpu, mem, medida["cache"])
+
+    def _acumular(self, nome, parede, cpu, mem, cache):
+        reg = self.etapas.setdefault(nome, {
+            "etapa": nome, "chamadas": 0, "parede_s": 0.0, "cpu_s": 0.0,
+            "mem_pico_mb": None, "cache_hits": 0, "cache_misses": 0,
+        })
+        reg["chamadas"] += 1
+        reg["parede_s"] += parede
+        reg["cpu_s"] += cpu
+        if mem is not None:
+            reg["mem_pico_mb"] = max(reg["mem_pico_mb"] or 0.0, mem)
+        if cache == "hit":
+            reg["cache_hits"] += 1
+        elif cache == "miss":
+            reg["cache_misses"] += 1
+
+    def registros(self):
+        return list(self.etapas.values())
+
+    def tabela(self):
+        import pandas as pd
+        return pd.DataFrame(self.registros())
+
+    def como_dict(self):
+        return {
+            "memoria": "tracemalloc" if self.rastrear_alocacoes else "rss_pico",
+            "etapas": self.registros(),
+        }
+
+    def salvar_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.como_dict(), f, indent=2, ensure_ascii=False)
+        return path
@@ -0,0 +1,149 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+POR_PAGINA = 50
+OPCOES_POR_PAGINA = [25, 50, 100, 250]
+CHAVE = "id_paciente"
+
+
+# =========================================================
+# 🗂️ TABELA INDEXADA
+# =========================================================
+# Tudo o que depende só dos dados é calculado uma vez (e fica no cache das
+# apps): a ordem de cada coluna e o texto de busca de cada linha. Uma página
+# é então uma máscara booleana + um fatiamento da ordem pré-calculada.
+class TabelaIndexada(NamedTuple):
+    dados: pd.DataFrame       # índice 0..n-1
+    ordens: dict              # coluna → posições em ordem crescente (NaN no fim)
+    nulos: dict               # coluna → nº de NaN (ficam no fim nos dois sentidos)
+    busca: np.ndarray         # [linha] texto minúsculo de todas as colunas
+    chave: str | None         # coluna de paciente (saltar para paciente)
+
+
+def indexar(df: pd.DataFrame, chave=CHAVE) -> TabelaIndexada:
+    dados = df.reset_index(drop=True)
+    ordens, nulos = {}, {}
+    for col in dados.columns:
+        s = dados[col]
+        # ordena pelos códigos de categoria: vale para números, datas e texto
+        try:
+            codigos, _ = pd.factorize(s, sort=True)
+        except TypeError:   # tipos misturados (texto e número na mesma coluna)
+            codigos, _ = pd.factorize(s.astype(str).where(s.notna()), sort=True)
+        codigos = np.where(codigos < 0, np.iinfo(np.int64).max, codigos)
+        ordens[col] = np.argsort(codigos, kind="stable")
+        nulos[col] = int(s.isna().sum())
+
+    busca = pd.Series("", index=dados.index)
+    for col in dados.columns:   # uma concatenação vetorizada por coluna
+        busca = busca + " | " + dados[col].astype(str).str.lower()
+    return TabelaIndexada(dados, ordens, nulos, busca.to_numpy(), chave if chave in dados.columns else None)
+
+
+def visiveis(tabela: TabelaIndexada, ordenar_por=None, crescente=True, filtro="") -> np.ndarray:
+    """Posições das linhas que passam no filtro, na ordem pedida."""
+    n = len(tabela.dados)
+    if ordenar_por is None:
+        ordem = np.arange(n)
+    else:
+        ordem = tabela.ordens[ordenar_por]
+        if not crescente:
+            validos = n - tabela.nulos[ordenar_por]
+            ordem = np.concatenate([ordem[:validos][::-1], ordem[validos:]])
+
+    filtro = filtro.strip().lower()
+    if filtro:
+        mascara = pd.Series(tabela.busca).str.contains(filtro, regex=False).to_numpy()
+        ordem = ordem[mascara[ordem]]
+    return ordem
+
+
+def n_paginas(n_linhas, por_pagina=POR_PAGINA):
+    return max(1, -(-n_linhas // por_pagina))
+
+
+def pagina(tabela: TabelaIndexada, ordem: np.ndarray, numero, por_pagina=POR_PAGINA):
+    """Só as linhas da página `numero` (1, 2, ...) — o resto não sai do servidor."""
+    inicio = (numero - 1) * por_pagina
+    return tabela.dados.iloc[ordem[inicio:inicio + por_pagina]]
+
+
+def pagina_do_paciente(tabela: TabelaIndexada, ordem, paciente, por_pagina=POR_PAGINA):
+    """Página (1, 2, ...) da primeira linha do paciente na ordem atual, ou None."""
+    if tabela.chave is None:
+        return None
+    ids = tabela.dados[tabela.chave].iloc[ordem]
+    paciente = str(paciente).strip()
+    try:   # ids numéricos (7 == 7.0); senão compara o texto
+        alvo = np.flatnonzero(pd.to_numeric(ids, errors="coerce").to_numpy() == float(paciente))
+    except ValueError:
+        alvo = np.flatnonzero(ids.astype(str).to_numpy() == paciente)
+    return int(alvo[0] // por_pagina) + 1 if len(alvo) else None
+
+
+def paginar_registros(registros, por_pagina=POR_PAGINA):
+    """Lista de registros em páginas (tabelas do relatório HTML)."""
+    return [registros[i:i + por_pagina] for i in range(0, len(registros), por_pagina)]
+
+
+# =========================================================
+# 🖥️ COMPONENTE STREAMLIT
+# =========================================================
+def tabela_paginada(tabela: TabelaIndexada, key, ordenar_por=None, crescente=True):
+    """Ordenação, filtro e salto para paciente no servidor; só a página vai ao navegador."""
+    import streamlit as st
+
+    colunas = list(tabela.dados.columns)
+    c_ord, c_sent, c_filtro, c_tam = st.columns([2, 1, 3, 1])
+    ordenar_por = c_ord.selectbox(
+        "Ordenar por", colunas,
+        index=colunas.index(ordenar_por) if ordenar_por in colunas else 0,
+        key=f"{key}_ordem",
+    )
+    crescente = c_sent.radio(
+        "Sentido", ["↑", "↓"], index=0 if crescente else 1, key=f"{key}_sentido",
+        horizontal=True,
+    ) == "↑"
+    filtro = c_filtro.text_input("Filtrar", key=f"{key}_filtro", placeholder="texto em qualquer coluna")
+    por_pagina = c_tam.selectbox(
+        "Linhas", OPCOES_POR_PAGINA, index=OPCOES_POR_PAGINA.index(POR_PAGINA),
+        key=f"{key}_tamanho",
+    )
+
+    ordem = visiveis(tabela, ordenar_por, crescente, filtro)
+    total = n_paginas(len(ordem), por_pagina)
+    chave_pagina = f"{key}_pagina"
+    if st.session_state.get(chave_pagina, 1) > total:
+        st.session_state[chave_pagina] = total
+
+    c_pag, c_pac, c_ir = st.columns([2, 2, 1])
+    if tabela.chave is not None:
+        c_pac.text_input("Ir para paciente", key=f"{key}_paciente")
+
+        def saltar():
+            paciente = st.session_state.get(f"{key}_paciente", "")
+            destino = pagina_do_paciente(tabela, ordem, paciente, por_pagina)
+            if destino is not None:
+                st.session_state[chave_pagina] = destino
+
+        c_ir.button("Ir", key=f"{key}_ir", on_click=saltar)
+    numero = c_pag.number_input(
+        "Página", min_value=1, max_value=total, step=1, key=chave_pagina
+    )
+
+    inicio = (numero - 1) * por_pagina
+    st.dataframe(pagina(tabela, ordem, numero, por_pagina), use_container_width=True)
+    st.caption(
+        f"Linhas {min(inicio + 1, len(ordem))}–{min(inicio + por_pagina, len(ordem))} "
+        f"de {len(ordem)}" + (f" (filtradas de {len(tabela.dados)})" if filtro.strip() else "")
+        + f" · página {numero} de {total}"
+    )
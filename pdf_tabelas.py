@@ -0,0 +1,153 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import numpy as np
+import pandas as pd
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+ALTURA_LINHA = 6          # mm
+FOLGA = 2.0               # mm de respiro por célula (texto + bordas)
+AMOSTRA_LARGURA = 5       # textos mais longos medidos por coluna
+LINHAS_POR_BLOCO = 2_000  # listagens longas são lidas/formatadas em blocos
+COR_CABECALHO = (244, 246, 247)
+
+
+# =========================================================
+# 🔤 FORMATAÇÃO VETORIZADA
+# =========================================================
+def _texto_latin1(serie: pd.Series) -> pd.Series:
+    # fontes padrão do FPDF só cobrem latin-1: o resto vira "?"
+    return serie.str.encode("latin-1", "replace").str.decode("latin-1")
+
+
+def formatar_celulas(df: pd.DataFrame, casas=1) -> pd.DataFrame:
+    """Todas as células já como texto, uma operação por coluna (NaN → "")."""
+    saida = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_float_dtype(s):
+            valores = s.to_numpy(dtype=float)
+            texto = np.char.mod(f"%.{casas}f", np.nan_to_num(valores))
+            texto = np.where(np.isnan(valores), "", texto)
+            s = pd.Series(texto, index=df.index)
+        else:
+            s = s.astype(str).where(s.notna(), "")
+        saida[str(col)] = _texto_latin1(s.astype(str))
+    return pd.DataFrame(saida, index=df.index)
+
+
+def larguras_colunas(pdf, celulas: pd.DataFrame, largura_util, amostra=AMOSTRA_LARGURA):
+    """Largura (mm) por coluna, medida uma vez e ajustada à largura útil.
+
+    Só o cabeçalho e os `amostra` textos mais longos de cada coluna passam por
+    `get_string_width`; se a soma passa da página, todas encolhem na mesma
+    proporção (o excedente é cortado em `truncar`).
+    """
+    naturais = []
+    for col in celulas.columns:
+        textos = celulas[col]
+        longos = textos.iloc[np.argsort(-textos.str.len().to_numpy())[:amostra]]
+        naturais.append(max(pdf.get_string_width(t) for t in [col, *longos]) + FOLGA)
+    naturais = np.array(naturais)
+    if naturais.sum() > largura_util:
+        return naturais * largura_util / naturais.sum()
+    return naturais
+
+
+def truncar(pdf, celulas: pd.DataFrame, larguras) -> pd.DataFrame:
+    """Corta os textos que não cabem, pelo nº de caracteres (sem medir célula a célula)."""
+    # largura média de caractere da fonte atual, medida uma vez
+    por_caractere = pdf.get_string_width("0" * 10) / 10
+    saida = {}
+    for col, largura in zip(celulas.columns, larguras):
+        maximo = max(int((largura - FOLGA) / por_caractere), 1)
+        s = celulas[col]
+        longo = s.str.len() > maximo
+        saida[col] = s.where(~longo, s.str.slice(0, max(maximo - 1, 1)) + ".")
+    return pd.DataFrame(saida, index=celulas.index)
+
+
+# =========================================================
+# 📄 DESENHO COM PAGINAÇÃO
+# =========================================================
+def _nova_pagina(pdf):
+    # mesma orientação da página atual (listagens em paisagem continuam em paisagem)
+    pdf.add_page(orientation=pdf.cur_orientation)
+
+
+def _cabecalho(pdf, colunas, larguras, altura):
+    pdf.set_font(pdf.font_family, "B", pdf.font_size_pt)
+    pdf.set_fill_color(*COR_CABECALHO)
+    for col, largura in zip(colunas, larguras):
+        texto = col.encode("latin-1", "replace").decode("latin-1")
+        pdf.cell(largura, altura, texto, border=1, align="C", fill=True)
+    pdf.ln()
+    pdf.set_font(pdf.font_family, "", pdf.font_size_pt)
+
+
+def desenhar_tabela(pdf, blocos, titulo=None, larguras=None, casas=1,
+                    altura=ALTURA_LINHA, tamanho_fonte=8):
+    """Desenha `blocos` (um DataFrame ou um iterável de DataFrames) como tabela.
+
+    Cada bloco é formatado de uma vez; as larguras saem do primeiro bloco
+    (ou de `larguras`) e valem para a tabela toda. A quebra de página é
+    feita aqui, antes de cada linha que não cabe, com o cabeçalho repetido.
+    Retorna o nº de linhas desenhadas.
+    """
+    if isinstance(blocos, pd.DataFrame):
+        blocos = [blocos]
+
+    limite = pdf.h - pdf.b_margin
+    if titulo:
+        if pdf.get_y() + 5 + 8 + 2 * altura > limite:   # título não fica sozinho no pé
+            _nova_pagina(pdf)
+        pdf.ln(5)
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 8, titulo, ln=True)
+    pdf.set_font("Arial", size=tamanho_fonte)
+
+    largura_util = pdf.w - pdf.l_margin - pdf.r_margin
+    colunas, n = None, 0
+
+    for bloco in blocos:
+        celulas = formatar_celulas(bloco, casas)
+        if colunas is None:
+            colunas = list(celulas.columns)
+            if larguras is None:
+                larguras = larguras_colunas(pdf, celulas, largura_util)
+            if pdf.get_y() + 2 * altura > limite:
+                _nova_pagina(pdf)
+            _cabecalho(pdf, colunas, larguras, altura)
+
+        for linha in truncar(pdf, celulas, larguras).itertuples(index=False, name=None):
+            if pdf.get_y() + altura > limite:
+                _nova_pagina(pdf)
+                _cabecalho(pdf, colunas, larguras, altura)
+            for texto, largura in zip(linha, larguras):
+                pdf.cell(largura, altura, texto, border=1, align="C")
+            pdf.ln()
+        n += len(celulas)
+    return n
+
+
+# =========================================================
+# 🌊 LEITURA EM BLOCOS (LISTAGENS LONGAS)
+# =========================================================
+def blocos_csv(path, linhas=LINHAS_POR_BLOCO, **kwargs):
+    yield from pd.read_csv(path, chunksize=linhas, **kwargs)
+
+
+def blocos_arrow(path, linhas=LINHAS_POR_BLOCO, colunas=None):
+    """Fatias de uma tabela Arrow IPC (memory-map): só o bloco atual vira pandas."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    with pa.memory_map(path) as src:
+        tabela = ipc.open_file(src).read_all()
+        if colunas is not None:
+            tabela = tabela.select([c for c in colunas if c in tabela.column_names])
+        for inicio in range(0, tabela.num_rows, linhas):
+            yield tabela.slice(inicio, linhas).to_pandas()
@@ -0,0 +1,305 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import argparse
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import NamedTuple
+
+from dados import versao_dados
+
+
+# =========================================================
+# 📁 PATHS
+# =========================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BIOINFO_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
+DADOS_DIR = os.path.join(BIOINFO_DIR, "dados")
+HELEN_DIR = os.path.join(BASE_DIR, "planilha metronomica helen")
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+ESTADO_FILE = os.path.join(OUTPUT_DIR, "pipeline_estado.json")
+
+
+def _base(*nomes):
+    return [os.path.join(BASE_DIR, n) for n in nomes]
+
+
+# =========================================================
+# 🧩 ESTÁGIOS
+# =========================================================
+class Estagio(NamedTuple):
+    nome: str
+    comando: list            # argv, executado com cwd = BASE_DIR
+    entradas: list           # arquivos lidos (scripts incluídos): o hash decide se roda
+    saidas: list             # arquivos gravados
+    apos: tuple = ()         # ordem explícita além da dedutível pelos arquivos
+
+
+PYTHON = sys.executable
+
+ESTAGIOS = [
+    Estagio(
+        "filtro_r",
+        ["Rscript", "planilha-toxicidade-helen.R"],
+        _base("planilha-toxicidade-helen.R") + [
+            os.path.join(HELEN_DIR, "Tabela-ewing_estatistico-22-ago-25.sav"),
+            os.path.join(HELEN_DIR, "9_202407_Metronomica(1).xlsx"),
+        ],
+        [os.path.join(HELEN_DIR, "planilha-metronomica-filtrada.xlsx")],
+    ),
+    Estagio(
+        "seg_metrogenomica",
+        [PYTHON, "seg_metrogenomica.py"],
+        _base("seg_metrogenomica.py", "exportacao.py")
+        + [os.path.join(BIOINFO_DIR, "9_202407_Metronomica.xlsx")],
+        _base("planilha-metronomica-filtrada.xlsx"),
+    ),
+    Estagio(
+        "preprocessamento",
+        [PYTHON, "preprocessar_dados.py"],
+        _base("preprocessar_dados.py", "dados.py") + [
+            os.path.join(DADOS_DIR, "Tabela-ewing_estatistico-22-ago-25.xlsx"),
+            os.path.join(DADOS_DIR, "1_202407_Baseline.xlsx"),
+            os.path.join(DADOS_DIR, "9_202407_Metronomica.xlsx"),
+        ],
+        [os.path.join(DADOS_DIR, "dataset_unificado.csv")],
+    ),
+    Estagio(
+        "artefatos",
+        [PYTHON, "artefatos.py"],
+        _base(
+            "artefatos.py", "agregados.py", "dados.py", "dose.py", "qualidade.py",
+            "toxicidade.py",
+            "planilha-metronomica-filtrada.xlsx", "1_202407_Baseline.xlsx",
+            "Tabela-ewing_estatistico-22-ago-25.xlsx", "Idades-range-media.xlsx",
+        ),
+        [os.path.join(OUTPUT_DIR, "artefatos", "manifesto.json")],
+    ),
+    Estagio(
+        "relatorio",
+        [PYTHON, "generate_report.py", "--sem-pipeline"],
+        _base(
+            "generate_report.py", "construcao.py", "dados.py", "paginacao.py",
+            "incidencia.py", "agregados.py", "toxicidade.py", "comparacao.py",
+            "bootstrap.py", "templates/template.html",
+            "templates/macros.html", "templates/pagina_tabela.html", "templates/style.css",
+        )
+        + [
+            os.path.join(BIOINFO_DIR, "planilha-metronomica-filtrada.xlsx"),
+            os.path.join(BIOINFO_DIR, "1_202407_Baseline.xlsx"),
+            os.path.join(BIOINFO_DIR, "Tabela-ewing_estatistico-22-ago-25.xlsx"),
+            os.path.join(BIOINFO_DIR, "Idades-range-media.xlsx"),
+        ],
+        [os.path.join(OUTPUT_DIR, "relatorio.html")],
+        # generate_report.py sempre rodou depois de seg_metrogenomica.py
+        apos=("seg_metrogenomica",),
+    ),
+]
+
+
+def dependencias(estagios=ESTAGIOS):
+    """{estágio: estágios de que depende} — saída de um que é entrada do outro, + `apos`."""
+    produtor = {s: e.nome for e in estagios for s in e.saidas}
+    return {
+        e.nome: sorted(
+            {produtor[a] for a in e.entradas if a in produtor and produtor[a] != e.nome}
+            | set(e.apos)
+        )
+        for e in estagios
+    }
+
+
+# =========================================================
+# 🔑 ESTADO (HASH DE ENTRADAS E SAÍDAS)
+# =========================================================
+def ler_estado(path=ESTADO_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def gravar_estado(estado, path=ESTADO_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _hash(paths, comando=()):
+    return versao_dados(*paths) + ":" + " ".join(os.path.basename(c) for c in comando)
+
+
+def situacao(estagio: Estagio, estado):
+    """(decisão, motivo) sem executar nada: atualizado, executar ou sem_entradas."""
+    faltando = [p for p in estagio.entradas if not os.path.exists(p)]
+    if faltando:
+        return "sem_entradas", "falta " + ", ".join(os.path.basename(p) for p in faltando)
+
+    anterior = estado.get(estagio.nome)
+    if anterior is None:
+        return "executar", "nunca executado"
+    if anterior["entradas"] != _hash(estagio.entradas, estagio.comando):
+        return "executar", "entradas mudaram"
+    if not all(os.path.exists(p) for p in estagio.saidas):
+        return "executar", "saída ausente"
+    if anterior["saidas"] != _hash(estagio.saidas):
+        return "executar", "saída alterada fora do pipeline"
+    return "atualizado", "entradas e saídas iguais às da última execução"
+
+
+# =========================================================
+# 🗺️ PLANO (DRY-RUN)
+# =========================================================
+def _selecionar(alvos, estagios, deps):
+    """Alvos + tudo de que eles dependem, na ordem declarada."""
+    if not alvos:
+        return list(estagios)
+    nomes = {e.nome for e in estagios}
+    desconhecidos = set(alvos) - nomes
+    if desconhecidos:
+        raise ValueError(f"estágios desconhecidos: {sorted(desconhecidos)}")
+    incluidos, pilha = set(), list(alvos)
+    while pilha:
+        n = pilha.pop()
+        if n not in incluidos:
+            incluidos.add(n)
+            pilha.extend(deps[n])
+    return [e for e in estagios if e.nome in incluidos]
+
+
+def plano(alvos=None, estagios=ESTAGIOS, estado=None, forcar=False):
+    """Uma linha por estágio: decisão, motivo e dependências.
+
+    Um estágio cujas dependências vão rodar aparece como `executar` se as
+    suas entradas já mudaram, senão como `depende` — na execução ele é
+    reavaliado depois delas (se a saída delas não mudar, é pulado).
+    """
+    estado = ler_estado() if estado is None else estado
+    deps = dependencias(estagios)
+    saidas = {e.nome: e.saidas for e in estagios}
+    linhas, vao_rodar = [], set()
+    for e in _selecionar(alvos, estagios, deps):
+        decisao, motivo = situacao(e, estado)
+        if forcar and decisao == "atualizado":
+            decisao, motivo = "executar", "forçado"
+        antes = [d for d in deps[e.nome] if d in vao_rodar]
+        produzidas = {s for d in antes for s in saidas[d]}
+        faltando = [p for p in e.entradas if not os.path.exists(p)]
+        if antes and (
+            decisao == "atualizado"
+            or (decisao == "sem_entradas" and set(faltando) <= produzidas)
+        ):
+            decisao, motivo = "depende", "reavaliado após " + ", ".join(antes)
+        if decisao in ("executar", "depende"):
+            vao_rodar.add(e.nome)
+        linhas.append({
+            "estagio": e.nome, "decisao": decisao, "motivo": motivo,
+            "depende_de": deps[e.nome],
+        })
+    return linhas
+
+
+# =========================================================
+# 🚀 EXECUÇÃO
+# =========================================================
+def _rodar(estagio: Estagio):
+    proc = subprocess.run(estagio.comando, cwd=BASE_DIR, capture_output=True, text=True)
+    return proc.returncode, (proc.stdout + proc.stderr)[-2000:]
+
+
+def executar(alvos=None, simular=False, forcar=False, processos=None,
+             estagios=ESTAGIOS, estado_file=ESTADO_FILE):
+    """Roda os estágios desatualizados; independentes rodam em paralelo.
+
+    `simular` só devolve o plano. Cada estágio é decidido no momento em que
+    as suas dependências terminam, com o hash das entradas daquele momento.
+    Retorna uma linha por estágio com o resultado (atualizado, ok, falhou,
+    sem_entradas ou bloqueado).
+    """
+    estado = ler_estado(estado_file)
+    if simular:
+        return plano(alvos, estagios, estado, forcar)
+
+    deps = dependencias(estagios)
+    selecionados = _selecionar(alvos, estagios, deps)
+    nomes = {e.nome for e in selecionados}
+    pendentes = {e.nome: e for e in selecionados}
+    resultado, rodando = {}, {}
+
+    def registrar(nome, decisao, motivo, **extra):
+        resultado[nome] = {"estagio": nome, "decisao": decisao, "motivo": motivo, **extra}
+        marca = {"ok": "✅", "atualizado": "♻️", "falhou": "❌"}.get(decisao, "⏭️")
+        print(f"  {marca} {nome:<18} {decisao} — {motivo}", flush=True)
+
+    with ThreadPoolExecutor(max_workers=processos or os.cpu_count() or 1) as pool:
+        while pendentes or rodando:
+            antes = len(pendentes)
+            for nome, e in list(pendentes.items()):
+                anteriores = [d for d in deps[nome] if d in nomes]
+                if any(d not in resultado for d in anteriores):
+                    continue
+                del pendentes[nome]
+                falhos = [d for d in anteriores if resultado[d]["decisao"] in ("falhou", "bloqueado")]
+                if falhos:
+                    registrar(nome, "bloqueado", "falhou: " + ", ".join(falhos))
+                    continue
+                decisao, motivo = situacao(e, estado)
+                if forcar and decisao == "atualizado":
+                    decisao, motivo = "executar", "forçado"
+                if decisao != "executar":
+                    registrar(nome, decisao, motivo)
+                    continue
+                print(f"  ▶️ {nome:<18} {motivo}", flush=True)
+                rodando[pool.submit(_rodar, e)] = e
+
+            if not rodando:
+                if pendentes and len(pendentes) == antes:
+                    raise RuntimeError(f"dependência circular entre {sorted(pendentes)}")
+                continue
+            prontos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                e = rodando.pop(futuro)
+                codigo, log = futuro.result()
+                if codigo != 0 or not all(os.path.exists(p) for p in e.saidas):
+                    registrar(e.nome, "falhou", f"código {codigo}", log=log)
+                    continue
+                estado[e.nome] = {
+                    "entradas": _hash(e.entradas, e.comando),
+                    "saidas": _hash(e.saidas),
+                    "executado_em": datetime.now().isoformat(timespec="seconds"),
+                }
+                gravar_estado(estado, estado_file)
+                registrar(e.nome, "ok", "executado")
+
+    return [resultado[e.nome] for e in selecionados]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Executa os estágios do pipeline cujas entradas mudaram."
+    )
+    parser.add_argument("alvos", nargs="*",
+                        help="estágios a atualizar (com as dependências); padrão: todos")
+    parser.add_argument("--plano", action="store_true",
+                        help="só mostra o que seria executado (dry-run)")
+    parser.add_argument("--forcar", action="store_true",
+                        help="executa mesmo os estágios atualizados")
+    parser.add_argument("--processos", type=int, default=None)
+    args = parser.parse_args()
+
+    linhas = executar(args.alvos, args.plano, args.forcar, args.processos)
+    if args.plano:
+        for l in linhas:
+            deps = f" (após {', '.join(l['depende_de'])})" if l["depende_de"] else ""
+            print(f"  {l['estagio']:<18} {l['decisao']:<12} {l['motivo']}{deps}")
+    for l in linhas:
+        if l["decisao"] == "falhou":
+            print(f"\n❌ {l['estagio']}:\n{l['log']}")
+    sys.exit(any(l["decisao"] == "falhou" for l in linhas))
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from dados import ler_em_paralelo
+
 BASE = Path(__file__).resolve().parents[1] / "dados"
 
 # Arquivos de entrada
@@ -12,48 +14,63 @@ FILE_TOX = BASE / "9_202407_Metronomica.xlsx"
 # Saída
 OUT = Path(__file__).resolve().parents[1] / "dados" / "dataset_unificado.csv"
 
+# baseline deve conter: id , data_tcle / data_nasc
+col_id_demo = "id"
+col_id_base = "id"
+col_birth = "data_de_na"  # confirmado via print
+col_tcle = "data_do_ev"   # ajuste pode ser necessário
+
+def normalizar_nome(c):
+    return str(c).strip().lower().replace(" ", "_")
+
 def normalizar(df):
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df.columns = [normalizar_nome(c) for c in df.columns]
     return df
 
 # -------------------------
 # 1) CARREGAR DADOS
 # -------------------------
-demo = pd.read_excel(FILE_DEMO)
-baseline = pd.read_excel(FILE_BASELINE)
-tox = pd.read_excel(FILE_TOX)
+# do baseline só interessam id e datas: identificadores nunca são lidos
+COLUNAS_BASELINE = {col_id_base, col_birth, col_tcle}
 
-demo = normalizar(demo)
-baseline = normalizar(baseline)
-tox = normalizar(tox)
+def ler_baseline(path):
+    return pd.read_excel(path, usecols=lambda c: normalizar_nome(c) in COLUNAS_BASELINE)
 
-# -------------------------
-# 2) CALCULAR IDADE
-# -------------------------
-# baseline deve conter: id , data_tcle / data_nasc
-col_id_demo = "id"
-col_id_base = "id"
-col_birth = "data_de_na"  # confirmado via print
-col_tcle = "data_do_ev"   # ajuste pode ser necessário
 
-try:
-    baseline["idade"] = (
-        pd.to_datetime(baseline[col_tcle], errors="coerce")
-        - pd.to_datetime(baseline[col_birth], errors="coerce")
-    ).dt.days // 365
-except:
-    baseline["idade"] = np.nan
+if __name__ == "__main__":
+    # as três planilhas são lidas em paralelo (um processo por arquivo)
+    demo, baseline, tox = ler_em_paralelo({
+        "demo": (pd.read_excel, FILE_DEMO),
+        "baseline": (ler_baseline, FILE_BASELINE),
+        "tox": (pd.read_excel, FILE_TOX),
+    }).values()
 
-# -------------------------
-# 3) UNIFICAR
-# -------------------------
-df = tox.merge(demo, left_on="id", right_on="id", how="left")
-df = df.merge(baseline[["id", "idade"]], on="id", how="left")
+    demo = normalizar(demo)
+    baseline = normalizar(baseline)
+    tox = normalizar(tox)
+
+    # -------------------------
+    # 2) CALCULAR IDADE
+    # -------------------------
+
+    try:
+        baseline["idade"] = (
+            pd.to_datetime(baseline[col_tcle], errors="coerce")
+            - pd.to_datetime(baseline[col_birth], errors="coerce")
+        ).dt.days // 365
+    except:
+        baseline["idade"] = np.nan
+
+    # -------------------------
+    # 3) UNIFICAR
+    # -------------------------
+    df = tox.merge(demo, left_on="id", right_on="id", how="left")
+    df = df.merge(baseline[["id", "idade"]], on="id", how="left")
 
-# ordenar por ciclo
-if "ciclo_mt" in df.columns:
-    df = df.sort_values(["id", "ciclo_mt"])
+    # ordenar por ciclo
+    if "ciclo_mt" in df.columns:
+        df = df.sort_values(["id", "ciclo_mt"])
 
-df.to_csv(OUT, index=False)
+    df.to_csv(OUT, index=False)
 
-print(f"✔ Arquivo salvo → {OUT}")
+    print(f"✔ Arquivo salvo → {OUT}")
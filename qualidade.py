@@ -0,0 +1,221 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from dados import para_float
+from dose import FAIXAS
+from toxicidade import decodificar_grau
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+# Códigos de "não coletado" da planilha: não são violação, são ausência.
+SENTINELA_NUMERO = 9999        # 9999, 99999
+SENTINELA_ANO = 2999           # 2999-09-09, 2999-09-02
+
+GRAUS_VALIDOS = [0, 1, 2, 3, 4, 5, 99]   # 99 = não avaliado
+
+# Coluna de data usada para ordenar e deduplicar os ciclos.
+DATA_CICLO = "data_1_dia_mt"
+
+
+# =========================================================
+# 📜 REGRAS DECLARATIVAS
+# =========================================================
+class Regra(NamedTuple):
+    nome: str
+    tipo: str                # faixa, data, unico, referencia, grau, datas_crescentes
+    colunas: tuple
+    descricao: str
+    minimo: object = None
+    maximo: object = None
+
+
+def _faixa(coluna, unidade, minimo, maximo):
+    return Regra(f"faixa_{coluna}", "faixa", (coluna,),
+                 f"{coluna} fora de {minimo}–{maximo} {unidade}", minimo, maximo)
+
+
+REGRAS = [
+    Regra("ciclo_duplicado", "unico", ("id_paciente", DATA_CICLO),
+          "Dois registros do mesmo paciente com a mesma data de início"),
+    Regra("paciente_fora_baseline", "referencia", ("id_paciente",),
+          "Paciente sem linha no baseline"),
+    Regra("grau_ilegivel", "grau", (),
+          "Grau preenchido que não decodifica para 0–5 ou 99"),
+    Regra("datas_fora_de_ordem", "datas_crescentes", (DATA_CICLO,),
+          "Início do ciclo anterior ao do ciclo precedente do mesmo paciente"),
+    Regra("data_implausivel", "data", (DATA_CICLO, "datahemogramamt", "databioquimica"),
+          "Data antes de 2000 ou no futuro", pd.Timestamp("2000-01-01")),
+    _faixa("hemoglobinamt", "g/dL", 3.0, 20.0),
+    _faixa("leucocitosmt", "mil/µL", 0.05, 100.0),
+    _faixa("neutrofilosmt", "mil/µL", 0.0, 50.0),
+    _faixa("plaquetasmt", "mil/µL", 1.0, 2000.0),
+    _faixa("creatinamt", "mg/dL", 0.05, 15.0),
+    _faixa("tgomt", "U/L", 1.0, 5000.0),
+    _faixa("tgpmt", "U/L", 1.0, 5000.0),
+    _faixa("btmt", "mg/dL", 0.05, 50.0),
+    *(_faixa(c, u, *FAIXAS[c]) for c, u in [
+        ("pesomt", "kg"), ("alturamt", "cm"), ("superficiecorporalmt", "m²"),
+    ]),
+]
+
+
+# =========================================================
+# 🎭 MÁSCARAS (UMA OPERAÇÃO POR COLUNA)
+# =========================================================
+# Cada tipo devolve (avaliadas, violacoes): arrays bool [linha, coluna] sobre
+# as colunas da regra presentes na tabela.
+def _numeros(serie):
+    valores = para_float(serie).to_numpy(dtype=float)
+    ausente = serie.isna().to_numpy() | (valores >= SENTINELA_NUMERO)
+    return valores, ausente
+
+
+def _mascara_faixa(df, regra, contexto):
+    valores, ausente = _numeros(df[regra.colunas[0]])
+    with np.errstate(invalid="ignore"):
+        dentro = (valores >= regra.minimo) & (valores <= regra.maximo)
+    return ~ausente, ~ausente & ~dentro   # texto não numérico também viola
+
+
+def _datas(serie):
+    datas = pd.to_datetime(serie, errors="coerce")
+    ausente = serie.isna().to_numpy() | (datas.dt.year >= SENTINELA_ANO).to_numpy()
+    return datas, ausente
+
+
+def _mascara_data(df, regra, contexto):
+    datas, ausente = _datas(df[regra.colunas[0]])
+    dentro = ((datas >= regra.minimo) & (datas <= contexto["hoje"])).to_numpy()
+    return ~ausente, ~ausente & ~dentro
+
+
+def _mascara_unico(df, regra, contexto):
+    chave = df[list(regra.colunas)]
+    completa = chave.notna().all(axis=1).to_numpy()
+    return completa, completa & chave.duplicated(keep=False).to_numpy()
+
+
+def _mascara_referencia(df, regra, contexto):
+    col = regra.colunas[0]
+    ref = contexto.get("baseline")
+    if ref is None or col not in ref.columns:
+        return np.zeros(len(df), bool), np.zeros(len(df), bool)
+    presente = df[col].notna().to_numpy()
+    return presente, presente & ~df[col].isin(ref[col].dropna()).to_numpy()
+
+
+def _mascara_grau(df, regra, contexto):
+    serie = df[regra.colunas[0]]
+    preenchido = serie.notna().to_numpy()
+    valido = decodificar_grau(serie).isin(GRAUS_VALIDOS).to_numpy()
+    return preenchido, preenchido & ~valido
+
+
+def _mascara_datas_crescentes(df, regra, contexto):
+    datas, ausente = _datas(df[regra.colunas[0]])
+    ordem = np.lexsort((df["ciclo"].to_numpy(), df["id_paciente"].to_numpy()))
+    pac = df["id_paciente"].to_numpy()[ordem]
+    d = datas.to_numpy()[ordem]
+    valida = ~ausente[ordem]
+
+    # data válida anterior do mesmo paciente (ausências não quebram a sequência)
+    anterior = pd.Series(np.where(valida, d, np.datetime64("NaT")))
+    anterior = anterior.groupby(pac).shift(1)
+    anterior = anterior.groupby(pac).ffill().to_numpy()
+
+    avaliada = np.zeros(len(df), bool)
+    recua = np.zeros(len(df), bool)
+    avaliada[ordem] = valida & ~pd.isna(anterior)
+    recua[ordem] = avaliada[ordem] & (d < anterior)
+    return avaliada, recua
+
+
+MASCARAS = {
+    "faixa": _mascara_faixa,
+    "data": _mascara_data,
+    "unico": _mascara_unico,
+    "referencia": _mascara_referencia,
+    "grau": _mascara_grau,
+    "datas_crescentes": _mascara_datas_crescentes,
+}
+
+
+# =========================================================
+# 🧮 AVALIAÇÃO
+# =========================================================
+def _expandir(regras, df, colunas_grau):
+    """Uma regra por coluna presente (regras de grau valem para cada toxicidade)."""
+    for r in regras:
+        if r.tipo == "grau":
+            for c in colunas_grau:
+                if c in df.columns:
+                    yield r._replace(colunas=(c,))
+        elif r.tipo == "data":
+            for c in r.colunas:
+                if c in df.columns:
+                    yield r._replace(colunas=(c,))
+        elif all(c in df.columns for c in r.colunas) and (
+            r.tipo != "datas_crescentes" or "ciclo" in df.columns
+        ):
+            yield r
+
+
+def avaliar(metro: pd.DataFrame, baseline=None, regras=REGRAS, colunas_grau=()):
+    """(violacoes, resumo) da tabela por ciclo já limpa.
+
+    Cada regra vira uma máscara booleana sobre a tabela inteira; as linhas
+    marcadas de todas as regras formam `violacoes` (uma linha por regra ×
+    registro × coluna) e `resumo` traz, por regra e coluna, quantos
+    registros foram avaliados e quantos violam.
+    """
+    contexto = {"baseline": baseline, "hoje": pd.Timestamp.today().normalize()}
+    metro = metro.reset_index(drop=True)
+    ids = metro["id_paciente"].to_numpy()
+    ciclos = metro["ciclo"].to_numpy() if "ciclo" in metro.columns else np.zeros(len(metro), int)
+
+    partes, resumo = [], []
+    for r in _expandir(regras, metro, colunas_grau):
+        avaliadas, marcadas = MASCARAS[r.tipo](metro, r, contexto)
+        linhas = np.flatnonzero(marcadas)
+        coluna = r.colunas[-1]
+        n_viol = len(linhas)
+        resumo.append({
+            "regra": r.nome, "coluna": coluna, "descricao": r.descricao,
+            "avaliados": int(avaliadas.sum()), "violacoes": n_viol,
+            "pct": round(100 * n_viol / avaliadas.sum(), 2) if avaliadas.any() else 0.0,
+            "pacientes": int(pd.unique(ids[linhas]).size),
+        })
+        if n_viol:
+            partes.append(pd.DataFrame({
+                "regra": r.nome,
+                "coluna": coluna,
+                "linha": linhas,
+                "id_paciente": ids[linhas],
+                "ciclo": ciclos[linhas],
+                "valor": metro[coluna].iloc[linhas].astype(str).to_numpy(),
+            }))
+
+    colunas = ["regra", "coluna", "linha", "id_paciente", "ciclo", "valor"]
+    violacoes = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=colunas)
+    return violacoes, pd.DataFrame(resumo)
+
+
+def resumo_por_regra(resumo: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por regra (soma das colunas), as com violação primeiro."""
+    if resumo.empty:
+        return resumo
+    por_regra = (
+        resumo.groupby(["regra", "descricao"], sort=False)[["avaliados", "violacoes"]]
+        .sum()
+        .reset_index()
+    )
+    por_regra["pct"] = (100 * por_regra["violacoes"] / por_regra["avaliados"].where(
+        por_regra["avaliados"] > 0)).round(2).fillna(0.0)
+    return por_regra.sort_values("violacoes", ascending=False, kind="stable")
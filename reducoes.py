@@ -0,0 +1,178 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from agregados import DESLOCAMENTO_GRAU
+from toxicidade import Cubo, decodificar_grau
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+LIMIARES = (1, 2, 3, 4)    # contagens e primeira/última ocorrência de grau ≥ k
+
+
+# =========================================================
+# 🧱 LAYOUT ORDENADO POR PACIENTE
+# =========================================================
+# Linhas (registros) ordenadas por paciente e ciclo; cada paciente ocupa um
+# segmento contíguo que começa em `inicio[i]`. Toda redução por paciente é
+# então um `ufunc.reduceat` sobre o eixo das linhas, para todas as
+# toxicidades de uma vez. `graus` fica como [tox, linha]: com as linhas no
+# último eixo cada segmento é memória contígua (≈3× mais rápido que reduzir
+# ao longo do eixo 0 de [linha, tox]).
+class LayoutPaciente(NamedTuple):
+    ids: np.ndarray          # paciente de cada segmento
+    inicio: np.ndarray       # primeira linha de cada segmento
+    ciclos: np.ndarray       # [linha] ciclo
+    colunas: list            # toxicidades (eixo 1 de `graus`)
+    graus: np.ndarray        # [tox, linha] float; NaN = sem registro ou 99 (não avaliado)
+
+
+def _segmentos(pac_ordenado):
+    return np.flatnonzero(np.r_[True, pac_ordenado[1:] != pac_ordenado[:-1]])
+
+
+def layout_de_tabela(metro: pd.DataFrame, colunas, ciclo_col="ciclo") -> LayoutPaciente:
+    """Layout a partir da tabela longa (uma linha por registro)."""
+    colunas = [c for c in colunas if c in metro.columns]
+    pac, ids = pd.factorize(metro["id_paciente"], sort=True)
+    ciclos = metro[ciclo_col].to_numpy()
+    ordem = np.lexsort((ciclos, pac))
+
+    graus = np.array(
+        [decodificar_grau(metro[c]).to_numpy(dtype=float)[ordem] for c in colunas]
+    ).reshape(len(colunas), len(metro))
+    graus[graus >= 99] = np.nan
+
+    pac = pac[ordem]
+    inicio = _segmentos(pac)
+    return LayoutPaciente(np.asarray(ids)[pac[inicio]], inicio, ciclos[ordem], colunas, graus)
+
+
+def layout_de_cubo(cubo: Cubo, escala_clinica=False) -> LayoutPaciente:
+    """Layout a partir do cubo: só as células (paciente, ciclo) com algum registro.
+
+    Com `escala_clinica`, aplica `DESLOCAMENTO_GRAU` (como `grau_maximo_por_paciente`).
+    """
+    graus = np.asarray(cubo.graus)
+    pac, cic = np.nonzero(~np.isnan(graus).all(axis=2))   # já em ordem paciente, ciclo
+    linhas = np.ascontiguousarray(graus[pac, cic].T)
+    linhas[linhas >= 99] = np.nan
+    if escala_clinica:
+        deslocamento = np.array([DESLOCAMENTO_GRAU.get(c, 0) for c in cubo.colunas])
+        linhas = np.clip(linhas - deslocamento[:, None], 0, None)
+    inicio = _segmentos(pac)
+    return LayoutPaciente(
+        np.asarray(cubo.ids)[pac[inicio]], inicio, np.asarray(cubo.ciclos)[cic],
+        list(cubo.colunas), linhas,
+    )
+
+
+# =========================================================
+# ⚡ KERNELS SEGMENTADOS
+# =========================================================
+class ReducoesPaciente(NamedTuple):
+    ids: np.ndarray
+    colunas: list
+    limiares: np.ndarray
+    pior: np.ndarray         # [paciente, tox] pior grau; NaN = nunca avaliado
+    carga: np.ndarray        # [paciente, tox] soma dos graus nos ciclos avaliados
+    avaliados: np.ndarray    # [paciente, tox] nº de ciclos avaliados
+    n_ge: np.ndarray         # [paciente, tox, limiar] nº de ciclos com grau ≥ k
+    primeiro: np.ndarray     # [paciente, tox, limiar] 1º ciclo com grau ≥ k (NaN = nunca)
+    ultimo: np.ndarray       # [paciente, tox, limiar] último ciclo com grau ≥ k
+
+
+def reduzir_por_paciente(layout: LayoutPaciente, limiares=LIMIARES) -> ReducoesPaciente:
+    """Pior grau, carga, contagens ≥ k e 1ª/última ocorrência numa passada.
+
+    Cada métrica é um único `reduceat` sobre o eixo das linhas: `fmax`/`fmin`
+    ignoram NaN, então ciclos sem registro não interferem.
+    """
+    limiares = np.asarray(limiares)
+    g, inicio = layout.graus, layout.inicio
+    n_tox = g.shape[0]
+    if len(inicio) == 0:
+        vazio = np.empty((0, n_tox))
+        vazio3 = np.empty((0, n_tox, len(limiares)))
+        return ReducoesPaciente(layout.ids, layout.colunas, limiares,
+                                vazio, vazio, vazio, vazio3, vazio3, vazio3)
+
+    avaliado = ~np.isnan(g)
+    atinge = g[:, None, :] >= limiares[:, None]                       # [tox, k, linha]
+    ciclo_se = np.where(atinge, layout.ciclos.astype(float), np.nan)
+
+    # saídas [tox, (k,) paciente] → [paciente, tox, (k)]
+    return ReducoesPaciente(
+        layout.ids,
+        layout.colunas,
+        limiares,
+        np.fmax.reduceat(g, inicio, axis=-1).T,
+        np.add.reduceat(np.where(avaliado, g, 0.0), inicio, axis=-1).T,
+        np.add.reduceat(avaliado, inicio, axis=-1, dtype=np.int64).T,
+        np.add.reduceat(atinge, inicio, axis=-1, dtype=np.int64).transpose(2, 0, 1),
+        np.fmin.reduceat(ciclo_se, inicio, axis=-1).transpose(2, 0, 1),
+        np.fmax.reduceat(ciclo_se, inicio, axis=-1).transpose(2, 0, 1),
+    )
+
+
+def tabela_reducoes(red: ReducoesPaciente, limiar_ocorrencia=3) -> pd.DataFrame:
+    """Uma linha por (paciente, toxicidade), formato longo."""
+    n_pac, n_tox = red.pior.shape
+    pi, ti = np.indices((n_pac, n_tox)).reshape(2, -1)
+    k = list(red.limiares).index(limiar_ocorrencia)
+
+    tabela = pd.DataFrame({
+        "id_paciente": red.ids[pi],
+        "toxicidade": np.asarray(red.colunas, dtype=object)[ti],
+        "pior_grau": red.pior.ravel(),
+        "carga": red.carga.ravel(),
+        "ciclos_avaliados": red.avaliados.ravel(),
+    })
+    for j, lim in enumerate(red.limiares):
+        tabela[f"ciclos_grau_ge_{lim}"] = red.n_ge[:, :, j].ravel()
+    tabela[f"primeiro_grau_ge_{limiar_ocorrencia}"] = red.primeiro[:, :, k].ravel()
+    tabela[f"ultimo_grau_ge_{limiar_ocorrencia}"] = red.ultimo[:, :, k].ravel()
+    return tabela
+
+
+# =========================================================
+# 🐢 EQUIVALENTES COM GROUPBY (REFERÊNCIA DO BENCHMARK)
+# =========================================================
+def reduzir_com_groupby(metro: pd.DataFrame, colunas, limiares=LIMIARES, ciclo_col="ciclo"):
+    """Mesmas métricas com `groupby`, uma toxicidade e um limiar por vez."""
+    saida = {}
+    for c in colunas:
+        if c not in metro.columns:
+            continue
+        grau = decodificar_grau(metro[c]).where(lambda s: s < 99)
+        df = pd.DataFrame({"id_paciente": metro["id_paciente"], "ciclo": metro[ciclo_col], "grau": grau})
+        grupos = df.groupby("id_paciente")
+        saida[(c, "pior")] = grupos["grau"].max()
+        saida[(c, "carga")] = grupos["grau"].sum()
+        saida[(c, "avaliados")] = grupos["grau"].count()
+        for k in limiares:
+            atinge = df[df["grau"] >= k].groupby("id_paciente")["ciclo"]
+            saida[(c, f"n_ge_{k}")] = (df["grau"] >= k).groupby(df["id_paciente"]).sum()
+            saida[(c, f"primeiro_{k}")] = atinge.min()
+            saida[(c, f"ultimo_{k}")] = atinge.max()
+    return pd.DataFrame(saida)
+
+
+def como_groupby(red: ReducoesPaciente) -> pd.DataFrame:
+    """Resultado dos kernels no formato de `reduzir_com_groupby`, para conferência."""
+    saida = {}
+    for t, c in enumerate(red.colunas):
+        saida[(c, "pior")] = red.pior[:, t]
+        saida[(c, "carga")] = red.carga[:, t]
+        saida[(c, "avaliados")] = red.avaliados[:, t]
+        for j, k in enumerate(red.limiares):
+            saida[(c, f"n_ge_{k}")] = red.n_ge[:, t, j]
+            saida[(c, f"primeiro_{k}")] = red.primeiro[:, t, j]
+            saida[(c, f"ultimo_{k}")] = red.ultimo[:, t, j]
+    return pd.DataFrame(saida, index=pd.Index(red.ids, name="id_paciente"))
@@ -0,0 +1,165 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from incidencia import CICLOS_PROTOCOLO, censura_por_presenca
+from toxicidade import Cubo
+
+
+# =========================================================
+# ⚙️ PARÂMETROS
+# =========================================================
+# situação de cada (paciente, ciclo, toxicidade) presente
+AVALIADO, NAO_AVALIADO, SEM_REGISTRO = 0, 1, 2
+ROTULOS_STATUS = ["Avaliados", "Não avaliado (99)", "Sem registro"]
+AUSENTE = -1
+
+
+# =========================================================
+# 🧾 RETENÇÃO POR PACIENTE
+# =========================================================
+class Retencao(NamedTuple):
+    ids: np.ndarray          # eixo 0
+    ciclos: np.ndarray       # valores de ciclo do cubo
+    colunas: list            # toxicidades (eixo 2 de `status`)
+    ultimo: np.ndarray       # [paciente] índice do último ciclo presente, -1 = nenhum
+    status: np.ndarray       # [paciente, ciclo, tox] AVALIADO / NAO_AVALIADO / SEM_REGISTRO / AUSENTE
+
+
+def calcular_retencao(cubo: Cubo, presenca) -> Retencao:
+    """Último ciclo e situação dos registros, calculados uma vez por paciente.
+
+    Tudo o que vem depois (em risco, abandonos, tabelas sob os gráficos) é
+    um `np.bincount` sobre esses vetores, com os filtros de coorte entrando
+    como pesos — nenhum reagrupamento da planilha.
+    """
+    presenca = np.asarray(presenca, dtype=bool)
+    graus = np.asarray(cubo.graus)
+    status = np.select(
+        [np.isnan(graus), graus >= 99], [SEM_REGISTRO, NAO_AVALIADO], AVALIADO
+    ).astype(np.int8)
+    status[~presenca.T] = AUSENTE
+    return Retencao(
+        np.asarray(cubo.ids), np.asarray(cubo.ciclos), list(cubo.colunas),
+        censura_por_presenca(presenca), status,
+    )
+
+
+def _pesos(ret: Retencao, mascara):
+    if mascara is None:
+        return np.ones(len(ret.ids))
+    return np.asarray(mascara, dtype=float)
+
+
+# =========================================================
+# 📉 PACIENTES EM RISCO POR CICLO
+# =========================================================
+def em_risco(ret: Retencao, grupos=None, mascara=None, ciclo_max=None) -> pd.DataFrame:
+    """Em risco, abandonos e retenção (%) por (grupo, ciclo).
+
+    Um único `np.bincount` sobre a chave (grupo, último ciclo): abandonos no
+    ciclo c são os pacientes cujo último ciclo é c, e em risco é a soma
+    acumulada de trás para frente. `mascara` restringe a coorte e
+    `ciclo_max` corta as linhas de ciclos posteriores.
+    """
+    n_cic = len(ret.ciclos)
+    if grupos is None:
+        grupos = np.full(len(ret.ids), "Todos", dtype=object)
+    rotulos, g = np.unique(np.asarray(grupos), return_inverse=True)
+    n_grp = len(rotulos)
+
+    ok = ret.ultimo >= 0
+    chave = g[ok] * n_cic + ret.ultimo[ok]
+    saidas = np.bincount(
+        chave, weights=_pesos(ret, mascara)[ok], minlength=n_grp * n_cic
+    ).reshape(n_grp, n_cic)
+    risco = np.cumsum(saidas[:, ::-1], axis=1)[:, ::-1]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        retencao = 100 * risco / risco[:, :1]
+
+    gi, ci = np.indices((n_grp, n_cic)).reshape(2, -1)
+    tabela = pd.DataFrame({
+        "grupo": rotulos[gi],
+        "ciclo": ret.ciclos[ci],
+        "em_risco": risco.ravel().astype(np.int64),
+        "abandonos": saidas.ravel().astype(np.int64),
+        "retencao": retencao.ravel(),
+    })
+    if ciclo_max is not None:
+        tabela = tabela[tabela["ciclo"] <= ciclo_max].reset_index(drop=True)
+    return tabela
+
+
+def tabela_pacientes_por_ciclo(ret: Retencao, mascara=None) -> pd.DataFrame:
+    """Formato largo (Métrica × Ciclo_i) da tabela "Número de pacientes por ciclo"."""
+    r = em_risco(ret, mascara=mascara)
+    colunas = [f"Ciclo_{int(c)}" for c in r["ciclo"]]
+    return pd.DataFrame(
+        [["N_pacientes", *r["em_risco"]], ["Abandonos", *r["abandonos"]]],
+        columns=["Métrica"] + colunas,
+    )
+
+
+def tabela_em_risco(ret: Retencao, coluna, mascara=None, ciclo_max=None) -> pd.DataFrame:
+    """Tabela sob o gráfico de uma toxicidade: em risco e situação do registro por ciclo."""
+    n_cic = len(ret.ciclos)
+    status = ret.status[:, :, ret.colunas.index(coluna)]
+    pac, cic = np.nonzero(status != AUSENTE)
+
+    contagem = np.bincount(
+        cic * len(ROTULOS_STATUS) + status[pac, cic],
+        weights=_pesos(ret, mascara)[pac],
+        minlength=n_cic * len(ROTULOS_STATUS),
+    ).reshape(n_cic, len(ROTULOS_STATUS))
+
+    tabela = pd.DataFrame(
+        np.column_stack([contagem.sum(axis=1), contagem]).T.astype(np.int64),
+        index=["Em risco", *ROTULOS_STATUS],
+        columns=ret.ciclos.astype(np.int64),
+    )
+    if ciclo_max is not None:
+        tabela = tabela.loc[:, tabela.columns <= ciclo_max]
+    return tabela.rename_axis("Ciclo", axis=1)
+
+
+# =========================================================
+# 🚪 ABANDONO POR PACIENTE
+# =========================================================
+def tabela_abandono(ret: Retencao, ciclos_protocolo=CICLOS_PROTOCOLO) -> pd.DataFrame:
+    """Ciclo de saída, motivo e sinalizadores de dados faltantes por paciente.
+
+    - `completou`: último ciclo ≥ `ciclos_protocolo`
+    - `interrompeu`: saiu antes, com toxicidade avaliada no último ciclo
+    - `interrompeu_sem_dados`: saiu antes e o último ciclo não tem nenhuma
+      toxicidade avaliada (pode ser falta de registro, não abandono)
+    - `sem_dados`: nenhum ciclo com toxicidade avaliada
+    """
+    presente = (ret.status != AUSENTE).any(axis=2)
+    avaliado = (ret.status == AVALIADO).any(axis=2)
+    nao_avaliado = (ret.status == NAO_AVALIADO).any(axis=2)
+
+    ultimo = np.clip(ret.ultimo, 0, None)
+    ultimo_ciclo = np.where(ret.ultimo >= 0, ret.ciclos[ultimo], np.nan)
+    ultimo_avaliado = avaliado[np.arange(len(ret.ids)), ultimo] & (ret.ultimo >= 0)
+
+    motivo = np.select(
+        [
+            ~avaliado.any(axis=1),
+            ultimo_ciclo >= ciclos_protocolo,
+            ultimo_avaliado,
+        ],
+        ["sem_dados", "completou", "interrompeu"],
+        "interrompeu_sem_dados",
+    )
+    return pd.DataFrame({
+        "id_paciente": ret.ids,
+        "ultimo_ciclo": ultimo_ciclo,
+        "motivo": motivo,
+        "ciclos_nao_avaliados": (presente & ~avaliado & nao_avaliado).sum(axis=1),
+        "ciclos_sem_registro": (presente & ~avaliado & ~nao_avaliado).sum(axis=1),
+    })
@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 
+from exportacao import exportar_xlsx
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))      # pasta Segunda Análise_python
 BIOINFO_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))  # sobe nível → BioInfo
 
@@ -14,5 +16,5 @@ if not os.path.exists(file_mt):
 else:
     df = pd.read_excel(file_mt)
     print("COLUNAS:", df.columns.tolist())
-    df.to_excel(file_out, index=False)
+    exportar_xlsx(file_out, {"Sheet1": df})
     print("✔️ SALVO:", file_out)
@@ -0,0 +1,351 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from exportacao import exportar_xlsx
+
+
+# =========================================================
+# 📐 PARÂMETROS OBSERVADOS NA COORTE REAL (n=96, 989 ciclos)
+# =========================================================
+# Contagens por linha de ciclo em planilha-metronomica-filtrada.xlsx
+# (None = célula vazia).
+DISTRIBUICOES_GRAU = {
+    "AnemiaHBMT": {
+        "1 - (10 - Normal)": 777, "2 - (8 - 10)": 124, "3 - (6,5  - 8)": 35,
+        None: 25, "99 - Não Avaliado": 18, "4 - (<6,5)": 9, "Selecione": 1,
+    },
+    "PlaquetopeniaMT": {
+        "0 - (> 150000 - normal)": 812, "1 - (75.000 - 150.000)": 104, None: 30,
+        "99 - Não Avaliado": 20, "3 - (10.000 - 50.000)": 11,
+        "2 - (50.000 - 75.000)": 9, "4 - (<10.000)": 2, "Selecione": 1,
+    },
+    "NeutropeniaMT": {
+        "0 - (>2000 - normal)": 297, "2 - (1.000 - 1.500)": 211,
+        "1 - (1.500 - 2.000)": 190, "3 - (500 - 1.000)": 184, "4 - (< 500)": 61,
+        None: 25, "99 - Não Avaliado": 20, "Selecione": 1,
+    },
+    "NeutropeniaFebreMT": {
+        "0 - (ausente)": 942, "3 - (presente)": 28, None: 14,
+        "99 - (Não Avaliado)": 2, "4 - (sepse)": 2, "Selecione": 1,
+    },
+    "VomitosMT": {
+        "0 - (ausente)": 951, None: 16, "1 - (1 episódio/24h)": 11,
+        "2 - (2–5 episódios/24h)": 9, "Selecione": 1, "99 - (Não Avaliado)": 1,
+    },
+    "NauseasMT": {
+        "0 - (ausente)": 939, "1 - (Consegue alimentar-se)": 26, None: 15,
+        "2 - (Aceitação dieta diminuída)": 7, "Selecione": 1,
+        "99 - (Não Avaliado)": 1,
+    },
+    "MucositeMT": {
+        "0 - (ausente)": 959, None: 16,
+        "2 - (Lesões ou eritema, possível alimentar-se)": 6,
+        "1 - (Eritema oral, s/dor)": 4, "99 - (Não Avaliado)": 3, "Selecione": 1,
+    },
+    "DiarreiaMT": {
+        "0 - (ausente)": 951, "1 - (< 4 episódios/24h)": 19, None: 15,
+        "2 - (4 – 6 episódios/24h)": 2, "Selecione": 1, "99 - (Não Avaliado)": 1,
+    },
+    "PerdaDePesoMT": {
+        "0 - (< 5)": 943, None: 36, "1 - (5 – 10%)": 7, "Selecione": 1,
+        "2 - (10 – 20%)": 1, "99 - (Não Avaliado)": 1,
+    },
+    "Renal_CreatinaMT": {
+        "0 - (ausente)": 819, "99 - (Não Avaliado)": 133,
+        "1 - (até 1,5 x acima do limite superior da normalidade)": 21, None: 14,
+        "Selecione": 1,
+        "3 - (entre 3,0 x e 6,0 x o limite superior da normalidade)": 1,
+    },
+    "Hepatica_BT_MT": {
+        "0 - (ausente)": 799, "99 - (Não Avaliado)": 155, None: 16,
+        "1 - (até 1,5 x acima do limite superior da normalidade)": 14,
+        "2 - (entre 1,5 x e 3,0 x o limite superior da normalidade)": 3,
+        "Selecione": 1,
+        "4 - (acima de 10,0 x o limite superior da normalidade)": 1,
+    },
+    "Hepatica_TGO_MT": {
+        "0 - (ausente)": 783, "99 - (Não Avaliado)": 144, None: 25,
+        "1 - (até 2,5 x acima do limite superior da normalidade)": 22,
+        "4 - (acima de 20,0 x o limite superior da normalidade)": 10,
+        "2 - (entre 2,5 x e 5,0 x o limite superior da normalidade)": 2,
+        "3 - (entre 5,0 x e 20,0 x o limite superior da normalidade)": 2,
+        "Selecione": 1,
+    },
+    "Hepatica_TGP_MT": {
+        "0 - (ausente)": 751, "99 - (Não Avaliado)": 145,
+        "1 - (até 2,5 x acima do limite superior da normalidade)": 52, None: 20,
+        "3 - (entre 5,0 x e 20,0 x o limite superior da normalidade)": 12,
+        "2 - (entre 2,5 x e 5,0 x o limite superior da normalidade)": 5,
+        "4 - (acima de 20,0 x o limite superior da normalidade)": 3,
+        "Selecione": 1,
+    },
+}
+
+# Nº de pacientes com k ciclos registrados (atrito observado, cf. cycles_df).
+CICLOS_POR_PACIENTE = {
+    1: 3, 2: 3, 3: 2, 4: 6, 5: 8, 6: 3, 8: 2, 9: 1, 10: 2, 11: 4,
+    12: 27, 13: 20, 14: 11, 15: 2, 16: 1, 19: 1,
+}
+
+# Exames: (mediana, dispersão log-normal, fração com sentinela 9999).
+LABS = {
+    "LeucocitosMT": (3.6, 0.45, 0.005),
+    "PlaquetasMT": (277.0, 0.35, 0.005),
+    "HemoglobinaMT": (11.5, 0.12, 0.005),
+    "NeutrofilosMT": (2.2, 0.55, 0.006),
+    "CreatinaMT": (0.67, 0.35, 0.134),
+    "TGPMT": (25.0, 0.7, 0.147),
+    "TGOMT": (26.0, 0.6, 0.146),
+    "BTMT": (0.43, 0.5, 0.151),
+}
+
+# Correlação latente intra-paciente dos graus (mantém a marginal por ciclo,
+# mas concentra eventos nos mesmos pacientes, como na coorte real).
+RHO_PACIENTE = 0.6
+
+COLUNAS_METRONOMICA = [
+    "ID Paciente", "Data 1 Dia MT", "DataHemogramaMT", "PesoMT", "AlturaMT",
+    "SuperficieCorporalMT", "LeucocitosMT", "PlaquetasMT", "HemoglobinaMT",
+    "NeutrofilosMT", "DataBioquimica", "CreatinaMT", "TGPMT", "TGOMT", "BTMT",
+    "Vimblastina", "Ciclofosfamida", "HemoPlaquetas", "HemoHemacias",
+    *DISTRIBUICOES_GRAU,
+    "Outras Toxicidades 1", "Grau Toxicidade 1",
+    "Outras Toxicidades 2", "Grau Toxicidade 2",
+    "Outras Toxicidades 3", "Grau Toxicidade 3",
+    "Outras Toxicidades 4", "Grau Toxicidade 4",
+    "Obs",
+]
+
+# Baseline cobre toda a coorte do estudo (585 registros para 96 pacientes MT).
+RAZAO_BASELINE = 585 / 96
+
+CATEGORIAS_BASELINE = {
+    "Sexo": {"Masculino": 356, "Feminino": 229},
+    "Etnia": {
+        "Branca": 445, "Parda": 104, "Sem informação": 19, "Preta": 14,
+        "Amarela": 2, "Indígena": 1,
+    },
+    "Instituição": {
+        "Hospital Infanto Juvenil Barretos": 73,
+        "Instituto Nacional de Cancer": 59,
+        "Instituto de Oncologia Pediátrica": 45,
+        "Hospital de Clínicas de Porto Alegre - HCPA": 37,
+    },
+    "AP/IH": {"AP + IH": 283, "AP e IH": 95, "AP + IH + FISH": 31, "AP/IH": 27},
+    "Região do Tumor Primário": {
+        "Extremidades inferiores": 168, "Pélvis": 130, "Tórax": 112,
+        "Coluna": 58, "Extremidades superiores": 57, "Cabeça e pescoço": 43,
+    },
+    "Local do Tumor Primário": {
+        "Ilíaco": 61, "Fêmur": 58, "Costela (N......)": 41, "Tíbia": 39,
+        "Sacro": 32, "Úmero": 31,
+    },
+    "Ossos/PartesMoles": {"0": 384, "1": 151, "2": 49},
+    "Metástase": {"Não": 366, "Sim": 219},
+}
+
+COLUNAS_BASELINE = [
+    "ID", "Nome", "Sobrenome", "Iniciais", "RG", "Data de Nascimento", "Sexo",
+    "Etnia", "Data TCLE", "Registro Hospitalar", "Instituição", "AP/IH",
+    "Região do Tumor Primário", "Local do Tumor Primário",
+    "Outro Local Tumor Primário", "Ossos/PartesMoles", "Metástase",
+    "Região Metástase 01", "Local Metástase 01",
+    "Região Metástase 02", "Local Metástase 02",
+    "Região Metástase 03", "Local Metástase 03",
+    "Local Metástase 04", "Região Metástase 04",
+    "Diagnóstico Histológico de Tumor da Família de Ewing",
+    "Diagnóstico Imunohistoquímico de Tumor da Família Ewing",
+    "Ausência de Tratamento Prévio com Quimioterapia ou Radioterapia",
+    "Funções Cardíaca, Hepática e Renal Adequadas",
+    "Ausência de Doença Neurológica ou Infecciosa Grave",
+]
+
+N_PACIENTES_BASE = 96
+
+
+# =========================================================
+# 🎲 AMOSTRAGEM
+# =========================================================
+def _amostrar(rng, contagens: dict, n: int) -> np.ndarray:
+    rotulos = np.array(list(contagens), dtype=object)
+    p = np.array(list(contagens.values()), dtype=float)
+    return rotulos[rng.choice(len(rotulos), size=n, p=p / p.sum())]
+
+
+def _uniforme_correlacionada(rng, paciente: np.ndarray, n_pac: int) -> np.ndarray:
+    """Uniforme marginal com correlação latente `RHO_PACIENTE` por paciente."""
+    z = (
+        RHO_PACIENTE * rng.standard_normal(n_pac)[paciente]
+        + np.sqrt(1 - RHO_PACIENTE**2) * rng.standard_normal(len(paciente))
+    )
+    return (np.argsort(np.argsort(z)) + 0.5) / len(z)
+
+
+def _graus(rng, contagens: dict, paciente: np.ndarray, n_pac: int) -> np.ndarray:
+    # rótulos ordenados do menos ao mais grave (NaN/99/"Selecione" no início),
+    # para que pacientes com latente alto acumulem os graus maiores
+    def ordem(rotulo):
+        try:
+            g = int(str(rotulo).split("-")[0])
+            return g if g < 99 else -1
+        except Exception:
+            return -2
+
+    rotulos = sorted(contagens, key=ordem)
+    p = np.array([contagens[r] for r in rotulos], dtype=float)
+    limites = np.cumsum(p / p.sum())
+    u = _uniforme_correlacionada(rng, paciente, n_pac)
+    idx = np.minimum(np.searchsorted(limites, u), len(rotulos) - 1)
+    return np.array(rotulos, dtype=object)[idx]
+
+
+# =========================================================
+# 🧪 PLANILHA METRONÔMICA SINTÉTICA
+# =========================================================
+def gerar_metronomica(n_pacientes: int, rng) -> pd.DataFrame:
+    """Mesmo esquema (41 colunas) de planilha-metronomica-filtrada.xlsx."""
+    ids = np.arange(1, n_pacientes + 1) * 7
+    n_ciclos = _amostrar(rng, CICLOS_POR_PACIENTE, n_pacientes).astype(int)
+
+    paciente = np.repeat(np.arange(n_pacientes), n_ciclos)
+    n = len(paciente)
+    inicio_pac = np.cumsum(n_ciclos) - n_ciclos
+    ciclo = np.arange(n) - inicio_pac[paciente]
+
+    inicio = pd.Timestamp("2012-03-01") + pd.to_timedelta(
+        rng.integers(0, 365 * 9, n_pacientes), unit="D"
+    )
+    datas = (
+        inicio[paciente]
+        + pd.to_timedelta(ciclo * 28 + rng.integers(-3, 4, n), unit="D")
+    )
+
+    altura = np.clip(rng.normal(148, 22, n_pacientes), 80, 195)
+    peso = np.clip(
+        (altura / 100) ** 2 * rng.normal(18.5, 3.0, n_pacientes), 9, 120
+    )
+    peso_ciclo = peso[paciente] * (1 + rng.normal(0, 0.02, n))
+    sc = np.sqrt(altura[paciente] * peso_ciclo / 3600)
+
+    df = pd.DataFrame({
+        "ID Paciente": ids[paciente],
+        "Data 1 Dia MT": datas,
+        "DataHemogramaMT": datas,
+        "PesoMT": peso_ciclo.round(1),
+        "AlturaMT": altura[paciente].round(0),
+        "SuperficieCorporalMT": sc,
+    })
+
+    for col, (mediana, sigma, sentinela) in LABS.items():
+        valores = np.round(mediana * np.exp(rng.normal(0, sigma, n)), 2)
+        valores[rng.random(n) < sentinela] = 9999
+        df[col] = valores
+
+    sem_bioquimica = df["CreatinaMT"].to_numpy() == 9999
+    # sentinela de data usada na planilha original para exame não realizado
+    bioquimica = pd.Series(datas).where(~sem_bioquimica, pd.Timestamp("2999-09-09"))
+    df.insert(10, "DataBioquimica", bioquimica)
+
+    df["Vimblastina"] = np.round(sc * 3.0, 2)
+    df["Ciclofosfamida"] = np.round(sc * 25 / 5, 0) * 5
+    df["HemoPlaquetas"] = (rng.random(n) < 0.004).astype(float)
+    df["HemoHemacias"] = (rng.random(n) < 0.015).astype(float)
+
+    for col, contagens in DISTRIBUICOES_GRAU.items():
+        df[col] = _graus(rng, contagens, paciente, n_pacientes)
+
+    outras = rng.random(n) < 0.12
+    df["Outras Toxicidades 1"] = np.where(
+        outras, _amostrar(rng, {"Febre": 9, "Dolor abdominal": 4, "Cefaleia": 4, "Tosse": 3}, n), None
+    )
+    df["Grau Toxicidade 1"] = np.where(
+        outras, _amostrar(rng, {"Grau 1": 70, "Grau 2": 48, "Grau 3": 15}, n), None
+    )
+    for k in (2, 3, 4):
+        df[f"Outras Toxicidades {k}"] = None
+        df[f"Grau Toxicidade {k}"] = None
+    df["Obs"] = None
+
+    return df[COLUNAS_METRONOMICA]
+
+
+# =========================================================
+# 📌 BASELINE SINTÉTICO
+# =========================================================
+def gerar_baseline(ids_metro: np.ndarray, rng) -> pd.DataFrame:
+    """Mesmo esquema (30 colunas) de 1_202407_Baseline.xlsx, com PII fictícia."""
+    n = max(int(round(len(ids_metro) * RAZAO_BASELINE)), len(ids_metro))
+    outros = np.setdiff1d(np.arange(1, 8 * n + 1), ids_metro)
+    ids = np.sort(np.concatenate([ids_metro, outros[:n - len(ids_metro)]]))
+
+    nascimento = pd.Timestamp("1990-01-01") + pd.to_timedelta(
+        rng.integers(0, 365 * 25, n), unit="D"
+    )
+    tcle = nascimento + pd.to_timedelta(rng.integers(365, 365 * 25, n), unit="D")
+
+    df = pd.DataFrame({
+        "ID": ids,
+        "Nome": [f"Paciente{i}" for i in ids],
+        "Sobrenome": [f"Sintetico{i}" for i in ids],
+        "Iniciais": "PS",
+        "RG": rng.integers(10**7, 10**8, n).astype(str),
+        "Data de Nascimento": nascimento,
+        "Data TCLE": tcle,
+        "Registro Hospitalar": rng.integers(10**6, 10**7, n).astype(str),
+    })
+
+    for col, contagens in CATEGORIAS_BASELINE.items():
+        df[col] = _amostrar(rng, contagens, n)
+
+    df["Outro Local Tumor Primário"] = None
+    metastase = df["Metástase"].to_numpy() == "Sim"
+    for k in ("01", "02", "03", "04"):
+        df[f"Região Metástase {k}"] = np.where(metastase & (rng.random(n) < 0.6), "Tórax", None)
+        df[f"Local Metástase {k}"] = np.where(
+            pd.notna(df[f"Região Metástase {k}"]), "Pulmão", None
+        )
+    for col in COLUNAS_BASELINE[-5:]:
+        df[col] = "Sim"
+
+    return df[COLUNAS_BASELINE]
+
+
+# =========================================================
+# 🧬 COORTE COMPLETA
+# =========================================================
+def gerar_coorte(escala: float = 1, seed: int = 0):
+    """(metro, baseline) com `escala` × 96 pacientes metronômicos."""
+    rng = np.random.default_rng(seed)
+    n_pacientes = max(1, int(round(N_PACIENTES_BASE * escala)))
+    metro = gerar_metronomica(n_pacientes, rng)
+    baseline = gerar_baseline(metro["ID Paciente"].unique(), rng)
+    return metro, baseline
+
+
+def salvar_coorte(destino, escala: float = 1, seed: int = 0):
+    """Grava a coorte com os mesmos nomes de arquivo usados pelas apps."""
+    os.makedirs(destino, exist_ok=True)
+    metro, baseline = gerar_coorte(escala, seed)
+
+    metro_file = os.path.join(destino, "planilha-metronomica-filtrada.xlsx")
+    baseline_file = os.path.join(destino, "1_202407_Baseline.xlsx")
+    exportar_xlsx(metro_file, {"Sheet 1": metro})
+    exportar_xlsx(baseline_file, {"Sheet1": baseline})
+    return metro_file, baseline_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera coorte sintética.")
+    parser.add_argument("destino")
+    parser.add_argument("--escala", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in salvar_coorte(args.destino, args.escala, args.seed):
+        print(f"✔️ SALVO: {path}")
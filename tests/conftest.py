@@ -0,0 +1,38 @@
+# =========================================================
+# 🧪 COORTE SINTÉTICA COMPARTILHADA PELOS TESTES
+# =========================================================
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregados import COLUNAS_METRO, COLUNAS_TOX, matriz_presenca  # noqa: E402
+from dados import normalizar_nome, preparar_metronomica  # noqa: E402
+from sintetico import gerar_coorte  # noqa: E402
+from toxicidade import montar_cubo  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def metro():
+    """Planilha metronômica sintética (96 pacientes), projetada e preparada
+    como em `calcular_agregados`."""
+    bruto, _ = gerar_coorte(escala=1, seed=0)
+    bruto = bruto.rename(columns=normalizar_nome)
+    return preparar_metronomica(bruto[[c for c in COLUNAS_METRO if c in bruto.columns]])
+
+
+@pytest.fixture(scope="session")
+def colunas_tox(metro):
+    return [c for c in COLUNAS_TOX if c in metro.columns]
+
+
+@pytest.fixture(scope="session")
+def cubo(metro, colunas_tox):
+    return montar_cubo(metro, colunas_tox)
+
+
+@pytest.fixture(scope="session")
+def presenca(metro, cubo):
+    return matriz_presenca(metro, cubo)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparacao import benjamini_hochberg, comparar_grupos, holm
+
+P = [0.01, 0.04, 0.03, 0.005]
+
+
+def test_benjamini_hochberg_valores_conhecidos():
+    np.testing.assert_allclose(benjamini_hochberg(P), [0.02, 0.04, 0.04, 0.02])
+
+
+def test_holm_valores_conhecidos():
+    np.testing.assert_allclose(holm(P), [0.03, 0.06, 0.06, 0.02])
+
+
+@pytest.mark.parametrize("ajuste, esperado", [
+    (benjamini_hochberg, [0.03, np.nan, 0.06, 0.2]),
+    (holm, [0.03, np.nan, 0.08, 0.2]),
+])
+def test_nan_fica_de_fora_do_ajuste(ajuste, esperado):
+    np.testing.assert_allclose(ajuste([0.01, np.nan, 0.04, 0.2]), esperado)
+
+
+@pytest.mark.parametrize("ajuste", [benjamini_hochberg, holm])
+def test_sem_p_finito(ajuste):
+    assert np.isnan(ajuste([np.nan, np.nan])).all()
+    assert ajuste([]).shape == (0,)
+
+
+def test_variavel_de_um_nivel_nao_anula_p_fdr():
+    rng = np.random.default_rng(0)
+    coorte = pd.DataFrame({
+        "ID": np.arange(40),
+        "Metronômica": np.repeat([0, 1], 20),
+        "Constante": 1,
+        "Sexo": rng.integers(0, 2, 40),
+        "Idades": rng.normal(12, 4, 40),
+    })
+    tabela = comparar_grupos(coorte, permutacoes=200).set_index("variavel")
+
+    assert np.isnan(tabela.loc["Constante", "p_fdr"])
+    assert tabela.drop(index="Constante")[["p_holm", "p_fdr"]].notna().all().all()
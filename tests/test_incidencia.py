@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregados import DESLOCAMENTO_GRAU, grau_maximo_por_paciente
+from incidencia import LIMIARES, primeiro_evento
+from toxicidade import decodificar_grau
+
+
+@pytest.fixture(scope="module")
+def eventos(cubo):
+    return primeiro_evento(cubo)
+
+
+@pytest.mark.parametrize("limiar", LIMIARES)
+def test_eventos_iguais_a_tabela_por_paciente(cubo, eventos, limiar):
+    """Nº de pacientes com evento ≥ limiar = nº com grau máximo clínico ≥ limiar."""
+    k = list(LIMIARES).index(limiar)
+    com_evento = (eventos.indice[:, :, k] >= 0).sum(axis=0)
+    grau_max = grau_maximo_por_paciente(cubo, escala_clinica=True)
+    np.testing.assert_array_equal(com_evento, (grau_max >= limiar).sum(axis=0))
+
+
+@pytest.mark.parametrize("coluna", sorted(DESLOCAMENTO_GRAU))
+def test_ciclo_do_evento_na_escala_clinica(metro, eventos, coluna):
+    """Ciclo do primeiro grau clínico ≥ 3, conferido contra um groupby."""
+    grau = decodificar_grau(metro[coluna]).where(lambda s: s < 99) - DESLOCAMENTO_GRAU[coluna]
+    referencia = (
+        metro.loc[grau >= 3].groupby("id_paciente")["ciclo"].min()
+        .reindex(eventos.ids)
+    )
+
+    t, k = eventos.colunas.index(coluna), list(LIMIARES).index(3)
+    indice = eventos.indice[:, t, k]
+    ciclo = pd.Series(
+        np.where(indice >= 0, eventos.ciclos[np.maximum(indice, 0)], np.nan),
+        index=eventos.ids,
+    )
+    pd.testing.assert_series_equal(ciclo, referencia.astype(float), check_names=False)
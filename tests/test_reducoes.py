@@ -0,0 +1,14 @@
+import numpy as np
+
+from reducoes import como_groupby, layout_de_tabela, reduzir_com_groupby, reduzir_por_paciente
+
+
+def test_kernel_igual_ao_groupby(metro, colunas_tox):
+    kernel = como_groupby(reduzir_por_paciente(layout_de_tabela(metro, colunas_tox)))
+    referencia = reduzir_com_groupby(metro, colunas_tox)
+
+    assert set(kernel.columns) == set(referencia.columns)
+    np.testing.assert_allclose(
+        kernel.to_numpy(float),
+        referencia.reindex(index=kernel.index, columns=kernel.columns).to_numpy(float),
+    )
@@ -0,0 +1,26 @@
+import numpy as np
+
+from retencao import calcular_retencao, em_risco
+
+
+def test_em_risco_e_abandonos(metro, cubo, presenca):
+    tabela = em_risco(calcular_retencao(cubo, presenca))
+    ultimo = metro.groupby("id_paciente")["ciclo"].max().to_numpy()
+
+    ciclos = tabela["ciclo"].to_numpy()
+    np.testing.assert_array_equal(ciclos, cubo.ciclos)
+    np.testing.assert_array_equal(tabela["em_risco"], [(ultimo >= c).sum() for c in ciclos])
+    np.testing.assert_array_equal(tabela["abandonos"], [(ultimo == c).sum() for c in ciclos])
+    assert tabela["retencao"].iloc[0] == 100
+
+
+def test_em_risco_com_mascara_e_ciclo_max(metro, cubo, presenca):
+    ret = calcular_retencao(cubo, presenca)
+    mascara = np.arange(len(ret.ids)) % 2 == 0
+    tabela = em_risco(ret, mascara=mascara, ciclo_max=12)
+
+    ultimo = metro.groupby("id_paciente")["ciclo"].max().reindex(ret.ids).to_numpy()[mascara]
+    assert tabela["ciclo"].max() == 12
+    np.testing.assert_array_equal(
+        tabela["em_risco"], [(ultimo >= c).sum() for c in tabela["ciclo"]]
+    )
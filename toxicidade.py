@@ -0,0 +1,73 @@
+# =========================================================
+# 📦 IMPORTS
+# =========================================================
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from dados import mapear_unicos
+
+
+# =========================================================
+# 🧪 DECODIFICAÇÃO DE GRAU
+# =========================================================
+def grau(x):
+    try:
+        return int(str(x).split("-")[0])
+    except Exception:
+        return np.nan
+
+
+def decodificar_grau(serie: pd.Series) -> pd.Series:
+    """`grau` vetorizado: cada rótulo distinto é decodificado uma única vez."""
+    return mapear_unicos(serie, grau)
+
+
+# =========================================================
+# 🧊 CUBO PACIENTE × CICLO × TOXICIDADE
+# =========================================================
+class Cubo(NamedTuple):
+    ids: np.ndarray          # id_paciente, ordenado
+    ciclos: np.ndarray       # valores de ciclo, ordenados
+    colunas: list            # colunas de toxicidade (eixo 2)
+    graus: np.ndarray        # float, NaN = sem registro / não decodificável
+
+
+def montar_cubo(metro: pd.DataFrame, colunas, ciclo_col: str = "ciclo") -> Cubo:
+    """Grau máximo por (paciente, ciclo, toxicidade) para todas as colunas."""
+    colunas = [c for c in colunas if c in metro.columns]
+
+    pac, ids = pd.factorize(metro["id_paciente"], sort=True)
+    cic, ciclos = pd.factorize(metro[ciclo_col], sort=True)
+
+    valores = np.column_stack(
+        [decodificar_grau(metro[c]).to_numpy() for c in colunas]
+    ) if colunas else np.empty((len(metro), 0))
+
+    graus = np.full((len(ids), len(ciclos), len(colunas)), np.nan)
+
+    chave = pac.astype(np.int64) * len(ciclos) + cic
+    if len(np.unique(chave)) != len(chave):
+        agregado = pd.DataFrame(valores).groupby(chave).max()
+        chave = agregado.index.to_numpy()
+        valores = agregado.to_numpy()
+
+    graus.reshape(-1, len(colunas))[chave] = valores
+    return Cubo(np.asarray(ids), np.asarray(ciclos), colunas, graus)
+
+
+def tabela_heatmap(cubo: Cubo, coluna: str) -> pd.DataFrame:
+    """Equivalente a `pivot_table(index=ciclo, columns=id_paciente,
+    aggfunc="max").fillna(0)` sobre o grau decodificado."""
+    mat = cubo.graus[:, :, cubo.colunas.index(coluna)].T
+    presente = ~np.isnan(mat)
+    linhas = presente.any(axis=1)
+    cols = presente.any(axis=0)
+
+    tabela = pd.DataFrame(
+        mat[np.ix_(linhas, cols)],
+        index=pd.Index(cubo.ciclos[linhas], name="ciclo"),
+        columns=pd.Index(cubo.ids[cols], name="id_paciente"),
+    )
+    return tabela.fillna(0)